@@ -8,6 +8,9 @@ import tqdm
 import random
 from bs4 import BeautifulSoup, NavigableString
 import numpy as np
+import os
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 from typing import Dict, List, Optional, Iterator, Callable, Union, Tuple
 
 
@@ -159,6 +162,23 @@ def get_hh(split: str, silent: bool = False, cache_dir: str = None) -> Dict[str,
 
     return data
 
+def process_lc(rows, silent=False) -> Dict[str, Dict[str, Union[List[Tuple[int, int]], List[str], str]]]:
+    """Convert LeetCode Preference rows (description, version1, version2, preference) to the format of get_hh.
+
+       preference is 1 if version2 is preferred; the sft_target is the preferred version.
+    """
+    data = defaultdict(dict)
+    for row in tqdm.tqdm(rows, desc='Processing LC', disable=silent):
+        prompt = row['description']
+        responses = [row['version1'], row['version2']]
+        chosen, rejected = (1, 0) if row['preference'] else (0, 1)
+
+        data[prompt]['responses'] = responses
+        data[prompt]['pairs'] = [(chosen, rejected)]
+        data[prompt]['sft_target'] = responses[chosen]
+
+    return data
+
 def get_lc(split, silent=False, cache_dir: str = None) -> Dict[str, Dict[str, Union[List[Tuple[int, int]], List[str], str]]]:
     """Load the LeetCode Preference dataset from Huggingface, and return a dict of prompts and responses.  
     """
@@ -170,23 +190,62 @@ def get_lc(split, silent=False, cache_dir: str = None) -> Dict[str, Dict[str, Un
     dataset = dataset.shuffle(seed=42)
     dataset = dataset.select(range(int(len(dataset) * 0.01))) if split == 'test' else dataset.select(
         range(int(len(dataset) * 0.01), len(dataset)))
+    return process_lc(dataset, silent=silent)
+
+def get_lc_local(split, silent=False, cache_dir: str = None) -> Dict[str, Dict[str, Union[List[Tuple[int, int]], List[str], str]]]:
+    """Load the LeetCode Preference dataset from the Parquet files written by preference_collection/export_preferences.py.
+
+       The files are read from $LC_PREFERENCE_DIR (default data/leetcode_preference) and memory-mapped,
+         so no download is needed and the columns are not copied before processing.
+    """
+    path = os.environ.get('LC_PREFERENCE_DIR', 'data/leetcode_preference')
+    print(f'Loading LeetCode Preference dataset ({split} split) from {path}...')
+    rows = read_lc_parquet(path, split, ['id', 'description', 'version1', 'version2', 'preference'])
+    print('done')
+    return process_lc(rows, silent=silent)
+
+def read_lc_parquet(path: str, split: str, columns: List[str]) -> List[Dict]:
+    """Memory-map a Parquet dataset exported by preference_collection/export_preferences.py and return the rows of a split."""
+    table = pq.read_table(path, columns=columns, memory_map=True)
+
+    # order by id so the split does not depend on the partitioning, then shuffle and select 1% for test
+    table = table.take(pc.sort_indices(table, sort_keys=[('id', 'ascending')]))
+    permutation = np.random.default_rng(42).permutation(table.num_rows)
+    n_test = int(table.num_rows * 0.01)
+    table = table.take(permutation[:n_test] if split == 'test' else permutation[n_test:])
+    return table.to_pylist()
+
+def get_lc_ranked(split, silent=False, cache_dir: str = None) -> Dict[str, Dict[str, Union[List[Tuple[int, int]], List[str], str]]]:
+    """Load the LeetCode candidate rankings exported by preference_collection/export_preferences.py.
+
+       Every prompt has several candidate solutions compared pairwise by labelers in a finished tournament
+         (read from $LC_RANKING_DIR, default data/leetcode_ranking). The preference pairs are the ones the
+         comparisons order directly or transitively, as exported; pairs only the Bradley-Terry prior orders
+         are never used. The sft_target is the candidate with the highest Bradley-Terry score.
+    """
+    path = os.environ.get('LC_RANKING_DIR', 'data/leetcode_ranking')
+    print(f'Loading LeetCode Ranking dataset ({split} split) from {path}...')
+    rows = read_lc_parquet(path, split, ['id', 'description', 'candidates', 'scores', 'pairs'])
+    print('done')
+
     data = defaultdict(dict)
-    for row in tqdm.tqdm(dataset, desc='Processing LC', disable=silent):
+    for row in tqdm.tqdm(rows, desc='Processing LC ranked', disable=silent):
         prompt = row['description']
-        version1, version2 = row['version1'], row['version2']
-        responses = [version1, version2]
-        preference = row['preference']
-        pairs = []
-        pairs.append((version2, version1) if preference else (version1, version2))
+        responses = row['candidates']
+        scores = row['scores']
+
+        pairs = [(preferred, other) for preferred, other in row['pairs']]
+        if not pairs:
+            continue
 
         data[prompt]['responses'] = responses
         data[prompt]['pairs'] = pairs
-        data[prompt]['sft_target'] = preference
+        data[prompt]['sft_target'] = responses[max(range(len(responses)), key=lambda i: scores[i])]
 
     return data
 
 def get_dataset(name: str, split: str, silent: bool = False, cache_dir: str = None):
-    """Load the given dataset by name. Supported by default are 'shp', 'hh', and 'se'."""
+    """Load the given dataset by name. Supported by default are 'shp', 'hh', 'se', 'lc', 'lc_local' and 'lc_ranked'."""
     if name == 'shp':
         data = get_shp(split, silent=silent, cache_dir=cache_dir)
     elif name == 'hh':
@@ -195,6 +254,10 @@ def get_dataset(name: str, split: str, silent: bool = False, cache_dir: str = No
         data = get_se(split, silent=silent, cache_dir=cache_dir)
     elif name == 'lc':
         data = get_lc(split, silent=silent, cache_dir=cache_dir)
+    elif name == 'lc_local':
+        data = get_lc_local(split, silent=silent, cache_dir=cache_dir)
+    elif name == 'lc_ranked':
+        data = get_lc_ranked(split, silent=silent, cache_dir=cache_dir)
     else:
         raise ValueError(f"Unknown dataset '{name}'")
 
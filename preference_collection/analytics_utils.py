@@ -0,0 +1,135 @@
+"""
+This module provides the labeling throughput analytics: how long labelers take to
+decide between the two versions of a pair, and how many labels they produce per hour.
+
+Every submitted preference comes with a "decision" labeling event (see
+preference_selection_panel.py) holding the labeler name, the chosen version, when the
+pair was first displayed, the seconds from then to the decision, the seconds spent on
+the problem including regenerations, the number of regenerations and the unit test
+outcome of both versions. The views below expose these events as rows and aggregate
+them per labeler, difficulty, problem and hour.
+
+Functions:
+    - init_analytics_views(connection) -> None:
+        Creates or replaces the decision views.
+    - fetch_decision_report(connection, view: str, limit: int) -> pd.DataFrame:
+        Returns the rows of one of the aggregated decision views.
+
+Dependencies:
+    - pandas: For the report tables.
+    - duckdb_utils: For the labeling event log.
+"""
+
+import pandas as pd
+
+from duckdb_utils import (
+    init_labeling_tables,
+)
+from typing import Optional
+
+
+# one row per submitted preference; labelers without a name are told apart by session
+DECISIONS_VIEW = """
+CREATE OR REPLACE VIEW labeling_decisions AS
+SELECT
+    e.event_id,
+    e.problem_id,
+    e.session_id,
+    COALESCE(e.payload->>'labeler', e.session_id) AS labeler,
+    p.difficulty,
+    CAST(e.payload->>'chosen_version' AS INTEGER) AS chosen_version,
+    to_timestamp(CAST(e.payload->>'shown_at' AS DOUBLE)) AS shown_at,
+    e.created_at AS decided_at,
+    CAST(e.payload->>'decision_seconds' AS DOUBLE) AS decision_seconds,
+    CAST(e.payload->>'problem_seconds' AS DOUBLE) AS problem_seconds,
+    CAST(e.payload->>'regenerations' AS INTEGER) AS regenerations,
+    CAST(e.payload->>'tournament' AS BOOLEAN) AS tournament,
+    CAST(e.payload->>'version1_passed' AS INTEGER) AS version1_passed,
+    CAST(e.payload->>'version1_tests' AS INTEGER) AS version1_tests,
+    CAST(e.payload->>'version2_passed' AS INTEGER) AS version2_passed,
+    CAST(e.payload->>'version2_tests' AS INTEGER) AS version2_tests
+FROM labeling_events e LEFT JOIN leetcode_problems p ON p.id = e.problem_id
+WHERE e.action = 'decision'
+"""
+
+# aggregated decision views and the columns they group by
+LATENCY_VIEWS = {
+    "decision_latency_by_labeler": "labeler",
+    "decision_latency_by_difficulty": "difficulty",
+    "decision_latency_by_problem": "problem_id, difficulty",
+}
+
+# decision latency percentiles of a group of decisions
+# (labels per hour count the time spent on problems, so breaks are left out)
+LATENCY_VIEW = """
+CREATE OR REPLACE VIEW {view} AS
+SELECT
+    {keys},
+    count(*) AS labels,
+    quantile_cont(decision_seconds, 0.5) AS p50_decision_seconds,
+    quantile_cont(decision_seconds, 0.9) AS p90_decision_seconds,
+    avg(regenerations) AS mean_regenerations,
+    count(*) FILTER (WHERE problem_seconds IS NOT NULL) * 3600
+        / nullif(sum(problem_seconds), 0) AS labels_per_hour
+FROM labeling_decisions
+GROUP BY {keys}
+"""
+
+# labels submitted in every hour of the clock
+LABELS_PER_HOUR_VIEW = """
+CREATE OR REPLACE VIEW labels_per_hour AS
+SELECT
+    date_trunc('hour', decided_at) AS hour,
+    count(*) AS labels,
+    count(DISTINCT labeler) AS labelers,
+    quantile_cont(decision_seconds, 0.5) AS p50_decision_seconds
+FROM labeling_decisions
+GROUP BY hour
+"""
+
+# order of the rows of every report view
+REPORT_ORDER = {
+    "decision_latency_by_labeler": "labels DESC",
+    "decision_latency_by_difficulty": "difficulty",
+    "decision_latency_by_problem": "p90_decision_seconds DESC NULLS LAST",
+    "labels_per_hour": "hour DESC",
+}
+
+
+def init_analytics_views(connection) -> None:
+    """
+    Creates or replaces the decision views.
+
+    Parameters:
+        connection: The database connection.
+
+    Returns:
+        None
+    """
+    init_labeling_tables(connection)
+    connection.execute(DECISIONS_VIEW)
+    for view, keys in LATENCY_VIEWS.items():
+        connection.execute(LATENCY_VIEW.format(view=view, keys=keys))
+    connection.execute(LABELS_PER_HOUR_VIEW)
+
+
+def fetch_decision_report(
+    connection, view: str, limit: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Returns the rows of one of the aggregated decision views.
+
+    Parameters:
+        connection: The database connection.
+        view (str): One of REPORT_ORDER.
+        limit (int): The maximum number of rows, e.g. the slowest problems only.
+
+    Returns:
+        pd.DataFrame: The rows, in the view's report order.
+    """
+    if view not in REPORT_ORDER:
+        raise ValueError(f"unknown report view: {view}")
+    query = f"SELECT * FROM {view} ORDER BY {REPORT_ORDER[view]}"
+    if limit is not None:
+        query += f" LIMIT {int(limit)}"
+    return connection.execute(query).df()
@@ -0,0 +1,216 @@
+"""
+Command-line job that runs the unit tests of every stored code pair in the sandbox
+and writes per-case pass/fail, timings and errors to the leetcode_test_results table.
+
+Each (problem, version) is keyed by the hash of its code and of its test set, so a
+rerun after new generations only evaluates the versions whose code or tests changed.
+
+Usage:
+    python batch_evaluate.py --workers 8
+
+Functions:
+    - fetch_evaluation_jobs(connection, force: bool) -> List[Dict]:
+        Returns the code versions whose results are missing or outdated.
+    - run_evaluation(args: argparse.Namespace) -> None:
+        Evaluates the pending code versions and saves their results in batches.
+
+Dependencies:
+    - argparse: For command-line parsing.
+    - duckdb: For database operations.
+    - concurrent.futures: For keeping every sandbox worker busy.
+    - cache_utils: For code and test set hashes.
+    - duckdb_utils: For saving test results.
+    - unit_test_utils: For the sandbox worker pool.
+"""
+
+import argparse
+import duckdb
+import time
+
+from cache_utils import (
+    code_hash,
+    test_hash,
+)
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from constants import (
+    DATABASE_PATH,
+    SANDBOX_POOL_SIZE,
+    VERSIONS,
+)
+from duckdb_utils import (
+    init_labeling_tables,
+    save_test_results,
+    DBOperationStatus,
+    TEST_RESULTS_TABLE,
+)
+from typing import Dict, List
+from unit_test_utils import (
+    SandboxPool,
+)
+
+
+def fetch_evaluation_jobs(connection, force: bool = False) -> List[Dict]:
+    """
+    Returns the code versions whose unit test results are missing or outdated.
+
+    Parameters:
+        connection: The database connection.
+        force (bool): Evaluate every version, even if its results are up to date.
+
+    Returns:
+        List[Dict]: One job per (problem, version) with id, version, code,
+            function_name, inputs, outputs, code_hash and test_hash.
+    """
+    connection.execute(TEST_RESULTS_TABLE)
+    init_labeling_tables(connection)
+    evaluated = set(
+        connection.execute(
+            "SELECT DISTINCT id, version, code_hash, test_hash FROM leetcode_test_results"
+        ).fetchall()
+    )
+    rows = connection.execute(
+        """
+        SELECT p.id, p.version1, p.version2, t.function_name, t.inputs, t.outputs
+        FROM leetcode_problems_current p
+        JOIN leetcode_tests_current t ON p.id = t.id
+        WHERE p.version1 IS NOT NULL AND t.inputs IS NOT NULL
+        ORDER BY p.id
+        """
+    ).fetchall()
+    jobs = []
+    for id, version1, version2, function_name, inputs, outputs in rows:
+        tests = test_hash(function_name, inputs, outputs)
+        for version, code in zip(VERSIONS, [version1, version2]):
+            if code is None:
+                continue
+            key = (id, version, code_hash(code), tests)
+            if force or key not in evaluated:
+                jobs.append(
+                    {
+                        "id": id,
+                        "version": version,
+                        "code": code,
+                        "function_name": function_name,
+                        "inputs": inputs,
+                        "outputs": outputs,
+                        "code_hash": key[2],
+                        "test_hash": tests,
+                    }
+                )
+    return jobs
+
+
+def _result_rows(job: Dict, results: List[Dict]) -> List[tuple]:
+    return [
+        (
+            job["id"],
+            job["version"],
+            job["code_hash"],
+            job["test_hash"],
+            case_index,
+            result["status"],
+            result["error"],
+            result["wall_time"],
+            result["cpu_time"],
+            result["peak_memory"],
+        )
+        for case_index, result in enumerate(results)
+    ]
+
+
+def _print_summary(connection) -> None:
+    summary = connection.execute(
+        """
+        SELECT version,
+               count(DISTINCT id) AS problems,
+               avg(CASE WHEN status = '.' THEN 1 ELSE 0 END) AS case_pass_rate,
+               count(*) FILTER (WHERE status = 'E') AS errors,
+               count(*) FILTER (WHERE status = 'T') AS timeouts
+        FROM leetcode_test_results
+        GROUP BY version
+        ORDER BY version
+        """
+    ).fetchall()
+    for version, problems, pass_rate, errors, timeouts in summary:
+        print(
+            f"{version}: {problems} problems | {pass_rate:.1%} of cases pass | "
+            f"{errors} errors | {timeouts} timeouts"
+        )
+
+
+def run_evaluation(args: argparse.Namespace) -> None:
+    """
+    Evaluates the pending code versions on a sandbox pool and saves their results
+    in batches.
+
+    Parameters:
+        args (argparse.Namespace): The parsed command-line arguments.
+
+    Returns:
+        None
+    """
+    connection = duckdb.connect(args.database)
+    jobs = fetch_evaluation_jobs(connection, args.force)
+    print(f"{len(jobs)} code versions to evaluate")
+    pool = SandboxPool(args.workers)
+    pending_rows = []
+    evaluated = 0
+    started = time.monotonic()
+
+    def flush():
+        status, message = save_test_results(connection, pending_rows)
+        if status == DBOperationStatus.ERROR:
+            print(f"failed to save test results: {message}")
+        pending_rows.clear()
+
+    try:
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            futures = {
+                executor.submit(
+                    pool.run,
+                    job["code"],
+                    job["function_name"],
+                    job["inputs"],
+                    job["outputs"],
+                ): job
+                for job in jobs
+            }
+            for future in as_completed(futures):
+                pending_rows.extend(_result_rows(futures[future], future.result()))
+                evaluated += 1
+                if evaluated % args.batch_size == 0:
+                    flush()
+                    elapsed = time.monotonic() - started
+                    print(
+                        f"evaluated {evaluated}/{len(jobs)} versions "
+                        f"({evaluated / elapsed:.1f} versions/s)"
+                    )
+        if pending_rows:
+            flush()
+    finally:
+        pool.close()
+    _print_summary(connection)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run the unit tests of every stored code pair in the sandbox."
+    )
+    parser.add_argument("--database", default=DATABASE_PATH)
+    parser.add_argument("--workers", type=int, default=max(SANDBOX_POOL_SIZE, 1))
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=100,
+        help="number of evaluated versions saved per write",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="re-evaluate versions whose code and tests did not change",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    run_evaluation(parse_args())
@@ -0,0 +1,154 @@
+"""
+Command-line job that fingerprints every stored code version into the
+code_fingerprints index and reports the near-duplicate pairs: problems whose two
+versions are the same solution, and versions repeated across problems.
+
+Each (problem, version) is keyed by the hash of its code, so a rerun after new
+generations only fingerprints the versions that changed.
+
+Usage:
+    python batch_fingerprint.py --output duplicates.csv
+
+Functions:
+    - fetch_fingerprint_jobs(connection, force: bool) -> List[Tuple]:
+        Returns the code versions whose fingerprints are missing or outdated.
+    - run_fingerprinting(args: argparse.Namespace) -> None:
+        Updates the fingerprint index and reports the duplicate pairs.
+
+Dependencies:
+    - argparse: For command-line parsing.
+    - duckdb: For database operations.
+    - pandas: For writing the duplicate pairs.
+    - cache_utils: For code hashes.
+    - duckdb_utils: For the current code versions.
+    - fingerprint_utils: For the fingerprint index.
+"""
+
+import argparse
+import duckdb
+import pandas as pd
+import time
+
+from cache_utils import (
+    code_hash,
+)
+from constants import (
+    DATABASE_PATH,
+    DUPLICATE_SIMILARITY_THRESHOLD,
+    VERSIONS,
+)
+from duckdb_utils import (
+    init_labeling_tables,
+    DBOperationStatus,
+)
+from fingerprint_utils import (
+    find_duplicate_pairs,
+    init_fingerprint_tables,
+    save_fingerprints,
+)
+from typing import List, Tuple
+
+
+def fetch_fingerprint_jobs(connection, force: bool = False) -> List[Tuple]:
+    """
+    Returns the code versions whose fingerprints are missing or outdated.
+
+    Parameters:
+        connection: The database connection.
+        force (bool): Fingerprint every version, even if its fingerprint is up to date.
+
+    Returns:
+        List[Tuple]: One (id, version, code_hash, code) row per (problem, version).
+    """
+    init_fingerprint_tables(connection)
+    init_labeling_tables(connection)
+    indexed = set(
+        connection.execute(
+            "SELECT id, version, code_hash FROM code_fingerprints"
+        ).fetchall()
+    )
+    rows = connection.execute(
+        """
+        SELECT id, version1, version2 FROM leetcode_problems_current
+        WHERE version1 IS NOT NULL
+        ORDER BY id
+        """
+    ).fetchall()
+    jobs = []
+    for id, version1, version2 in rows:
+        for version, code in zip(VERSIONS, [version1, version2]):
+            if code is None:
+                continue
+            key = (id, version, code_hash(code))
+            if force or key not in indexed:
+                jobs.append((*key, code))
+    return jobs
+
+
+def run_fingerprinting(args: argparse.Namespace) -> None:
+    """
+    Fingerprints the changed code versions in batches, then reports the
+    near-duplicate pairs of the whole index.
+
+    Parameters:
+        args (argparse.Namespace): The parsed command-line arguments.
+
+    Returns:
+        None
+    """
+    connection = duckdb.connect(args.database)
+    jobs = fetch_fingerprint_jobs(connection, args.force)
+    print(f"{len(jobs)} code versions to fingerprint")
+    started = time.monotonic()
+    for start in range(0, len(jobs), args.batch_size):
+        status, message = save_fingerprints(
+            connection, jobs[start : start + args.batch_size]
+        )
+        if status == DBOperationStatus.ERROR:
+            print(f"failed to save fingerprints: {message}")
+    if jobs:
+        elapsed = max(time.monotonic() - started, 1e-9)
+        print(f"fingerprinted {len(jobs)} versions ({len(jobs) / elapsed:.1f} versions/s)")
+
+    duplicates = find_duplicate_pairs(connection, args.threshold)
+    same_problem = sum(row["same_problem"] for row in duplicates)
+    print(
+        f"{same_problem} problems with near-duplicate versions | "
+        f"{len(duplicates) - same_problem} near-duplicate versions across problems"
+    )
+    if args.output:
+        pd.DataFrame(
+            duplicates,
+            columns=["id1", "version1", "id2", "version2", "similarity", "same_problem"],
+        ).to_csv(args.output, index=False)
+        print(f"wrote {len(duplicates)} duplicate pairs to {args.output}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Fingerprint every stored code version and report near-duplicates."
+    )
+    parser.add_argument("--database", default=DATABASE_PATH)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DUPLICATE_SIMILARITY_THRESHOLD,
+        help="similarity from which two versions are the same solution",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1000,
+        help="number of fingerprinted versions saved per write",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="fingerprint versions whose code did not change",
+    )
+    parser.add_argument("--output", help="CSV file the duplicate pairs are written to")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    run_fingerprinting(parse_args())
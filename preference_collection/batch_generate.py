@@ -0,0 +1,363 @@
+"""
+Command-line batch generator that fills in the code pairs of every LeetCode problem
+without one, using the same prompt construction and persistence as the Streamlit app.
+
+Pairs are saved one by one as labeling events as they finish, and the event log is
+compacted at the start and end of every run, so an interrupted run resumes where it
+stopped: the next run only picks up the problems whose current version1 is still NULL.
+
+With --candidates K (K > 2), K candidates are sampled per problem instead of a pair.
+The distinct ones are saved for tournament comparisons in the app, and the first
+pairing is saved as the problem's code pair.
+
+Usage:
+    python batch_generate.py --concurrency 4 --rate-limit 2 --retries 3
+    python batch_generate.py --candidates 6
+
+Functions:
+    - fetch_pending_problems(connection, start_id: int, limit: int) -> List[Tuple[int, str]]:
+        Returns the (id, description) of the problems without a code pair.
+    - generate_with_retries(instruction: str, description: str, retries: int, backoff: float, rate_limiter: RateLimiter, stats: Dict, bypass_cache: bool) -> Tuple[str, str]:
+        Generates a code pair, retrying failed attempts with exponential backoff.
+    - generate_candidates_with_retries(instruction: str, description: str, count: int, retries: int, backoff: float, rate_limiter: RateLimiter, stats: Dict) -> List[str]:
+        Samples distinct candidates, retrying attempts that yield fewer than two.
+    - run_batch(args: argparse.Namespace) -> None:
+        Generates and saves code pairs for every pending problem.
+
+Classes:
+    - RateLimiter: Spaces out generation requests across worker threads.
+
+Dependencies:
+    - argparse: For command-line parsing.
+    - duckdb: For database operations.
+    - concurrent.futures: For generating several problems at once.
+    - cache_utils: For generation through the generation cache.
+    - duckdb_utils: For saving code pairs.
+    - ollama_utils: For the default instruction and candidate sampling.
+    - tournament_utils: For deduplicating and saving candidates.
+"""
+
+import argparse
+import duckdb
+import random
+import threading
+import time
+import uuid
+
+from cache_utils import (
+    generate_versions_cached,
+    get_generation_cache,
+)
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from constants import (
+    CANDIDATE_COUNT,
+    DATABASE_PATH,
+)
+from duckdb_utils import (
+    compact_labeling_events,
+    init_labeling_tables,
+    save_comparison,
+    DBOperationStatus,
+)
+from ollama_utils import (
+    build_prompt,
+    default_instruction,
+    generate_candidates,
+)
+from tournament_utils import (
+    deduplicate_candidates,
+    init_candidate_tables,
+    save_candidates,
+)
+from typing import Dict, List, Tuple
+
+
+class RateLimiter:
+    """
+    Allows at most `rate` acquisitions per second, shared by all worker threads.
+    A rate of 0 disables the limit.
+    """
+
+    def __init__(self, rate: float):
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + self._interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def fetch_pending_problems(
+    connection, start_id: int = None, limit: int = None
+) -> List[Tuple[int, str]]:
+    """
+    Returns the problems without a code pair, ordered by id.
+
+    Parameters:
+        connection: The database connection.
+        start_id (int): Skip problems with a smaller id.
+        limit (int): Maximum number of problems to return.
+
+    Returns:
+        List[Tuple[int, str]]: The (id, description) of each pending problem.
+    """
+    init_labeling_tables(connection)
+    query = (
+        "SELECT id, description FROM leetcode_problems_current WHERE version1 IS NULL"
+    )
+    params = []
+    if start_id is not None:
+        query += " AND id >= ?"
+        params.append(start_id)
+    query += " ORDER BY id"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    return connection.execute(query, params).fetchall()
+
+
+def generate_with_retries(
+    instruction: str,
+    description: str,
+    retries: int,
+    backoff: float,
+    rate_limiter: RateLimiter,
+    stats: Dict,
+    bypass_cache: bool = False,
+) -> Tuple[str, str]:
+    """
+    Generates a code pair, retrying failed attempts with exponential backoff.
+
+    Parameters:
+        instruction (str): The instruction given to the model.
+        description (str): The LeetCode problem description.
+        retries (int): Number of retries after the first attempt.
+        backoff (float): Base delay in seconds, doubled after every failed attempt.
+        rate_limiter (RateLimiter): Limiter acquired before every attempt.
+        stats (Dict): Incremented with the number of generated tokens.
+        bypass_cache (bool): Always call the model instead of reusing cached pairs.
+
+    Returns:
+        Tuple[str, str]: The two code versions, or (None, None) if every attempt failed.
+    """
+    for attempt in range(retries + 1):
+        rate_limiter.acquire()
+        try:
+            version1, version2 = generate_versions_cached(
+                instruction, description, stats=stats, bypass_cache=bypass_cache
+            )
+            if version1 and version2:
+                return version1, version2
+        except Exception as e:
+            print(f"generation attempt {attempt + 1} failed: {e}")
+        if attempt < retries:
+            # jitter keeps retrying workers from hitting ollama in lockstep
+            time.sleep(backoff * 2**attempt * random.uniform(0.5, 1.5))
+    return None, None
+
+
+def generate_candidates_with_retries(
+    instruction: str,
+    description: str,
+    count: int,
+    retries: int,
+    backoff: float,
+    rate_limiter: RateLimiter,
+    stats: Dict,
+) -> List[str]:
+    """
+    Samples candidates and drops the near-identical ones, retrying attempts that
+    yield fewer than two distinct candidates with exponential backoff.
+
+    Parameters:
+        instruction (str): The instruction given to the model.
+        description (str): The LeetCode problem description.
+        count (int): The number of candidates sampled per attempt.
+        retries (int): Number of retries after the first attempt.
+        backoff (float): Base delay in seconds, doubled after every failed attempt.
+        rate_limiter (RateLimiter): Limiter acquired before every attempt.
+        stats (Dict): Incremented with the number of generated tokens.
+
+    Returns:
+        List[str]: The distinct candidates, or an empty list if every attempt failed.
+    """
+    for attempt in range(retries + 1):
+        rate_limiter.acquire()
+        try:
+            candidates = deduplicate_candidates(
+                generate_candidates(
+                    build_prompt(instruction, description), count, stats=stats
+                )
+            )
+            if len(candidates) >= 2:
+                return candidates
+        except Exception as e:
+            print(f"generation attempt {attempt + 1} failed: {e}")
+        if attempt < retries:
+            time.sleep(backoff * 2**attempt * random.uniform(0.5, 1.5))
+    return []
+
+
+def _save_candidates(connection, id: int, candidates: List[str]) -> Tuple:
+    status, message = save_candidates(connection, id, uuid.uuid4().hex, candidates)
+    if status == DBOperationStatus.ERROR:
+        return status, message
+    # the first pairing of the tournament is the problem's code pair
+    return save_comparison(
+        connection, id, candidates[0], candidates[1], session_id="batch_generate"
+    )
+
+
+def _report(saved: int, failed: int, tokens: int, started: float) -> None:
+    elapsed = max(time.monotonic() - started, 1e-9)
+    cache = get_generation_cache().stats()
+    print(
+        f"saved {saved} pairs, {failed} failed | "
+        f"{saved * 60 / elapsed:.1f} pairs/min | {tokens / elapsed:.1f} tokens/s | "
+        f"cache {cache['hits']} hits / {cache['misses']} misses "
+        f"({cache['saved_seconds']:.0f}s saved)"
+    )
+
+
+def run_batch(args: argparse.Namespace) -> None:
+    """
+    Generates and saves code pairs for every problem without one.
+
+    Parameters:
+        args (argparse.Namespace): The parsed command-line arguments.
+
+    Returns:
+        None
+    """
+    connection = duckdb.connect(args.database)
+    init_candidate_tables(connection)
+    # pairs saved by an interrupted run are only visible once compacted
+    status, message = compact_labeling_events(connection)
+    if status == DBOperationStatus.ERROR:
+        print(f"failed to compact labeling events: {message}")
+    problems = fetch_pending_problems(connection, args.start_id, args.limit)
+    print(f"{len(problems)} problems without a code pair")
+    instruction = args.instruction or default_instruction()
+    rate_limiter = RateLimiter(args.rate_limit)
+    stats = {}
+    saved = failed = 0
+    started = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        pending = {}
+        problems = iter(problems)
+        exhausted = False
+        while pending or not exhausted:
+            # keep a bounded number of problems in flight
+            while not exhausted and len(pending) < 2 * args.concurrency:
+                try:
+                    id, description = next(problems)
+                except StopIteration:
+                    exhausted = True
+                    break
+                job_stats = {}
+                if args.candidates > 2:
+                    future = executor.submit(
+                        generate_candidates_with_retries,
+                        instruction,
+                        description,
+                        args.candidates,
+                        args.retries,
+                        args.backoff,
+                        rate_limiter,
+                        job_stats,
+                    )
+                else:
+                    future = executor.submit(
+                        generate_with_retries,
+                        instruction,
+                        description,
+                        args.retries,
+                        args.backoff,
+                        rate_limiter,
+                        job_stats,
+                        args.bypass_cache,
+                    )
+                pending[future] = (id, job_stats)
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                id, job_stats = pending.pop(future)
+                stats["tokens"] = stats.get("tokens", 0) + job_stats.get("tokens", 0)
+                versions = future.result()
+                if not versions or versions[0] is None:
+                    print(f"giving up on problem {id}")
+                    failed += 1
+                    continue
+                if args.candidates > 2:
+                    status, message = _save_candidates(connection, id, versions)
+                else:
+                    status, message = save_comparison(
+                        connection, id, *versions, session_id="batch_generate"
+                    )
+                if status == DBOperationStatus.ERROR:
+                    print(f"failed to save problem {id}: {message}")
+                    failed += 1
+                    continue
+                saved += 1
+                if saved % args.report_every == 0:
+                    _report(saved, failed, stats.get("tokens", 0), started)
+
+    _report(saved, failed, stats.get("tokens", 0), started)
+    # make the new pairs visible to the app and to the next run
+    if saved:
+        status, message = compact_labeling_events(connection)
+        if status == DBOperationStatus.ERROR:
+            print(f"failed to compact labeling events: {message}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Generate code pairs for every LeetCode problem without one."
+    )
+    parser.add_argument("--database", default=DATABASE_PATH)
+    parser.add_argument(
+        "--instruction", default=None, help="defaults to the app's instruction"
+    )
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument(
+        "--backoff", type=float, default=2.0, help="base retry delay in seconds"
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=0.0,
+        help="max generation requests per second (0 for no limit)",
+    )
+    parser.add_argument(
+        "--start-id", type=int, default=None, help="skip problems with a smaller id"
+    )
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--report-every", type=int, default=10)
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=CANDIDATE_COUNT,
+        help="candidates sampled per problem for tournament comparisons "
+        "(2 or less generates a single pair)",
+    )
+    parser.add_argument(
+        "--bypass-cache",
+        action="store_true",
+        help="regenerate pairs even if the generation cache has them "
+        "(the new pairs are not cached)",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    run_batch(parse_args())
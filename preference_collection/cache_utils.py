@@ -0,0 +1,461 @@
+"""
+This module provides persistent caches stored in a local DuckDB file, shared by every
+session of the app process.
+
+Functions:
+    - get_cache_connection() -> duckdb.DuckDBPyConnection:
+        Returns the process-wide connection to the local cache database.
+    - get_generation_cache() -> GenerationCache:
+        Returns the process-wide generation cache.
+    - get_unit_test_cache() -> UnitTestResultCache:
+        Returns the process-wide unit test result cache.
+    - code_hash(code: str) -> str:
+        Hashes a code snippet.
+    - test_hash(function_name: str, inputs: List[str], outputs: List[str]) -> str:
+        Hashes a unit test set.
+    - generate_versions_cached(instruction: str, description: str, options: List[Dict], ...) -> Tuple[str, str]:
+        Generates a code pair, answering repeated prompts from the generation cache.
+
+Classes:
+    - GenerationCache: Content-addressed cache of generated code pairs with size-based
+      LRU eviction and hit/miss counters.
+    - UnitTestResultCache: Unit test results keyed by code hash and test set hash.
+
+Dependencies:
+    - duckdb: For database operations.
+    - hashlib: For hashing cache keys.
+    - json: For serializing cache keys.
+    - threading: For serializing access to the shared connection.
+    - fingerprint_utils: For detecting near-duplicate code pairs.
+    - ollama_utils: For generating code pairs on a cache miss.
+"""
+
+import duckdb
+import hashlib
+import json
+import random
+import threading
+import time
+
+from constants import (
+    CACHE_DATABASE_PATH,
+    DUPLICATE_PAIR_RETRIES,
+    GENERATION_CACHE_MAX_BYTES,
+    GENERATION_MODE,
+    OLLAMA_MODEL,
+    VERSION_SAMPLING_OPTIONS,
+)
+from fingerprint_utils import (
+    is_duplicate_pair,
+)
+from ollama_utils import (
+    build_prompt,
+    generate_versions,
+)
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+_cache_connection = None
+_cache_lock = threading.RLock()
+_generation_cache = None
+_unit_test_cache = None
+
+
+def get_cache_connection():
+    """
+    Returns the process-wide connection to the local cache database. DuckDB allows a
+    single writer process per file, so if another process holds the file the caches
+    fall back to being disabled.
+
+    Parameters:
+        None
+
+    Returns:
+        duckdb.DuckDBPyConnection: The connection, or None if the file is unavailable.
+    """
+    global _cache_connection
+    with _cache_lock:
+        if _cache_connection is None:
+            try:
+                _cache_connection = duckdb.connect(CACHE_DATABASE_PATH)
+            except Exception as e:
+                print(f"cache database unavailable, caching disabled: {e}")
+                _cache_connection = False
+        return _cache_connection or None
+
+
+class GenerationCache:
+    """
+    Cache of generated code pairs keyed by a sha256 of everything that determines the
+    output: model, generation mode, instruction, problem description and sampling
+    options (including the seeds).
+
+    Entries are evicted least recently used first once their total size exceeds
+    `max_bytes`. Hits, misses and the generation time saved by hits are counted for
+    the lifetime of the process.
+    """
+
+    def __init__(self, connection, max_bytes: int = GENERATION_CACHE_MAX_BYTES):
+        self._connection = connection
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        if self._connection is not None:
+            with _cache_lock:
+                self._connection.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS generation_cache (
+                        key VARCHAR PRIMARY KEY,
+                        version1 VARCHAR,
+                        version2 VARCHAR,
+                        size_bytes BIGINT,
+                        generation_seconds DOUBLE,
+                        created_at TIMESTAMP,
+                        last_access TIMESTAMP
+                    )
+                    """
+                )
+
+    @staticmethod
+    def key(
+        instruction: str,
+        description: str,
+        options: List[Dict],
+        model: str = OLLAMA_MODEL,
+    ) -> str:
+        """
+        Computes the cache key of a generation.
+
+        Parameters:
+            instruction (str): The instruction given to the model.
+            description (str): The LeetCode problem description.
+            options (List[Dict]): Sampling options for version1 and version2.
+            model (str): The Ollama model name.
+
+        Returns:
+            str: The hex sha256 of the generation inputs.
+        """
+        payload = json.dumps(
+            {
+                "model": model,
+                "mode": GENERATION_MODE,
+                "instruction": instruction,
+                "description": description,
+                "options": options,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[str, str]]:
+        """
+        Looks up a cached code pair and marks it as recently used.
+
+        Parameters:
+            key (str): The cache key.
+
+        Returns:
+            Tuple[str, str]: The cached (version1, version2), or None on a miss.
+        """
+        row = None
+        if self._connection is not None:
+            with _cache_lock:
+                row = self._connection.execute(
+                    """
+                    UPDATE generation_cache SET last_access = now()
+                    WHERE key = ?
+                    RETURNING version1, version2, generation_seconds
+                    """,
+                    [key],
+                ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_seconds += row[2] or 0.0
+        return row[0], row[1]
+
+    def put(
+        self, key: str, version1: str, version2: str, generation_seconds: float
+    ) -> None:
+        """
+        Stores a code pair and evicts the least recently used entries over budget.
+
+        Parameters:
+            key (str): The cache key.
+            version1 (str): The first version of the code.
+            version2 (str): The second version of the code.
+            generation_seconds (float): Time the generation took.
+
+        Returns:
+            None
+        """
+        if self._connection is None:
+            return
+        size = len(version1.encode("utf-8")) + len(version2.encode("utf-8"))
+        with _cache_lock:
+            self._connection.execute(
+                """
+                INSERT OR REPLACE INTO generation_cache
+                VALUES (?, ?, ?, ?, ?, now(), now())
+                """,
+                [key, version1, version2, size, generation_seconds],
+            )
+            # keep the most recently used entries that fit in the budget
+            self._connection.execute(
+                """
+                DELETE FROM generation_cache WHERE key IN (
+                    SELECT key FROM (
+                        SELECT key, SUM(size_bytes) OVER (
+                            ORDER BY last_access DESC, key
+                        ) AS running_bytes
+                        FROM generation_cache
+                    ) WHERE running_bytes > ?
+                )
+                """,
+                [self._max_bytes],
+            )
+
+    def stats(self) -> Dict:
+        """
+        Returns the cache counters.
+
+        Parameters:
+            None
+
+        Returns:
+            Dict: hits, misses, hit_rate and saved_seconds.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_seconds": self.saved_seconds,
+            }
+
+
+def get_generation_cache() -> GenerationCache:
+    """
+    Returns the process-wide generation cache.
+
+    Parameters:
+        None
+
+    Returns:
+        GenerationCache: The shared cache.
+    """
+    global _generation_cache
+    connection = get_cache_connection()
+    with _cache_lock:
+        if _generation_cache is None:
+            _generation_cache = GenerationCache(connection)
+        return _generation_cache
+
+
+def code_hash(code: str) -> str:
+    """
+    Hashes a code snippet.
+
+    Parameters:
+        code (str): Provided code snippet.
+
+    Returns:
+        str: The hex sha256 of the code.
+    """
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def test_hash(function_name: str, inputs: List[str], outputs: List[str]) -> str:
+    """
+    Hashes a unit test set.
+
+    Parameters:
+        function_name (str): Name of the function to be tested.
+        inputs (List[str]): List of inputs for unit tests.
+        outputs (List[str]): List of expected outputs for unit tests.
+
+    Returns:
+        str: The hex sha256 of the test set.
+    """
+    payload = json.dumps([function_name, list(inputs), list(outputs)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class UnitTestResultCache:
+    """
+    Unit test results keyed by sha256(code) and sha256(function_name, inputs,
+    outputs), so results are reused across sessions and restarts as long as neither
+    the code nor the tests change.
+    """
+
+    def __init__(self, connection):
+        self._connection = connection
+        if self._connection is not None:
+            with _cache_lock:
+                self._connection.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS unit_test_cache (
+                        code_hash VARCHAR,
+                        test_hash VARCHAR,
+                        results VARCHAR,
+                        created_at TIMESTAMP,
+                        PRIMARY KEY (code_hash, test_hash)
+                    )
+                    """
+                )
+
+    def get(
+        self, code: str, function_name: str, inputs: List[str], outputs: List[str]
+    ) -> Optional[List[Dict]]:
+        """
+        Looks up the cached results of a code snippet on a test set.
+
+        Parameters:
+            code (str): Provided code snippet.
+            function_name (str): Name of the function to be tested.
+            inputs (List[str]): List of inputs for unit tests.
+            outputs (List[str]): List of expected outputs for unit tests.
+
+        Returns:
+            List[Dict]: The cached per-case results, or None on a miss.
+        """
+        if self._connection is None:
+            return None
+        with _cache_lock:
+            row = self._connection.execute(
+                """
+                SELECT results FROM unit_test_cache
+                WHERE code_hash = ? AND test_hash = ?
+                """,
+                [code_hash(code), test_hash(function_name, inputs, outputs)],
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(
+        self,
+        code: str,
+        function_name: str,
+        inputs: List[str],
+        outputs: List[str],
+        results: List[Dict],
+    ) -> None:
+        """
+        Stores the results of a code snippet on a test set.
+
+        Parameters:
+            code (str): Provided code snippet.
+            function_name (str): Name of the function to be tested.
+            inputs (List[str]): List of inputs for unit tests.
+            outputs (List[str]): List of expected outputs for unit tests.
+            results (List[Dict]): The per-case results.
+
+        Returns:
+            None
+        """
+        if self._connection is None:
+            return
+        with _cache_lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO unit_test_cache VALUES (?, ?, ?, now())",
+                [
+                    code_hash(code),
+                    test_hash(function_name, inputs, outputs),
+                    json.dumps(results),
+                ],
+            )
+
+
+def get_unit_test_cache() -> UnitTestResultCache:
+    """
+    Returns the process-wide unit test result cache.
+
+    Parameters:
+        None
+
+    Returns:
+        UnitTestResultCache: The shared cache.
+    """
+    global _unit_test_cache
+    connection = get_cache_connection()
+    with _cache_lock:
+        if _unit_test_cache is None:
+            _unit_test_cache = UnitTestResultCache(connection)
+        return _unit_test_cache
+
+
+def generate_versions_cached(
+    instruction: str,
+    description: str,
+    options: List[Dict] = VERSION_SAMPLING_OPTIONS,
+    on_version: Optional[Callable[[int, str], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[Dict] = None,
+    bypass_cache: bool = False,
+    duplicate_retries: int = DUPLICATE_PAIR_RETRIES,
+    outcomes_differ: Optional[Callable[[str, str], bool]] = None,
+) -> Tuple[str, str]:
+    """
+    Generates a code pair, answering repeated prompts from the generation cache.
+    A generated pair whose versions are the same canonical code is generated again
+    with new seeds, up to `duplicate_retries` times, and the last pair is kept
+    either way.
+
+    Parameters:
+        instruction (str): The instruction given to the model.
+        description (str): The LeetCode problem description.
+        options (List[Dict]): Sampling options for version1 and version2.
+        on_version (Callable[[int, str], None]): Called with the version index and
+            code as soon as each version is available.
+        should_stop (Callable[[], bool]): Checked between chunks; the generation is
+            abandoned once it returns True.
+        stats (Dict): If given, "tokens" is incremented by the number of generated
+            tokens.
+        bypass_cache (bool): Skip the lookup and always call the model, for
+            deliberate regeneration. The new pair is not cached: regenerations
+            draw fresh seeds, so its key would never be looked up again and would
+            only evict entries that are.
+        duplicate_retries (int): Number of new generations of a duplicate pair.
+        outcomes_differ (Callable[[str, str], bool]): Called with the versions of a
+            duplicate pair; the pair is kept if it returns True, as versions with
+            different unit test outcomes are worth labeling.
+
+    Returns:
+        Tuple[str, str]: The two code versions, or (None, None) on failure.
+    """
+    cache = get_generation_cache()
+    key = cache.key(instruction, description, options)
+    if not bypass_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            if on_version:
+                on_version(0, cached[0])
+                on_version(1, cached[1])
+            return cached
+    started = time.monotonic()
+    prompt = build_prompt(instruction, description)
+    for attempt in range(duplicate_retries + 1):
+        version1, version2 = generate_versions(
+            prompt,
+            options,
+            on_version=on_version,
+            should_stop=should_stop,
+            stats=stats,
+        )
+        if not (version1 and version2) or not is_duplicate_pair(version1, version2):
+            break
+        if outcomes_differ is not None and outcomes_differ(version1, version2):
+            break
+        # a pair differing only in naming or formatting wastes a labeler decision
+        options = [
+            dict(version_options, seed=random.randint(0, 2**31 - 1))
+            for version_options in options
+        ]
+    # the pair is cached under the original options, so the retries are not repeated
+    if version1 and version2 and not bypass_cache:
+        cache.put(key, version1, version2, time.monotonic() - started)
+    return version1, version2
@@ -0,0 +1,460 @@
+"""
+This module provides the problem catalog: a read-only copy of the LeetCode problems and
+unit tests shared by every session of the app process, so memory does not grow with the
+number of concurrent labelers.
+
+Classes:
+    - ProblemCatalog: Process-wide Arrow tables of the current problems and tests,
+      refreshed incrementally from the compacted labeling state, with a shared LRU
+      cache of the large text columns and test cases fetched on demand.
+    - SessionCatalog: A session's view of the catalog, holding only the session's
+      own edits.
+
+Dependencies:
+    - numpy: For locating problems without a code pair.
+    - pyarrow: For the immutable column store.
+    - collections: For the LRU cache of text columns and test cases.
+    - concurrent.futures: For background prefetching of text columns and test cases.
+    - threading: For the refresh thread and per-thread cursors.
+"""
+
+import numpy as np
+import threading
+import time
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from constants import (
+    CATALOG_REFRESH_INTERVAL,
+    INCLUDE_PROBLEMS_WITHOUT_CODE,
+    PROBLEM_CATALOG_COLUMNS,
+    PROBLEM_TEXT_CACHE_SIZE,
+    PROBLEM_TEXT_COLUMNS,
+    TEST_CASE_COLUMNS,
+    TEST_CATALOG_COLUMNS,
+)
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+
+class CatalogSnapshot(NamedTuple):
+    """
+    Immutable state of the catalog between two full reloads.
+    """
+
+    # problems ordered by id (PROBLEM_CATALOG_COLUMNS and missing_code)
+    problems: object
+    # problems with unit tests (TEST_CATALOG_COLUMNS)
+    tests: object
+    ids: List[int]
+    # id -> row of problems
+    positions: Dict[int, int]
+    # id -> row of tests
+    test_rows: Dict[int, int]
+    # rows of problems without a code pair, ascending
+    missing: np.ndarray
+
+
+class ProblemCatalog:
+    """
+    Process-wide catalog of the current problems and their unit tests.
+
+    The small PROBLEM_CATALOG_COLUMNS of every problem and TEST_CATALOG_COLUMNS of
+    every unit test are loaded once into immutable Arrow tables, with id -> row
+    indexes. The large PROBLEM_TEXT_COLUMNS and TEST_CASE_COLUMNS are fetched one
+    problem at a time when read and kept in an LRU cache shared by every session,
+    so memory does not grow with the size of the problem and test tables.
+
+    Every `refresh_interval` seconds the catalog reads the rows of the compacted
+    labeling state that changed since the last refresh and records their new values
+    as changes taking precedence over the Arrow tables, without copying them. The
+    tables are only reloaded when problems are added or removed, in which case
+    sessions started earlier keep the snapshot they started with, so positions stay
+    stable for them.
+    """
+
+    def __init__(
+        self,
+        connection,
+        include_without_code: bool = INCLUDE_PROBLEMS_WITHOUT_CODE,
+        refresh_interval: float = CATALOG_REFRESH_INTERVAL,
+        text_cache_size: int = PROBLEM_TEXT_CACHE_SIZE,
+    ):
+        self._database = connection
+        self._where = "" if include_without_code else " WHERE version1 IS NOT NULL"
+        self._text_cache_size = text_cache_size
+        # duckdb connections are not shared across threads, use a cursor per thread
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # (kind, id) -> fetched columns, least recently used first
+        self._texts = OrderedDict()
+        self._changes = {}
+        self._watermark = None
+        self._snapshot = self._load()
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="catalog-prefetch"
+        )
+        if refresh_interval > 0:
+            threading.Thread(
+                target=self._run,
+                args=(refresh_interval,),
+                name="catalog-refresh",
+                daemon=True,
+            ).start()
+
+    def snapshot(self) -> CatalogSnapshot:
+        """
+        Returns the current snapshot of the catalog.
+
+        Parameters:
+            None
+
+        Returns:
+            CatalogSnapshot: The snapshot.
+        """
+        return self._snapshot
+
+    def value(self, snapshot: CatalogSnapshot, index: int, column: str):
+        """
+        Returns a small column of the problem at a position of a snapshot.
+
+        Parameters:
+            snapshot (CatalogSnapshot): The snapshot the position refers to.
+            index (int): The position of the problem.
+            column (str): A PROBLEM_CATALOG_COLUMNS column or "missing_code".
+
+        Returns:
+            The latest known value of the column.
+        """
+        changes = self._changes.get(snapshot.ids[index])
+        if changes and column in changes:
+            return changes[column]
+        return snapshot.problems.column(column)[index].as_py()
+
+    def column(self, snapshot: CatalogSnapshot, column: str) -> List:
+        """
+        Returns a small column of every problem of a snapshot.
+
+        Parameters:
+            snapshot (CatalogSnapshot): The snapshot to read from.
+            column (str): A PROBLEM_CATALOG_COLUMNS column or "missing_code".
+
+        Returns:
+            List: The latest known values, in snapshot order.
+        """
+        values = snapshot.problems.column(column).to_pylist()
+        with self._lock:
+            changes = list(self._changes.items())
+        for id, changed in changes:
+            position = snapshot.positions.get(id)
+            if position is not None and column in changed:
+                values[position] = changed[column]
+        return values
+
+    def test(self, snapshot: CatalogSnapshot, id: int) -> Optional[Dict]:
+        """
+        Returns the unit tests of a problem.
+
+        Parameters:
+            snapshot (CatalogSnapshot): The snapshot to read from.
+            id (int): The ID of the LeetCode problem.
+
+        Returns:
+            Dict: function_name, inputs and outputs, or None if the problem has no
+                unit tests.
+        """
+        row = snapshot.test_rows.get(id)
+        if row is None:
+            return None
+        changes = self._changes.get(id, {})
+        return {
+            "function_name": changes.get(
+                "function_name", snapshot.tests.column("function_name")[row].as_py()
+            ),
+            **self.test_cases(id),
+        }
+
+    def _fetch_cached(self, key: Tuple[str, int], fetch: Callable[[], Dict]) -> Dict:
+        # shared LRU of the large columns of the problems read last
+        with self._lock:
+            if key in self._texts:
+                self._texts.move_to_end(key)
+                return self._texts[key]
+        value = fetch()
+        with self._lock:
+            self._texts[key] = value
+            while len(self._texts) > self._text_cache_size:
+                self._texts.popitem(last=False)
+        return value
+
+    def _fetch_row(self, table: str, columns: List[str], id: int) -> Dict:
+        row = self._cursor().execute(
+            f"SELECT {','.join(columns)} FROM {table} WHERE id = ?", [id]
+        ).fetchone()
+        return dict(zip(columns, row or [None] * len(columns)))
+
+    def text(self, id: int) -> Dict:
+        """
+        Returns the large text columns of a problem, fetching them if needed.
+
+        Parameters:
+            id (int): The ID of the LeetCode problem.
+
+        Returns:
+            Dict: The PROBLEM_TEXT_COLUMNS values.
+        """
+        return self._fetch_cached(
+            ("text", id),
+            lambda: self._fetch_row(
+                "leetcode_problems_current", PROBLEM_TEXT_COLUMNS, id
+            ),
+        )
+
+    def test_cases(self, id: int) -> Dict:
+        """
+        Returns the unit test cases of a problem, fetching them if needed.
+
+        Parameters:
+            id (int): The ID of the LeetCode problem.
+
+        Returns:
+            Dict: The TEST_CASE_COLUMNS values.
+        """
+        return self._fetch_cached(
+            ("tests", id),
+            lambda: self._fetch_row("leetcode_tests_current", TEST_CASE_COLUMNS, id),
+        )
+
+    def prefetch(self, snapshot: CatalogSnapshot, id: int) -> None:
+        """
+        Fetches the text columns and unit test cases of a problem in the background.
+
+        Parameters:
+            snapshot (CatalogSnapshot): The snapshot listing the problem's tests.
+            id (int): The ID of the LeetCode problem.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            missing_text = ("text", id) not in self._texts
+            missing_tests = (
+                id in snapshot.test_rows and ("tests", id) not in self._texts
+            )
+        if missing_text:
+            self._executor.submit(self.text, id)
+        if missing_tests:
+            self._executor.submit(self.test_cases, id)
+
+    def refresh(self) -> None:
+        """
+        Picks up the labeling state compacted since the last refresh, and reloads the
+        tables if problems were added or removed.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        cursor = self._cursor()
+        rows = cursor.execute(
+            """
+            SELECT problem_id, version1 IS NULL, preference, function_name, updated_at
+            FROM labeling_state WHERE ? IS NULL OR updated_at > ?
+            """,
+            [self._watermark, self._watermark],
+        ).fetchall()
+        with self._lock:
+            for id, missing_code, preference, function_name, updated_at in rows:
+                changes = self._changes.setdefault(id, {})
+                # only fields written through events override the tables
+                if not missing_code:
+                    changes["missing_code"] = False
+                if preference is not None:
+                    changes["preference"] = preference
+                if function_name is not None:
+                    changes["function_name"] = function_name
+                self._texts.pop(("text", id), None)
+                self._watermark = max(self._watermark or updated_at, updated_at)
+        (count,) = cursor.execute(
+            f"SELECT count(*) FROM leetcode_problems_current{self._where}"
+        ).fetchone()
+        if count != len(self._snapshot.ids):
+            self._snapshot = self._load()
+
+    def _cursor(self):
+        if not hasattr(self._local, "cursor"):
+            self._local.cursor = self._database.cursor()
+        return self._local.cursor
+
+    def _load(self) -> CatalogSnapshot:
+        cursor = self._cursor()
+        # changes recorded before the load are already part of the tables
+        (watermark,) = cursor.execute(
+            "SELECT max(updated_at) FROM labeling_state"
+        ).fetchone()
+        problems = cursor.execute(
+            f"""
+            SELECT {','.join(PROBLEM_CATALOG_COLUMNS)}, version1 IS NULL AS missing_code
+            FROM leetcode_problems_current{self._where} ORDER BY id
+            """
+        ).fetch_arrow_table()
+        tests = cursor.execute(
+            f"""
+            SELECT {','.join(TEST_CATALOG_COLUMNS)} FROM leetcode_tests_current
+            WHERE inputs IS NOT NULL
+            """
+        ).fetch_arrow_table()
+        ids = problems.column("id").to_pylist()
+        with self._lock:
+            self._watermark = watermark
+        return CatalogSnapshot(
+            problems=problems,
+            tests=tests,
+            ids=ids,
+            positions={id: position for position, id in enumerate(ids)},
+            test_rows={
+                id: row for row, id in enumerate(tests.column("id").to_pylist())
+            },
+            missing=np.flatnonzero(
+                np.asarray(problems.column("missing_code").to_pylist(), dtype=bool)
+            ),
+        )
+
+    def _run(self, refresh_interval: float):
+        while True:
+            time.sleep(refresh_interval)
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"failed to refresh the problem catalog: {e}")
+
+
+class SessionCatalog:
+    """
+    A session's view of the shared catalog. It pins the catalog snapshot it was
+    created with, so positions stay stable for the session, and keeps the session's
+    own edits (`update`, `update_test`), which take precedence over the catalog.
+    """
+
+    def __init__(self, catalog: ProblemCatalog):
+        self._catalog = catalog
+        self._snapshot = catalog.snapshot()
+        self._edits = {}
+        self._test_edits = {}
+
+    def __len__(self) -> int:
+        return len(self._snapshot.ids)
+
+    def id(self, index: int) -> int:
+        """
+        Returns the id of the problem at a position.
+
+        Parameters:
+            index (int): The position of the problem.
+
+        Returns:
+            int: The ID of the LeetCode problem.
+        """
+        return self._snapshot.ids[index]
+
+    def position(self, id: int) -> Optional[int]:
+        """
+        Returns the position of a problem.
+
+        Parameters:
+            id (int): The ID of the LeetCode problem.
+
+        Returns:
+            int: The position of the problem, or None if it is not listed.
+        """
+        return self._snapshot.positions.get(int(id))
+
+    def get(self, index: int, column: str):
+        """
+        Returns a column of the problem at a position.
+
+        Parameters:
+            index (int): The position of the problem.
+            column (str): A PROBLEM_CATALOG_COLUMNS or PROBLEM_TEXT_COLUMNS column, or
+                "missing_code".
+
+        Returns:
+            The value of the column, with the session's edits applied.
+        """
+        id = self.id(index)
+        edits = self._edits.get(id, {})
+        if column in edits:
+            return edits[column]
+        if column == "missing_code" and "version1" in edits:
+            return edits["version1"] is None
+        if column in PROBLEM_TEXT_COLUMNS:
+            if index + 1 < len(self):
+                self._catalog.prefetch(self._snapshot, self.id(index + 1))
+            return self._catalog.text(id)[column]
+        return self._catalog.value(self._snapshot, index, column)
+
+    def test(self, index: int) -> Optional[Dict]:
+        """
+        Returns the unit tests of the problem at a position.
+
+        Parameters:
+            index (int): The position of the problem.
+
+        Returns:
+            Dict: function_name, inputs and outputs, or None if the problem has no
+                unit tests.
+        """
+        id = self.id(index)
+        test = self._catalog.test(self._snapshot, id)
+        if test is not None and id in self._test_edits:
+            test["function_name"] = self._test_edits[id]
+        return test
+
+    def update(self, id: int, **values) -> None:
+        """
+        Records local edits of a problem, e.g. update(id, preference=1).
+
+        Parameters:
+            id (int): The ID of the LeetCode problem.
+            values: The new column values.
+
+        Returns:
+            None
+        """
+        self._edits.setdefault(int(id), {}).update(values)
+
+    def update_test(self, id: int, function_name: str) -> None:
+        """
+        Records a local edit of the function name a problem's unit tests call.
+
+        Parameters:
+            id (int): The ID of the LeetCode problem.
+            function_name (str): The new function name.
+
+        Returns:
+            None
+        """
+        self._test_edits[int(id)] = function_name
+
+    def upcoming_without_code(self, index: int, limit: int) -> List[Tuple[int, str]]:
+        """
+        Returns the next problems without a code pair after a position.
+
+        Parameters:
+            index (int): The current position.
+            limit (int): Maximum number of problems to return.
+
+        Returns:
+            List[Tuple[int, str]]: The (id, description) of each problem, nearest first.
+        """
+        missing = self._snapshot.missing
+        upcoming = []
+        for position in missing[np.searchsorted(missing, index, side="right") :]:
+            if len(upcoming) == limit:
+                break
+            position = int(position)
+            # skip the problems that got a code pair since the snapshot
+            if self.get(position, "missing_code"):
+                upcoming.append((self.id(position), self.get(position, "description")))
+        return upcoming
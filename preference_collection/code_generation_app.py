@@ -4,14 +4,15 @@ from preference_selection_panel import (
     call_codellama,
     display_code_pair,
     display_operation_status,
-    run_unit_tests_on_update,
-)
-from duckdb_utils import (
-    init_database,
+    init_session,
+    schedule_pregeneration,
 )
 from sidebar import (
     display_sidebar,
 )
+from tracing_utils import (
+    span,
+)
 
 
 st.set_page_config(layout="wide")
@@ -19,11 +20,7 @@ st.set_page_config(layout="wide")
 
 # initialize app session data
 if "db_con" not in st.session_state:
-    init_database()
-    st.session_state.debug_mode = False
-    st.session_state.submit_status = None
-    st.session_state.unit_test_results = {}
-    run_unit_tests_on_update()
+    init_session()
 
 
 # remove hamburger item
@@ -54,6 +51,10 @@ def main():
     # side bar
     display_sidebar()
 
+    # every rerun replaces this session's pregeneration jobs with its upcoming
+    # problems, so they follow navigation and keep the session from expiring
+    schedule_pregeneration()
+
     # main panel for preference selection
     if st.session_state.version1 and st.session_state.version2:
         # display preference selection
@@ -65,6 +66,7 @@ def main():
                 "Generate Again",
                 key="regenerate_code_button",
                 on_click=call_codellama,
+                args=(True,),
                 type="primary",
             )
         display_code_pair()
@@ -83,4 +85,6 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    # the whole script rerun triggered by an interaction
+    with span("rerun"):
+        main()
@@ -0,0 +1,262 @@
+"""
+This module estimates the runtime complexity of generated solutions empirically: it
+scales the arguments of a LeetCode test case into a ladder of larger inputs, times
+both versions across the ladder in the sandbox and fits common growth curves.
+
+Functions:
+    - parse_arguments(input: str) -> Tuple[List, Dict]:
+        Parses a test input such as "[nums = [2,7,11,15], target = 9]".
+    - scale_arguments(args: List, kwargs: Dict, size: int) -> Tuple[List, Dict]:
+        Tiles every list and string argument to the given length.
+    - build_input_ladder(input: str, sizes: List[int]) -> List[Tuple[int, str]]:
+        Builds test inputs of increasing size from a test input.
+    - fit_complexity(sizes: List[int], times: List[float]) -> Dict:
+        Fits O(1)/O(log n)/O(n)/O(n log n)/O(n²) models and picks the best one.
+    - find_crossover(fit1: Dict, fit2: Dict, start: int, stop: int) -> int:
+        Finds the input size where the faster version changes.
+    - estimate_complexity(pool: SandboxPool, version1: str, version2: str, function_name: str, input: str) -> Dict:
+        Times both versions across the input ladder and reports their estimated
+        complexity class and crossover point.
+
+Dependencies:
+    - ast: For parsing test inputs.
+    - numpy: For least squares fitting.
+    - concurrent.futures: For timing both versions in parallel.
+    - unit_test_utils: For running the timings in the sandbox.
+"""
+
+import ast
+import math
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+from constants import (
+    COMPLEXITY_CROSSOVER_LIMIT,
+    COMPLEXITY_SIZES,
+    COMPLEXITY_TIMEOUT,
+)
+from typing import Dict, List, Optional, Tuple
+
+
+# growth models from the simplest to the most complex
+COMPLEXITY_MODELS = {
+    "O(1)": lambda n: np.zeros_like(n),
+    "O(log n)": lambda n: np.log2(n),
+    "O(n)": lambda n: n,
+    "O(n log n)": lambda n: n * np.log2(n),
+    "O(n²)": lambda n: n**2,
+}
+
+# a simpler model is preferred unless a more complex one fits this much better
+SIMPLER_MODEL_TOLERANCE = 1.1
+
+
+def parse_arguments(input: str) -> Tuple[List, Dict]:
+    """
+    Parses a test input such as "[nums = [2,7,11,15], target = 9]" into literals.
+
+    Parameters:
+        input (str): The test input, in the leetcode_tests format.
+
+    Returns:
+        Tuple[List, Dict]: The positional and keyword arguments.
+    """
+    call = ast.parse(f"f({input[1:-1]})", mode="eval").body
+    args = [ast.literal_eval(arg) for arg in call.args]
+    kwargs = {keyword.arg: ast.literal_eval(keyword.value) for keyword in call.keywords}
+    return args, kwargs
+
+
+def _scale_value(value, size: int):
+    if isinstance(value, (list, str)) and len(value) > 0:
+        repeats = math.ceil(size / len(value))
+        return (value * repeats)[:size]
+    return value
+
+
+def scale_arguments(args: List, kwargs: Dict, size: int) -> Tuple[List, Dict]:
+    """
+    Tiles every list and string argument to the given length. Other arguments
+    (numbers, empty lists) are kept as they are.
+
+    Parameters:
+        args (List): The positional arguments.
+        kwargs (Dict): The keyword arguments.
+        size (int): The target length.
+
+    Returns:
+        Tuple[List, Dict]: The scaled arguments.
+    """
+    return (
+        [_scale_value(arg, size) for arg in args],
+        {name: _scale_value(value, size) for name, value in kwargs.items()},
+    )
+
+
+def build_input_ladder(
+    input: str, sizes: List[int] = COMPLEXITY_SIZES
+) -> List[Tuple[int, str]]:
+    """
+    Builds test inputs of increasing size from a test input.
+
+    Parameters:
+        input (str): The test input, in the leetcode_tests format.
+        sizes (List[int]): The input sizes of the ladder.
+
+    Returns:
+        List[Tuple[int, str]]: The size and test input of each rung, or an empty
+            list if the input has no list or string argument to scale.
+    """
+    args, kwargs = parse_arguments(input)
+    scalable = [
+        value
+        for value in list(args) + list(kwargs.values())
+        if isinstance(value, (list, str)) and len(value) > 0
+    ]
+    if not scalable:
+        return []
+    ladder = []
+    for size in sizes:
+        scaled_args, scaled_kwargs = scale_arguments(args, kwargs, size)
+        arguments = [repr(arg) for arg in scaled_args] + [
+            f"{name}={value!r}" for name, value in scaled_kwargs.items()
+        ]
+        ladder.append((size, f"[{', '.join(arguments)}]"))
+    return ladder
+
+
+def fit_complexity(sizes: List[int], times: List[float]) -> Dict:
+    """
+    Fits time = a * f(n) + b for each growth model f by least squares on the
+    relative error (a >= 0), so the fast small inputs weigh as much as the slow
+    large ones, and picks the simplest model whose residual is close to the best one.
+
+    Parameters:
+        sizes (List[int]): The input sizes.
+        times (List[float]): The measured times in seconds.
+
+    Returns:
+        Dict: "class" (the model name, None with fewer than 3 points) and
+            "coefficients" ((a, b) for the chosen model).
+    """
+    if len(sizes) < 3:
+        return {"class": None, "coefficients": None}
+    n = np.array(sizes, dtype=float)
+    t = np.maximum(np.array(times, dtype=float), 1e-9)
+    weights = 1 / t
+    # best constant under the relative error
+    constant = float(np.sum(weights) / np.sum(weights**2))
+    fits = {}
+    for name, model in COMPLEXITY_MODELS.items():
+        x = model(n)
+        a, b = 0.0, constant
+        if np.any(x):
+            design = np.stack([x, np.ones_like(x)], 1) * weights[:, None]
+            fitted_a, fitted_b = np.linalg.lstsq(design, t * weights, rcond=None)[0]
+            if fitted_a >= 0:
+                a, b = fitted_a, fitted_b
+        residual = float(np.sum(((a * x + b - t) * weights) ** 2))
+        fits[name] = (residual, (float(a), float(b)))
+    best = min(residual for residual, _ in fits.values())
+    for name, (residual, coefficients) in fits.items():
+        if residual <= best * SIMPLER_MODEL_TOLERANCE + 1e-6:
+            return {"class": name, "coefficients": coefficients}
+
+
+def _predict(fit: Dict, n: np.ndarray) -> np.ndarray:
+    a, b = fit["coefficients"]
+    return a * COMPLEXITY_MODELS[fit["class"]](n) + b
+
+
+def find_crossover(
+    fit1: Dict, fit2: Dict, start: int, stop: int = COMPLEXITY_CROSSOVER_LIMIT
+) -> Optional[int]:
+    """
+    Finds the smallest input size at which the faster of the two fitted versions
+    changes, searching a log-spaced grid between start and stop.
+
+    Parameters:
+        fit1 (Dict): The fit of version1.
+        fit2 (Dict): The fit of version2.
+        start (int): The smallest input size considered.
+        stop (int): The largest input size considered.
+
+    Returns:
+        int: The crossover size, or None if one version stays faster throughout.
+    """
+    if fit1["class"] is None or fit2["class"] is None:
+        return None
+    n = np.unique(np.geomspace(start, stop, 512).astype(int))
+    difference = np.sign(_predict(fit1, n) - _predict(fit2, n))
+    changes = np.nonzero(difference[1:] * difference[:-1] < 0)[0]
+    if len(changes) == 0:
+        return None
+    return int(n[changes[0] + 1])
+
+
+def _time_ladder(pool, code: str, function_name: str, ladder) -> Tuple[List, List]:
+    sizes, times = [], []
+    for size, input in ladder:
+        result = pool.run(
+            code,
+            function_name,
+            [input],
+            None,
+            timeout=COMPLEXITY_TIMEOUT,
+            profile_memory=False,
+        )[0]
+        # larger inputs would only be slower
+        if result["status"] != ".":
+            break
+        sizes.append(size)
+        times.append(result["wall_time"])
+    return sizes, times
+
+
+def estimate_complexity(
+    pool, version1: str, version2: str, function_name: str, input: str
+) -> Dict:
+    """
+    Times both versions across the input ladder built from a test input and reports
+    their estimated complexity class and the crossover point between them.
+
+    Parameters:
+        pool (SandboxPool): The sandbox running the timings.
+        version1 (str): The first version of the code.
+        version2 (str): The second version of the code.
+        function_name (str): Name of the function to be timed.
+        input (str): The test input the ladder is built from.
+
+    Returns:
+        Dict: "version1" and "version2" ({"class", "coefficients", "sizes",
+            "times"}), "crossover" (input size where the faster version changes,
+            or None) and "faster" (the faster version at the largest size timed
+            by both, or None).
+    """
+    try:
+        ladder = build_input_ladder(input)
+    except (SyntaxError, ValueError) as e:
+        print(f"cannot scale test input {input}: {e}")
+        ladder = []
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        timings = list(
+            executor.map(
+                lambda code: _time_ladder(pool, code, function_name, ladder),
+                [version1, version2],
+            )
+        )
+    report = {}
+    for name, (sizes, times) in zip(["version1", "version2"], timings):
+        report[name] = dict(fit_complexity(sizes, times), sizes=sizes, times=times)
+    report["crossover"] = (
+        find_crossover(report["version1"], report["version2"], COMPLEXITY_SIZES[0])
+        if ladder
+        else None
+    )
+    common = min(len(report["version1"]["times"]), len(report["version2"]["times"]))
+    report["faster"] = None
+    if common:
+        time1 = report["version1"]["times"][common - 1]
+        time2 = report["version2"]["times"][common - 1]
+        report["faster"] = "version1" if time1 <= time2 else "version2"
+    return report
@@ -1,31 +1,279 @@
-# columns for leetcode problems
-PROBLEM_COLUMNS = [
+import os
+
+# settings read with os.environ.get can be overridden by the environment variable of
+# the same name, e.g. to point a load test at a local database and a mock ollama server
+
+# database holding leetcode problems, unit tests and preferences
+DATABASE_PATH = "md:dpo"
+
+# seconds between background flushes of queued preference writes
+WRITE_BEHIND_FLUSH_INTERVAL = 1.0
+
+# number of queued writes that triggers a flush before the interval ends
+WRITE_BEHIND_BATCH_SIZE = 64
+
+# flushes a queued write is attempted in before it is reported as failed
+# (a failed flush is rolled back and its writes are queued again)
+WRITE_BEHIND_MAX_ATTEMPTS = 3
+
+# seconds between compactions of the labeling event log into the current state
+LABELING_COMPACTION_INTERVAL = 60.0
+
+# where the app reads and writes leetcode problems and labeling events
+# "remote": directly in DATABASE_PATH
+# "replica": in LOCAL_DATABASE_PATH, synced with DATABASE_PATH in the background
+# "local": in LOCAL_DATABASE_PATH only, for development and tests
+DATABASE_MODE = os.environ.get("DATABASE_MODE", "remote")
+
+# local database used in the "replica" and "local" modes
+LOCAL_DATABASE_PATH = os.environ.get("LOCAL_DATABASE_PATH", "dpo.duckdb")
+
+# database the problems and tests of a new "local" database are copied from, e.g. a
+# copy of DATABASE_PATH (a new local database has no problems if it is not set)
+LOCAL_SEED_DATABASE_PATH = os.environ.get("LOCAL_SEED_DATABASE_PATH")
+
+# seconds between syncs of the local replica with DATABASE_PATH
+REPLICA_SYNC_INTERVAL = 30.0
+
+# seconds of events pulled again at every sync, for writers whose clocks lag
+REPLICA_PULL_OVERLAP = 300
+
+# local database holding the caches shared by all app sessions
+CACHE_DATABASE_PATH = os.environ.get("CACHE_DATABASE_PATH", "cache.duckdb")
+
+# size budget of cached generations before least recently used ones are evicted
+GENERATION_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# columns for leetcode problems held by the shared catalog
+PROBLEM_CATALOG_COLUMNS = [
     "id",
     "difficulty",
     "title",
+    "preference",
+]
+
+# large columns for leetcode problems fetched one problem at a time
+PROBLEM_TEXT_COLUMNS = [
     "description",
-    "difficulty",
     "version1",
     "version2",
-    "preference",
 ]
 
-# columns for leetcode unit tests
-TEST_COLUMNS = [
+# number of problems whose text columns and unit test cases are kept in memory
+PROBLEM_TEXT_CACHE_SIZE = 256
+
+# seconds between refreshes of the shared catalog from the labeling state
+CATALOG_REFRESH_INTERVAL = 30.0
+
+# order of the navigation queue of unlabeled and disagreeing problems
+# "id": catalog order, "difficulty": by DIFFICULTY_ORDER,
+# "uncertainty": versions the unit tests tell apart least first
+NAVIGATION_PRIORITY = "id"
+
+# difficulties from first to last in the "difficulty" navigation order
+DIFFICULTY_ORDER = ["Easy", "Medium", "Hard"]
+
+# seconds a problem handed to a labeler stays reserved for them
+NAVIGATION_CLAIM_TTL = 300
+
+# labelers whose latest preferences settle a disagreement by majority
+# (a tie stays in the navigation queue until the next labeler breaks it)
+DISAGREEMENT_RESOLUTION_LABELS = 3
+
+# columns for leetcode unit tests held by the shared catalog
+TEST_CATALOG_COLUMNS = [
     "id",
     "function_name",
+]
+
+# large columns for leetcode unit tests fetched one problem at a time
+TEST_CASE_COLUMNS = [
     "inputs",
     "outputs",
 ]
 
+# columns of the labeled problems exported for training
+PREFERENCE_EXPORT_COLUMNS = [
+    "id",
+    "difficulty",
+    "title",
+    "description",
+    "version1",
+    "version2",
+    "preference",
+]
+
+# rows per Arrow record batch streamed into the Parquet export
+EXPORT_BATCH_ROWS = 10000
+
 # default prompt
 DEFAULT_INSTRUCTION = (
     "Give two different solutions in python to the following"
     " coding question. add ``` to start and end of each solution"
 )
 
+# prompt used when each version is generated by its own request
+SINGLE_SOLUTION_INSTRUCTION = (
+    "Give a solution in python to the following"
+    " coding question. add ``` to start and end of the solution"
+)
+
+# how code pairs are generated
+# "single": one completion is asked for both versions
+# "concurrent": one request per version, sent in parallel
+GENERATION_MODE = "concurrent"
+
+# sampling options for each version in concurrent mode
+# (seeds are re-drawn when a pair is regenerated)
+VERSION_SAMPLING_OPTIONS = [
+    {"temperature": 0.2, "seed": 1},
+    {"temperature": 0.8, "seed": 2},
+]
+
+# number of candidates sampled per problem and ranked through pairwise comparisons
+# (2 or less generates a single code pair instead)
+CANDIDATE_COUNT = 0
+
+# sampling options shared by every candidate (each one gets its own seed)
+CANDIDATE_SAMPLING_OPTIONS = {"temperature": 0.8}
+
+# seconds a scheduled comparison stays reserved for the labeler it was shown to
+TOURNAMENT_ASSIGNMENT_TTL = 300
+
+# estimated similarity from which two solutions are reported as near-duplicates
+# (jaccard similarity of their token shingles, after renaming identifiers and
+# dropping comments, docstrings and formatting); only used for the bulk report and
+# the labeler warning, as a single changed operator already scores below 0.95
+DUPLICATE_SIMILARITY_THRESHOLD = 0.95
+
+# times a code pair whose versions are the same canonical code is generated again
+# with new seeds (a pair that is still a duplicate is shown with a warning)
+DUPLICATE_PAIR_RETRIES = 2
+
+# tokens per shingle of the minhash fingerprints
+MINHASH_SHINGLE_SIZE = 4
+
+# hash functions per minhash signature
+MINHASH_PERMUTATIONS = 128
+
+# bands a signature is split into when searching duplicates in bulk
+# (versions sharing a band are compared, more bands also find less similar pairs)
+MINHASH_BANDS = 32
+
+# number of code snippets whose fingerprints are kept in memory
+FINGERPRINT_CACHE_SIZE = 1024
+
+# load problems that have no code pair yet
+# (labelers then generate the pair from the app)
+INCLUDE_PROBLEMS_WITHOUT_CODE = False
+
+# number of upcoming problems without a code pair generated in the background
+PREGENERATION_LOOKAHEAD = 3
+
+# seconds after which the pregeneration jobs of a session that stopped scheduling
+# them, e.g. a closed browser tab, are dropped
+PREGENERATION_SESSION_TTL = 600
+
 # ollama api endpoint for running codellama
-OLLAMA_API_ENDPOINT = "http://localhost:11434/api/generate"
+OLLAMA_API_ENDPOINT = os.environ.get(
+    "OLLAMA_API_ENDPOINT", "http://localhost:11434/api/generate"
+)
+
+# ollama model used for code generation
+OLLAMA_MODEL = "codellama"
+
+# max keep-alive connections pooled to the ollama api
+OLLAMA_POOL_SIZE = 8
+
+# number of warm worker processes running unit tests
+# (0 runs every test file in a new python subprocess instead)
+SANDBOX_POOL_SIZE = 4
+
+# time limit of a single unit test case, in seconds
+SANDBOX_CASE_TIMEOUT = 2.0
+
+# number of timed calls per unit test case (the fastest one is reported)
+PROFILE_REPEATS = 3
+
+# input sizes used to estimate the runtime complexity of a solution
+COMPLEXITY_SIZES = [2**exponent for exponent in range(6, 15)]
+
+# time limit of a single call while estimating complexity, in seconds
+COMPLEXITY_TIMEOUT = 1.0
+
+# largest input size considered when looking for the crossover of two versions
+COMPLEXITY_CROSSOVER_LIMIT = 10**7
+
+# modules a solution may not import
+# (sys is allowed for sys.maxsize and sys.setrecursionlimit, see FORBIDDEN_ATTRIBUTES)
+FORBIDDEN_MODULES = {
+    "builtins",
+    "ctypes",
+    "gc",
+    "http",
+    "importlib",
+    "inspect",
+    "multiprocessing",
+    "os",
+    "pathlib",
+    "pickle",
+    "resource",
+    "shutil",
+    "signal",
+    "socket",
+    "subprocess",
+    "threading",
+    "urllib",
+}
+
+# builtins a solution may not call
+FORBIDDEN_CALLS = {
+    "__import__",
+    "breakpoint",
+    "compile",
+    "delattr",
+    "eval",
+    "exec",
+    "exit",
+    "globals",
+    "input",
+    "locals",
+    "open",
+    "quit",
+    "setattr",
+    "vars",
+}
+
+# attributes giving access to interpreter internals, either any attribute of that
+# name or, qualified by its module, an attribute of an allowed module
+FORBIDDEN_ATTRIBUTES = {
+    "__bases__",
+    "__builtins__",
+    "__code__",
+    "__globals__",
+    "__mro__",
+    "__subclasses__",
+    "sys._getframe",
+    "sys.addaudithook",
+    "sys.breakpointhook",
+    "sys.exit",
+    "sys.meta_path",
+    "sys.modules",
+    "sys.path",
+    "sys.path_hooks",
+    "sys.setprofile",
+    "sys.settrace",
+    "sys.stdin",
+}
+
+# address space limit of a unit test worker, in bytes
+SANDBOX_MEMORY_LIMIT = 1024 * 1024 * 1024
+
+# record timed spans of the app's hot paths
+TRACING_ENABLED = True
+
+# most recent spans kept per traced operation
+TRACE_MAX_SPANS = 2048
 
 # code versions
 VERSIONS = ["version1", "version2"]
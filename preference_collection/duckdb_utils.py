@@ -4,103 +4,231 @@ It includes functions for parsing Python code from API outputs, saving code pair
 and initializing the Streamlit app with data fetched from the database.
 
 Functions:
-    - fix_quote(line: str) -> str: Handles edge cases in quotes.
     - post_process_response(response: str) -> Tuple[str, str]: Parses Python code from API output.
+    - labeling_event(id: int, session_id: str, action: str, payload: Dict) -> List: Builds the parameters of a labeling event insert.
+    - init_labeling_tables(connection) -> None: Creates the event log, compacted state and current state views.
+    - compact_labeling_events(connection) -> Tuple[DBOperationStatus, str]: Rebuilds the materialized current state from the event log.
     - record_code_and_preference(connection, id: int, version1: str, version2: str, preference: int) -> Tuple[DBOperationStatus, str]: Saves code pair and human preference to the database.
     - record_preference_only(connection, id: int, preference: int) -> Tuple[DBOperationStatus, str]: Saves only the human preference to the database.
     - save_comparison(connection, id: int, version1: str, version2: str) -> Tuple[DBOperationStatus, str]: Saves only the code pair to the database.
     - extract_function_name(signature: str) -> str: Extracts the function name from a function signature.
     - update_function_name(connection, id: int, function_name: str) -> Tuple[DBOperationStatus, str]: Updates the function name in the database.
+    - save_test_results(connection, results: List[Tuple]) -> Tuple[DBOperationStatus, str]: Replaces the stored unit test results of code versions in bulk.
+    - get_database_connection() -> duckdb.DuckDBPyConnection: Returns the connection shared by every session.
+    - get_problem_catalog() -> ProblemCatalog: Returns the problem catalog shared by every session.
     - init_database() -> None: Initializes the Streamlit app with data from the database.
 
 Dependencies:
-    - duckdb: For database operations.
-    - json: For JSON data parsing.
+    - json: For serializing event payloads.
     - math: For mathematical operations.
     - re: For regular expression operations.
     - streamlit as st: For web application framework.
     - constants: For predefined constants.
+    - ollama_utils: For decoding the NDJSON API output.
+    - catalog_utils: For the problem catalog shared by every session.
+    - replica_utils: For the local replica and local database modes.
+    - tracing_utils: For timing database writes and initialization.
     - enum: For creating enumerations.
+    - uuid: For event and session ids.
 
 Classes:
     - DBOperationStatus(Enum): Represents the status of database operations.
+
+Labeling writes never update leetcode_problems in place: each one appends an event to
+the labeling_events table through a parameterized insert (shared with the write-behind
+writer in persistence_utils). The labeling_state table, periodically rebuilt from the
+events, is overlaid on the original rows by the leetcode_problems_current and
+leetcode_tests_current views that the app reads.
 """
 
-import duckdb
 import json
 import math
 import re
 import streamlit as st
+import uuid
 
 from constants import (
-    PROBLEM_COLUMNS,
-    TEST_COLUMNS,
+    DATABASE_MODE,
 )
 from enum import Enum
-from typing import List, Tuple
+from ollama_utils import (
+    CodeFenceDecoder,
+    iter_response_chunks,
+)
+from catalog_utils import (
+    ProblemCatalog,
+    SessionCatalog,
+)
+from replica_utils import (
+    connect_database,
+    ReplicaSync,
+)
+from tracing_utils import (
+    traced,
+)
+from typing import Dict, List, Tuple
 
 
 # enum to represent databse operation status
 class DBOperationStatus(Enum):
     SUCCESS = 1
     ERROR = 2
+    # queued by the write-behind writer, not yet durable
+    PENDING = 3
 
 
-# edge case handling
-def fix_quote(line: str) -> str:
+# parse the python code from API output
+@traced()
+def post_process_response(response: str) -> Tuple[str, str]:
     """
-    Handles edge cases in quotes within a given line.
+    Parses Python code from the given API output.
 
     Parameters:
-        line (str): The input line containing quotes.
+        response (str): The API output containing code information.
 
     Returns:
-        str: The modified line with corrected quotes.
+        Tuple[str, str]: The parsed Python code and its associated output.
     """
-    line = line.replace('"(""', '"("').replace('"")"', '")"')
-    return line
+    decoder = CodeFenceDecoder()
+    # json escapes line breaks, so every object sits on its own "\n" separated line
+    for chunk in iter_response_chunks(response.split("\n")):
+        if not chunk["done"]:
+            decoder.feed(chunk["response"])
+    decoder.close()
+    try:
+        return decoder.blocks[0], decoder.blocks[1]
+    except Exception as e:
+        print(e, decoder.blocks)
+        return None, None
 
 
-# parse the python code from API output
-def post_process_response(response: str) -> Tuple[str, str]:
+# append-only log of every labeling write
+# (payload holds the written fields, e.g. {"preference": 1})
+LABELING_EVENTS_TABLE = """
+CREATE TABLE IF NOT EXISTS labeling_events (
+    event_id VARCHAR,
+    problem_id INTEGER,
+    session_id VARCHAR,
+    action VARCHAR,
+    payload JSON,
+    created_at TIMESTAMP
+)
+"""
+
+# latest value of every field written through events, one row per problem
+# (rebuilt from the event log by compact_labeling_events)
+LABELING_STATE_QUERY = """
+SELECT
+    problem_id,
+    arg_max(payload->>'version1', created_at)
+        FILTER (WHERE payload->>'version1' IS NOT NULL) AS version1,
+    arg_max(payload->>'version2', created_at)
+        FILTER (WHERE payload->>'version2' IS NOT NULL) AS version2,
+    arg_max(CAST(payload->>'preference' AS INTEGER), created_at)
+        FILTER (WHERE payload->>'preference' IS NOT NULL) AS preference,
+    arg_max(payload->>'function_name', created_at)
+        FILTER (WHERE payload->>'function_name' IS NOT NULL) AS function_name,
+    max(created_at) AS updated_at
+FROM labeling_events
+GROUP BY problem_id
+"""
+
+# current state: the compacted events take precedence over the original rows
+CURRENT_STATE_VIEWS = [
     """
-    Parses Python code from the given API output.
+    CREATE OR REPLACE VIEW leetcode_problems_current AS
+    SELECT p.* REPLACE (
+        COALESCE(s.version1, p.version1) AS version1,
+        COALESCE(s.version2, p.version2) AS version2,
+        COALESCE(s.preference, p.preference) AS preference
+    )
+    FROM leetcode_problems p LEFT JOIN labeling_state s ON s.problem_id = p.id
+    """,
+    """
+    CREATE OR REPLACE VIEW leetcode_tests_current AS
+    SELECT t.* REPLACE (COALESCE(s.function_name, t.function_name) AS function_name)
+    FROM leetcode_tests t LEFT JOIN labeling_state s ON s.problem_id = t.id
+    """,
+]
+
+INSERT_LABELING_EVENT = "INSERT INTO labeling_events VALUES (?, ?, ?, ?, ?, now())"
+
+
+def labeling_event(id: int, session_id: str, action: str, payload: Dict) -> List:
+    """
+    Builds the parameters of a labeling event insert.
 
     Parameters:
-        response (str): The API output containing code information.
+        id (int): The ID of the LeetCode problem.
+        session_id (str): The labeling session writing the event.
+        action (str): The kind of write, e.g. "preference" or "code_pair".
+        payload (Dict): The written fields.
 
     Returns:
-        Tuple[str, str]: The parsed Python code and its associated output.
+        List: The parameters of INSERT_LABELING_EVENT.
+    """
+    return [uuid.uuid4().hex, int(id), session_id, action, json.dumps(payload)]
+
+
+def init_labeling_tables(connection) -> None:
+    """
+    Creates the event log, the compacted state table and the current state views
+    if they do not exist yet.
+
+    Parameters:
+        connection: The database connection.
+
+    Returns:
+        None
+    """
+    connection.execute(LABELING_EVENTS_TABLE)
+    connection.execute(
+        f"CREATE TABLE IF NOT EXISTS labeling_state AS {LABELING_STATE_QUERY}"
+    )
+    for view in CURRENT_STATE_VIEWS:
+        connection.execute(view)
+
+
+@traced()
+def compact_labeling_events(connection) -> Tuple[DBOperationStatus, str]:
+    """
+    Rebuilds the materialized current state from the event log. Readers only see
+    events written before the last compaction.
+
+    Parameters:
+        connection: The database connection.
+
+    Returns:
+        Tuple[DBOperationStatus, str]: The status of the database operation and a message.
     """
-    lines = [obj for obj in response.splitlines()]
-    res = []
-    prev_line = None
-    output = ""
-    for line in lines:
-        if line.endswith('"response":"'):
-            prev_line = line
-        else:
-            if prev_line:
-                line = prev_line + line
-                prev_line = None
-                output += "\n"
-
-            if line:
-                json_data = json.loads(fix_quote(line))
-                if not json_data["done"]:
-                    output += json_data["response"]
-            else:
-                output += line
-    outputs = output.split("```")
     try:
-        return outputs[1], outputs[3]
+        init_labeling_tables(connection)
+        connection.execute(
+            f"CREATE OR REPLACE TABLE labeling_state AS {LABELING_STATE_QUERY}"
+        )
+        return DBOperationStatus.SUCCESS, "Labeling events have been compacted!"
     except Exception as e:
-        print(e, output)
-        return None, None
+        return DBOperationStatus.ERROR, e
 
 
+def _record_event(connection, id, session_id, action, payload, message):
+    try:
+        connection.execute(
+            INSERT_LABELING_EVENT, labeling_event(id, session_id, action, payload)
+        )
+        return DBOperationStatus.SUCCESS, message
+    except Exception as e:
+        return DBOperationStatus.ERROR, e
+
+
+@traced()
 def record_code_and_preference(
-    connection, id: str, version1: str, version2: str, preference: int
+    connection,
+    id: int,
+    version1: str,
+    version2: str,
+    preference: int,
+    session_id: str = None,
 ) -> Tuple[DBOperationStatus, str]:
     """
     Saves a code pair and human preference to the database.
@@ -111,29 +239,25 @@ def record_code_and_preference(
         version1 (str): The first version of the code.
         version2 (str): The second version of the code.
         preference (int): The human preference between the two code versions.
+        session_id (str): The labeling session writing the event.
 
     Returns:
         Tuple[DBOperationStatus, str]: The status of the database operation and a message.
     """
-    try:
-        connection.sql(
-            f"""
-            UPDATE leetcode_problems 
-            SET version1='{version1}', 
-                version2='{version2}', 
-                preference={preference} 
-            where id={id}
-            """
-        )
-        return (
-            DBOperationStatus.SUCCESS,
-            "Code and preference has been recorded sucessfully!",
-        )
-    except Exception as e:
-        return DBOperationStatus.ERROR, e
-
-
-def record_preference_only(connection, id: int, preference: int):
+    return _record_event(
+        connection,
+        id,
+        session_id,
+        "code_and_preference",
+        {"version1": version1, "version2": version2, "preference": int(preference)},
+        "Code and preference has been recorded sucessfully!",
+    )
+
+
+@traced()
+def record_preference_only(
+    connection, id: int, preference: int, session_id: str = None
+):
     """
     Saves only the human preference to the database.
 
@@ -141,25 +265,24 @@ def record_preference_only(connection, id: int, preference: int):
         connection: The database connection.
         id (int): The ID of the LeetCode problem.
         preference (int): The human preference between the two code versions.
+        session_id (str): The labeling session writing the event.
 
     Returns:
         Tuple[DBOperationStatus, str]: The status of the database operation and a message.
     """
-    try:
-        connection.sql(
-            f"""
-            UPDATE leetcode_problems 
-            SET preference={preference} 
-            where id={id}
-            """
-        )
-        return DBOperationStatus.SUCCESS, "Preference has been recorded sucessfully!"
-    except Exception as e:
-        return DBOperationStatus.ERROR, e
+    return _record_event(
+        connection,
+        id,
+        session_id,
+        "preference",
+        {"preference": int(preference)},
+        "Preference has been recorded sucessfully!",
+    )
 
 
+@traced()
 def save_comparison(
-    connection, id: int, version1: str, version2: str
+    connection, id: int, version1: str, version2: str, session_id: str = None
 ) -> Tuple[DBOperationStatus, str]:
     """
     Saves only the code pair to the database.
@@ -169,22 +292,19 @@ def save_comparison(
         id (int): The ID of the LeetCode problem.
         version1 (str): The first version of the code.
         version2 (str): The second version of the code.
+        session_id (str): The labeling session writing the event.
 
     Returns:
         Tuple[DBOperationStatus, str]: The status of the database operation and a message.
     """
-    try:
-        connection.sql(
-            f"""
-            UPDATE leetcode_problems 
-            SET version1='{version1}', 
-                version2='{version2}'
-            where id={id}
-            """
-        )
-        return DBOperationStatus.SUCCESS, "Comparison has been save sucessfully!"
-    except Exception as e:
-        return DBOperationStatus.ERROR, e
+    return _record_event(
+        connection,
+        id,
+        session_id,
+        "code_pair",
+        {"version1": version1, "version2": version2},
+        "Comparison has been save sucessfully!",
+    )
 
 
 # extract function name from function signature
@@ -207,7 +327,8 @@ def extract_function_name(signature: str) -> str:
 
 
 # update function name when code is regenerated
-def update_function_name(connection, id, function_name):
+@traced()
+def update_function_name(connection, id, function_name, session_id=None):
     """
     Updates the function name in the database when the code is regenerated.
 
@@ -215,23 +336,115 @@ def update_function_name(connection, id, function_name):
         connection: The database connection.
         id (int): The ID of the LeetCode problem.
         function_name (str): The new function name.
+        session_id (str): The labeling session writing the event.
 
     Returns:
         Tuple[DBOperationStatus, str]: The status of the database operation and a message.
     """
+    return _record_event(
+        connection,
+        id,
+        session_id,
+        "function_name",
+        {"function_name": function_name},
+        "leetcode test has been updated sucessfully!",
+    )
+
+
+# per-case unit test results of every stored code version
+TEST_RESULTS_TABLE = """
+CREATE TABLE IF NOT EXISTS leetcode_test_results (
+    id INTEGER,
+    version VARCHAR,
+    code_hash VARCHAR,
+    test_hash VARCHAR,
+    case_index INTEGER,
+    status VARCHAR,
+    error VARCHAR,
+    wall_time DOUBLE,
+    cpu_time DOUBLE,
+    peak_memory BIGINT,
+    evaluated_at TIMESTAMP
+)
+"""
+
+
+@traced()
+def save_test_results(connection, results: List[Tuple]) -> Tuple[DBOperationStatus, str]:
+    """
+    Replaces the stored unit test results of code versions in bulk.
+
+    Parameters:
+        connection: The database connection.
+        results (List[Tuple]): Rows of (id, version, code_hash, test_hash, case_index,
+            status, error, wall_time, cpu_time, peak_memory). Previous results of
+            every (id, version) present are deleted first.
+
+    Returns:
+        Tuple[DBOperationStatus, str]: The status of the database operation and a message.
+    """
+    try:
+        connection.execute(TEST_RESULTS_TABLE)
+    except Exception as e:
+        return DBOperationStatus.ERROR, e
     try:
-        connection.sql(
-            f"""
-            UPDATE leetcode_tests 
-            SET function_name='{function_name}', 
-            where id={id}
+        connection.execute("BEGIN TRANSACTION")
+        connection.executemany(
+            "DELETE FROM leetcode_test_results WHERE id = ? AND version = ?",
+            sorted({(row[0], row[1]) for row in results}),
+        )
+        connection.executemany(
             """
+            INSERT INTO leetcode_test_results
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, now())
+            """,
+            results,
         )
-        return DBOperationStatus.SUCCESS, "leetcode test has been updated sucessfully!"
+        connection.execute("COMMIT")
+        return DBOperationStatus.SUCCESS, "Test results have been saved sucessfully!"
     except Exception as e:
+        connection.execute("ROLLBACK")
         return DBOperationStatus.ERROR, e
 
 
+# process-wide database connection, sessions work on their own cursors
+@st.cache_resource
+def get_database_connection():
+    """
+    Returns the database connection shared by every session of the app process,
+    to the database selected by DATABASE_MODE. In "replica" mode the local replica
+    starts syncing with the primary database in the background.
+
+    Parameters:
+        None
+
+    Returns:
+        duckdb.DuckDBPyConnection: The connection.
+    """
+    connection = connect_database(DATABASE_MODE)
+    init_labeling_tables(connection)
+    if DATABASE_MODE == "replica":
+        # pulled events only show up once compacted into the current state
+        ReplicaSync(connection, on_pull=compact_labeling_events)
+    return connection
+
+
+# process-wide read-only copy of the problems and unit tests
+@st.cache_resource
+def get_problem_catalog():
+    """
+    Returns the problem catalog shared by every session of the app process.
+
+    Parameters:
+        None
+
+    Returns:
+        ProblemCatalog: The catalog.
+    """
+    return ProblemCatalog(get_database_connection())
+
+
+@traced()
 def init_database():
     """
     Initializes the Streamlit app with data fetched from the database.
@@ -242,28 +455,31 @@ def init_database():
     Returns:
         None
     """
-    st.session_state.db_con = duckdb.connect("md:dpo")
-    # construct leetcode problems
-    st.session_state.problems = st.session_state.db_con.sql(
-        f"SELECT {','.join(PROBLEM_COLUMNS)} FROM leetcode_problems WHERE version1 IS NOT NULL"
-    ).df()
-    # construct leetcode unit tests
-    st.session_state.tests = st.session_state.db_con.sql(
-        f"SELECT {','.join(TEST_COLUMNS)} FROM leetcode_tests WHERE inputs IS NOT NULL"
-    ).df()
+    st.session_state.db_con = get_database_connection().cursor()
+    # labeling writes of this session are tagged with its id
+    st.session_state.session_id = uuid.uuid4().hex
+    # leetcode problems and unit tests, shared with the other sessions
+    st.session_state.problems = SessionCatalog(get_problem_catalog())
+    if not len(st.session_state.problems):
+        st.error(
+            f"No problems to label in the {DATABASE_MODE} database. A new local "
+            "database is only seeded when LOCAL_SEED_DATABASE_PATH points to a "
+            "database with the leetcode_problems and leetcode_tests tables."
+        )
+        st.stop()
     # initialize the first leetcode question to display
-    st.session_state.problem_count = len(st.session_state.problems.index)
+    st.session_state.problem_count = len(st.session_state.problems)
     st.session_state.initial_index = 0
     st.session_state.prompt_index = 0
-    st.session_state.version1 = st.session_state.problems["version1"][
-        st.session_state.initial_index
-    ]
-    st.session_state.version2 = st.session_state.problems["version2"][
-        st.session_state.initial_index
-    ]
-    st.session_state.preference = st.session_state.problems["preference"][
-        st.session_state.initial_index
-    ]
+    st.session_state.version1 = st.session_state.problems.get(
+        st.session_state.initial_index, "version1"
+    )
+    st.session_state.version2 = st.session_state.problems.get(
+        st.session_state.initial_index, "version2"
+    )
+    st.session_state.preference = st.session_state.problems.get(
+        st.session_state.initial_index, "preference"
+    )
     if type(st.session_state.version1) is float and math.isnan(
         st.session_state.version1
     ):
@@ -0,0 +1,209 @@
+"""
+Command-line exporter that writes every labeled LeetCode problem (a code pair with a
+preference) to a Parquet dataset partitioned by difficulty, which the DPO training
+loader reads directly (dataset "lc_local"). The candidate tournaments are exported
+alongside, one row per problem whose tournament is finished, with its candidates,
+their Bradley-Terry scores and the preference pairs the comparisons order (dataset
+"lc_ranked").
+
+Rows are streamed from DuckDB as Arrow record batches into the Parquet writer, so the
+export never materializes the whole table in Python objects. The labeling events are
+compacted first, so the export includes every preference recorded so far.
+
+Usage:
+    python export_preferences.py --output ../dpo_training/data/leetcode_preference
+
+Functions:
+    - export_preferences(connection, output: str, partition_by: List[str]) -> int:
+        Writes the labeled problems to a partitioned Parquet dataset.
+    - export_rankings(connection, output: str, partition_by: List[str]) -> int:
+        Writes the ranked candidates of every finished tournament to a partitioned
+        Parquet dataset.
+
+Dependencies:
+    - argparse: For command-line parsing.
+    - duckdb: For database operations.
+    - pyarrow: For writing the Parquet dataset.
+    - duckdb_utils: For compacting the labeling events.
+    - tournament_utils: For the candidate tournaments and their rankings.
+"""
+
+import argparse
+import duckdb
+import pyarrow as pa
+import pyarrow.dataset as ds
+import time
+
+from constants import (
+    DATABASE_MODE,
+    DATABASE_PATH,
+    EXPORT_BATCH_ROWS,
+    LOCAL_DATABASE_PATH,
+    PREFERENCE_EXPORT_COLUMNS,
+)
+from duckdb_utils import (
+    compact_labeling_events,
+    init_labeling_tables,
+    DBOperationStatus,
+)
+from tournament_utils import (
+    bradley_terry,
+    init_candidate_tables,
+    load_tournaments,
+    ranked_pairs,
+    swiss_pairings,
+)
+from typing import List
+
+
+def export_preferences(
+    connection, output: str, partition_by: List[str] = ["difficulty"]
+) -> int:
+    """
+    Writes the problems with a code pair and a preference to a Parquet dataset,
+    replacing the partitions written by a previous export.
+
+    Parameters:
+        connection: The database connection.
+        output (str): The dataset directory.
+        partition_by (List[str]): Columns the files are partitioned by (hive style).
+
+    Returns:
+        int: The number of exported problems.
+    """
+    reader = connection.execute(
+        f"""
+        SELECT {','.join(PREFERENCE_EXPORT_COLUMNS)} FROM leetcode_problems_current
+        WHERE preference IS NOT NULL
+            AND version1 IS NOT NULL
+            AND version2 IS NOT NULL
+        ORDER BY id
+        """
+    ).fetch_record_batch(EXPORT_BATCH_ROWS)
+    exported = 0
+
+    def count_rows(batches):
+        nonlocal exported
+        for batch in batches:
+            exported += batch.num_rows
+            yield batch
+
+    ds.write_dataset(
+        count_rows(reader),
+        output,
+        schema=reader.schema,
+        format="parquet",
+        partitioning=partition_by,
+        partitioning_flavor="hive",
+        existing_data_behavior="delete_matching",
+    )
+    return exported
+
+
+def export_rankings(
+    connection, output: str, partition_by: List[str] = ["difficulty"]
+) -> int:
+    """
+    Writes the candidates of every problem whose tournament is finished, with their
+    Bradley-Terry scores and the (preferred, other) pairs ordered by the comparisons,
+    to a Parquet dataset, replacing the partitions written by a previous export.
+    Tournaments still waiting for comparisons are left for a later export.
+
+    Parameters:
+        connection: The database connection.
+        output (str): The dataset directory.
+        partition_by (List[str]): Columns the files are partitioned by (hive style).
+
+    Returns:
+        int: The number of exported problems.
+    """
+    tournaments = {
+        id: tournament
+        for id, tournament in load_tournaments(connection).items()
+        if tournament.comparisons
+        and not swiss_pairings(len(tournament.candidates), tournament.comparisons)
+    }
+    if not tournaments:
+        return 0
+    problems = connection.execute(
+        """
+        SELECT id, difficulty, description FROM leetcode_problems_current
+        WHERE id IN (SELECT unnest(?)) ORDER BY id
+        """,
+        [list(tournaments)],
+    ).fetchall()
+    rows = {
+        "id": [],
+        "difficulty": [],
+        "description": [],
+        "candidates": [],
+        "scores": [],
+        "pairs": [],
+        "comparisons": [],
+    }
+    for id, difficulty, description in problems:
+        tournament = tournaments[id]
+        rows["id"].append(id)
+        rows["difficulty"].append(difficulty)
+        rows["description"].append(description)
+        rows["candidates"].append(tournament.candidates)
+        scores = bradley_terry(len(tournament.candidates), tournament.comparisons)
+        rows["scores"].append(scores.tolist())
+        rows["pairs"].append(
+            [
+                list(pair)
+                for pair in ranked_pairs(
+                    len(tournament.candidates), tournament.comparisons
+                )
+            ]
+        )
+        rows["comparisons"].append(len(tournament.comparisons))
+    table = pa.table(rows)
+    ds.write_dataset(
+        table,
+        output,
+        format="parquet",
+        partitioning=partition_by,
+        partitioning_flavor="hive",
+        existing_data_behavior="delete_matching",
+    )
+    return table.num_rows
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Export labeled LeetCode problems to a partitioned Parquet dataset."
+    )
+    parser.add_argument(
+        "--database",
+        default=DATABASE_PATH if DATABASE_MODE == "remote" else LOCAL_DATABASE_PATH,
+    )
+    parser.add_argument("--output", default="../dpo_training/data/leetcode_preference")
+    parser.add_argument(
+        "--rankings-output", default="../dpo_training/data/leetcode_ranking"
+    )
+    parser.add_argument(
+        "--partition-by",
+        nargs="*",
+        default=["difficulty"],
+        help="columns the files are partitioned by",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    started = time.monotonic()
+    connection = duckdb.connect(args.database)
+    init_labeling_tables(connection)
+    init_candidate_tables(connection)
+    status, message = compact_labeling_events(connection)
+    if status == DBOperationStatus.ERROR:
+        print(f"failed to compact labeling events: {message}")
+    exported = export_preferences(connection, args.output, args.partition_by)
+    ranked = export_rankings(connection, args.rankings_output, args.partition_by)
+    print(
+        f"exported {exported} labeled problems to {args.output} and "
+        f"{ranked} ranked problems to {args.rankings_output} "
+        f"in {time.monotonic() - started:.1f}s"
+    )
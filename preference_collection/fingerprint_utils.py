@@ -0,0 +1,456 @@
+"""
+This module detects near-duplicate solutions, so labelers are not asked to compare
+two versions that only differ in variable names, comments or formatting.
+
+A solution is first canonicalized: it is parsed, every identifier it binds (functions,
+classes, arguments, variables) is renamed to v0, v1, ... in order of appearance,
+docstrings are dropped and the tree is unparsed again, which also drops comments and
+normalizes whitespace. The canonical tokens are then cut into overlapping shingles and
+summarized by a MinHash signature, whose share of equal entries estimates the Jaccard
+similarity of the shingle sets of two solutions.
+
+The fingerprints of every stored code version are kept in the code_fingerprints table
+(see batch_fingerprint.py). Each signature is also split into bands, and solutions
+sharing a band are the candidates compared when looking for duplicates in bulk, within
+and across problems, instead of comparing every pair of solutions.
+
+Functions:
+    - code_tokens(code: str) -> List[str]:
+        Tokenizes a code snippet without comments, blank lines and indentation.
+    - canonicalize_code(code: str) -> str:
+        Returns the code with canonical identifiers and without comments and docstrings.
+    - fingerprint(code: str) -> CodeFingerprint:
+        Returns the canonical hash and MinHash signature of a code snippet.
+    - similarity(first: CodeFingerprint, second: CodeFingerprint) -> float:
+        Estimates the similarity of two fingerprinted snippets.
+    - pair_similarity(version1: str, version2: str) -> float:
+        Estimates the similarity of the two versions of a code pair.
+    - is_duplicate_pair(version1: str, version2: str) -> bool:
+        Checks whether the two versions of a code pair are the same canonical code.
+    - band_keys(signature: np.ndarray, bands: int) -> List[int]:
+        Hashes the bands of a signature for the bulk duplicate search.
+    - init_fingerprint_tables(connection) -> None:
+        Creates the fingerprint index if it does not exist yet.
+    - save_fingerprints(connection, rows: List[Tuple]) -> Tuple[DBOperationStatus, str]:
+        Replaces the indexed fingerprints of code versions in bulk.
+    - find_duplicate_pairs(connection, threshold: float) -> List[Dict]:
+        Returns the indexed code versions that are near-duplicates of each other.
+
+Classes:
+    - CodeFingerprint: The canonical hash and MinHash signature of a code snippet.
+
+Dependencies:
+    - ast: For canonicalizing solutions.
+    - builtins: For the names that are never renamed.
+    - functools: For caching the fingerprints of displayed solutions.
+    - hashlib: For hashing shingles, canonical code and bands.
+    - io, textwrap, tokenize: For tokenizing solutions.
+    - numpy: For computing and comparing signatures.
+    - duckdb_utils: For the operation status.
+"""
+
+import ast
+import builtins
+import functools
+import hashlib
+import io
+import numpy as np
+import textwrap
+import tokenize
+
+from constants import (
+    DUPLICATE_SIMILARITY_THRESHOLD,
+    FINGERPRINT_CACHE_SIZE,
+    MINHASH_BANDS,
+    MINHASH_PERMUTATIONS,
+    MINHASH_SHINGLE_SIZE,
+)
+from duckdb_utils import (
+    DBOperationStatus,
+)
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+
+# fingerprints of every stored code version, one row per (problem, version)
+FINGERPRINTS_TABLE = """
+CREATE TABLE IF NOT EXISTS code_fingerprints (
+    id INTEGER,
+    version VARCHAR,
+    code_hash VARCHAR,
+    canonical_hash VARCHAR,
+    signature BIGINT[],
+    bands BIGINT[],
+    indexed_at TIMESTAMP
+)
+"""
+
+# tokens that do not change what a snippet does
+_IGNORED_TOKENS = {
+    tokenize.COMMENT,
+    tokenize.NL,
+    tokenize.NEWLINE,
+    tokenize.INDENT,
+    tokenize.DEDENT,
+    tokenize.ENCODING,
+    tokenize.ENDMARKER,
+}
+
+# names a solution uses without binding them
+_BUILTIN_NAMES = frozenset(dir(builtins))
+
+# MinHash hash functions h(x) = (a * x + b) mod p over 31-bit shingle hashes; the
+# seed is fixed so signatures stored in the index stay comparable across runs
+_MINHASH_PRIME = np.uint64(2**31 - 1)
+_rng = np.random.default_rng(2024)
+_MINHASH_A = _rng.integers(1, 2**31 - 1, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_MINHASH_B = _rng.integers(0, 2**31 - 1, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+class CodeFingerprint(NamedTuple):
+    """
+    The canonical hash and MinHash signature of a code snippet.
+    """
+
+    canonical_hash: str
+    signature: np.ndarray
+
+
+class _Canonicalizer(ast.NodeTransformer):
+    # renames the identifiers bound by a solution in order of appearance, leaving
+    # builtins, imported modules and attributes alone
+
+    def __init__(self, kept_names):
+        self._kept_names = kept_names
+        self._names = {}
+
+    def _rename(self, name: str) -> str:
+        if name in self._kept_names:
+            return name
+        return self._names.setdefault(name, f"v{len(self._names)}")
+
+    def _strip_docstring(self, node):
+        body = node.body
+        if (
+            body
+            and isinstance(body[0], ast.Expr)
+            and isinstance(body[0].value, ast.Constant)
+            and isinstance(body[0].value.value, str)
+        ):
+            node.body = body[1:] or [ast.Pass()]
+
+    def visit_Module(self, node):
+        self._strip_docstring(node)
+        return self.generic_visit(node)
+
+    def _visit_definition(self, node):
+        node.name = self._rename(node.name)
+        self._strip_docstring(node)
+        return self.generic_visit(node)
+
+    visit_FunctionDef = _visit_definition
+    visit_AsyncFunctionDef = _visit_definition
+    visit_ClassDef = _visit_definition
+
+    def visit_arg(self, node):
+        node.arg = self._rename(node.arg)
+        return self.generic_visit(node)
+
+    def visit_Name(self, node):
+        node.id = self._rename(node.id)
+        return node
+
+    def visit_ExceptHandler(self, node):
+        if node.name:
+            node.name = self._rename(node.name)
+        return self.generic_visit(node)
+
+    def _visit_scope_declaration(self, node):
+        node.names = [self._rename(name) for name in node.names]
+        return node
+
+    visit_Global = _visit_scope_declaration
+    visit_Nonlocal = _visit_scope_declaration
+
+
+def code_tokens(code: str) -> List[str]:
+    """
+    Tokenizes a code snippet, leaving out comments, blank lines and indentation.
+
+    Parameters:
+        code (str): The code snippet.
+
+    Returns:
+        List[str]: The tokens, or the whitespace-separated words if the snippet
+            does not tokenize.
+    """
+    try:
+        return [
+            token.string
+            for token in tokenize.generate_tokens(io.StringIO(code).readline)
+            if token.type not in _IGNORED_TOKENS
+        ]
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return code.split()
+
+
+def canonicalize_code(code: str) -> str:
+    """
+    Returns a code snippet with canonical identifiers and formatting, so solutions
+    differing only in naming, comments, docstrings or whitespace are identical.
+
+    Parameters:
+        code (str): The code snippet.
+
+    Returns:
+        str: The canonical code, or its space-separated tokens if it does not parse.
+    """
+    try:
+        tree = ast.parse(textwrap.dedent(code))
+    except (SyntaxError, ValueError):
+        return " ".join(code_tokens(code))
+    imported = {
+        (alias.asname or alias.name).split(".")[0]
+        for node in ast.walk(tree)
+        if isinstance(node, (ast.Import, ast.ImportFrom))
+        for alias in node.names
+    }
+    tree = _Canonicalizer(_BUILTIN_NAMES | imported).visit(tree)
+    return ast.unparse(tree)
+
+
+def _shingle_hashes(tokens: List[str]) -> np.ndarray:
+    # snippets shorter than a shingle are a single shingle
+    size = min(MINHASH_SHINGLE_SIZE, len(tokens))
+    shingles = {
+        "\x00".join(tokens[start : start + size])
+        for start in range(len(tokens) - size + 1)
+    }
+    return np.array(
+        [
+            int.from_bytes(
+                hashlib.blake2b(shingle.encode(), digest_size=4).digest(), "little"
+            )
+            for shingle in shingles
+        ],
+        dtype=np.uint64,
+    )
+
+
+# snippets are fingerprinted again on every rerun of the app showing them
+@functools.lru_cache(maxsize=FINGERPRINT_CACHE_SIZE)
+def fingerprint(code: str) -> CodeFingerprint:
+    """
+    Returns the canonical hash and MinHash signature of a code snippet.
+
+    Parameters:
+        code (str): The code snippet.
+
+    Returns:
+        CodeFingerprint: The fingerprint. Its signature must not be modified, as
+            fingerprints are cached.
+    """
+    canonical = canonicalize_code(code)
+    canonical_hash = hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    hashes = _shingle_hashes(code_tokens(canonical)) % _MINHASH_PRIME
+    if not len(hashes):
+        return CodeFingerprint(
+            canonical_hash, np.full(MINHASH_PERMUTATIONS, _MINHASH_PRIME)
+        )
+    # a and x are below 2**31, so a * x + b does not overflow 64 bits
+    signature = (
+        (np.outer(_MINHASH_A, hashes) + _MINHASH_B[:, None]) % _MINHASH_PRIME
+    ).min(axis=1)
+    return CodeFingerprint(canonical_hash, signature)
+
+
+def similarity(first: CodeFingerprint, second: CodeFingerprint) -> float:
+    """
+    Estimates the Jaccard similarity of the canonical shingles of two snippets.
+
+    Parameters:
+        first (CodeFingerprint): The fingerprint of the first snippet.
+        second (CodeFingerprint): The fingerprint of the second snippet.
+
+    Returns:
+        float: 1.0 for identical canonical code, otherwise the share of equal
+            signature entries.
+    """
+    if first.canonical_hash == second.canonical_hash:
+        return 1.0
+    return float(np.mean(first.signature == second.signature))
+
+
+def pair_similarity(version1: Optional[str], version2: Optional[str]) -> float:
+    """
+    Estimates the similarity of the two versions of a code pair.
+
+    Parameters:
+        version1 (str): The first version.
+        version2 (str): The second version.
+
+    Returns:
+        float: The similarity between 0 and 1, 0 if a version is missing.
+    """
+    if not version1 or not version2:
+        return 0.0
+    return similarity(fingerprint(version1), fingerprint(version2))
+
+
+def is_duplicate_pair(version1: Optional[str], version2: Optional[str]) -> bool:
+    """
+    Checks whether the two versions of a code pair are the same canonical code, i.e.
+    differ only in naming, comments, docstrings or formatting. Similar versions that
+    differ in anything else, even a single operator, are not duplicates: they may
+    behave differently and are then the most informative pairs to label.
+
+    Parameters:
+        version1 (str): The first version.
+        version2 (str): The second version.
+
+    Returns:
+        bool: Whether the pair would waste a labeler decision.
+    """
+    if not version1 or not version2:
+        return False
+    return fingerprint(version1).canonical_hash == fingerprint(version2).canonical_hash
+
+
+def band_keys(signature: np.ndarray, bands: int = MINHASH_BANDS) -> List[int]:
+    """
+    Hashes the bands of a signature. Two snippets share a band key with probability
+    1 - (1 - s**r)**bands for similarity s and r = len(signature) / bands rows per
+    band, so near-duplicates almost always share one and dissimilar snippets rarely do.
+
+    Parameters:
+        signature (np.ndarray): The MinHash signature.
+        bands (int): The number of bands.
+
+    Returns:
+        List[int]: One 56-bit key per band, distinct across band positions.
+    """
+    rows = len(signature) // bands
+    return [
+        int.from_bytes(
+            hashlib.blake2b(
+                band.to_bytes(2, "little")
+                + signature[band * rows : (band + 1) * rows].astype("<u8").tobytes(),
+                digest_size=7,
+            ).digest(),
+            "little",
+        )
+        for band in range(bands)
+    ]
+
+
+def init_fingerprint_tables(connection) -> None:
+    """
+    Creates the fingerprint index if it does not exist yet.
+
+    Parameters:
+        connection: The database connection.
+
+    Returns:
+        None
+    """
+    connection.execute(FINGERPRINTS_TABLE)
+
+
+def save_fingerprints(connection, rows: List[Tuple]) -> Tuple[DBOperationStatus, str]:
+    """
+    Replaces the indexed fingerprints of code versions in bulk.
+
+    Parameters:
+        connection: The database connection.
+        rows (List[Tuple]): Rows of (id, version, code_hash, code). Previous
+            fingerprints of every (id, version) present are deleted first.
+
+    Returns:
+        Tuple[DBOperationStatus, str]: The status of the database operation and a message.
+    """
+    try:
+        init_fingerprint_tables(connection)
+        indexed = []
+        for id, version, code_hash, code in rows:
+            canonical_hash, signature = fingerprint(code)
+            indexed.append(
+                [
+                    id,
+                    version,
+                    code_hash,
+                    canonical_hash,
+                    signature.tolist(),
+                    band_keys(signature),
+                ]
+            )
+    except Exception as e:
+        return DBOperationStatus.ERROR, e
+    try:
+        connection.execute("BEGIN TRANSACTION")
+        connection.executemany(
+            "DELETE FROM code_fingerprints WHERE id = ? AND version = ?",
+            sorted({(row[0], row[1]) for row in rows}),
+        )
+        connection.executemany(
+            "INSERT INTO code_fingerprints VALUES (?, ?, ?, ?, ?, ?, now())", indexed
+        )
+        connection.execute("COMMIT")
+        return DBOperationStatus.SUCCESS, f"{len(rows)} fingerprints have been saved."
+    except Exception as e:
+        connection.execute("ROLLBACK")
+        return DBOperationStatus.ERROR, e
+
+
+def find_duplicate_pairs(
+    connection, threshold: float = DUPLICATE_SIMILARITY_THRESHOLD
+) -> List[Dict]:
+    """
+    Returns the indexed code versions that are near-duplicates of each other, the
+    two versions of a problem as well as versions of different problems. Only the
+    versions sharing a signature band are compared.
+
+    Parameters:
+        connection: The database connection.
+        threshold (float): Similarity from which two versions are the same solution.
+
+    Returns:
+        List[Dict]: One row per duplicate pair with id1, version1, id2, version2,
+            similarity and same_problem, most similar first.
+    """
+    init_fingerprint_tables(connection)
+    candidates = connection.execute(
+        """
+        WITH band_rows AS (
+            SELECT id, version, unnest(bands) AS band FROM code_fingerprints
+        )
+        SELECT DISTINCT a.id, a.version, b.id, b.version
+        FROM band_rows a JOIN band_rows b
+            ON a.band = b.band
+            AND (a.id < b.id OR (a.id = b.id AND a.version < b.version))
+        """
+    ).fetchall()
+    if not candidates:
+        return []
+    fingerprints = {
+        (id, version): CodeFingerprint(
+            canonical_hash, np.array(signature, dtype=np.uint64)
+        )
+        for id, version, canonical_hash, signature in connection.execute(
+            "SELECT id, version, canonical_hash, signature FROM code_fingerprints"
+        ).fetchall()
+    }
+    duplicates = []
+    for id1, version1, id2, version2 in candidates:
+        score = similarity(fingerprints[id1, version1], fingerprints[id2, version2])
+        if score >= threshold:
+            duplicates.append(
+                {
+                    "id1": id1,
+                    "version1": version1,
+                    "id2": id2,
+                    "version2": version2,
+                    "similarity": score,
+                    "same_problem": id1 == id2,
+                }
+            )
+    duplicates.sort(key=lambda row: (-row["similarity"], row["id1"], row["id2"]))
+    return duplicates
@@ -0,0 +1,87 @@
+"""
+Command-line report of labeler throughput: p50/p90 decision latency per labeler,
+difficulty and problem (the slowest problems first), and labels per hour.
+
+Usage:
+    python labeling_report.py --top 20
+    python labeling_report.py --output reports/
+
+Functions:
+    - run_report(args: argparse.Namespace) -> None:
+        Prints the report and optionally writes every table to CSV.
+
+Dependencies:
+    - argparse: For command-line parsing.
+    - duckdb: For database operations.
+    - analytics_utils: For the decision views.
+"""
+
+import argparse
+import duckdb
+import os
+
+from analytics_utils import (
+    fetch_decision_report,
+    init_analytics_views,
+)
+from constants import (
+    DATABASE_MODE,
+    DATABASE_PATH,
+    LOCAL_DATABASE_PATH,
+)
+
+
+# report sections: title and view
+REPORT_SECTIONS = [
+    ("Decision latency per labeler", "decision_latency_by_labeler"),
+    ("Decision latency per difficulty", "decision_latency_by_difficulty"),
+    ("Slowest problems", "decision_latency_by_problem"),
+    ("Labels per hour", "labels_per_hour"),
+]
+
+
+def run_report(args: argparse.Namespace) -> None:
+    """
+    Prints the decision latency and throughput tables.
+
+    Parameters:
+        args (argparse.Namespace): The parsed command-line arguments.
+
+    Returns:
+        None
+    """
+    connection = duckdb.connect(args.database)
+    init_analytics_views(connection)
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+    for title, view in REPORT_SECTIONS:
+        # every row is written to CSV, only the top ones are printed
+        table = fetch_decision_report(connection, view)
+        print(f"\n{title}")
+        if table.empty:
+            print("no decisions recorded yet")
+        else:
+            print(
+                table.head(args.top).to_string(
+                    index=False, float_format="{:.1f}".format
+                )
+            )
+        if args.output:
+            table.to_csv(os.path.join(args.output, f"{view}.csv"), index=False)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Report labeler decision latency and throughput."
+    )
+    parser.add_argument(
+        "--database",
+        default=DATABASE_PATH if DATABASE_MODE == "remote" else LOCAL_DATABASE_PATH,
+    )
+    parser.add_argument("--top", type=int, default=20, help="rows printed per table")
+    parser.add_argument("--output", help="directory the tables are written to as CSV")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    run_report(parse_args())
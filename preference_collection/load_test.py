@@ -0,0 +1,316 @@
+"""
+Command-line load test that drives concurrent simulated labelers through the
+callbacks of the Streamlit app (call_codellama, on_submit_preference_only,
+on_change_question) against a local DuckDB file and a mock Ollama server, then
+reports the throughput and the p50/p95/p99 latency of every traced operation.
+
+Every labeler runs on its own thread with its own session state, like a browser
+session of the app, while the connection, catalog, writer and caches are the
+process-wide ones every session shares. A labeler repeatedly waits a think time,
+sometimes regenerates the code pair or moves to another question, and submits a
+preference. An empty database is seeded with synthetic problems and unit tests.
+
+Usage:
+    python load_test.py --labelers 20 --duration 60
+    python load_test.py --labelers 8 --endpoint http://gpu-box:11434/api/generate
+
+Functions:
+    - seed_problems(connection, count: int) -> int:
+        Fills an empty database with synthetic problems, code pairs and unit tests.
+    - run_labeler(index: int, args: argparse.Namespace, deadline: float, results: Dict) -> None:
+        Simulates one labeler until the deadline.
+    - run_load_test(args: argparse.Namespace) -> None:
+        Runs the labelers and prints the report.
+
+Classes:
+    - ThreadLocalSessionState: Session state with separate values on every thread.
+
+Dependencies:
+    - argparse: For command-line parsing.
+    - threading: For the concurrent labelers.
+    - mock_ollama: For the mock generation endpoint.
+    - preference_selection_panel: For the app callbacks.
+    - tracing_utils: For the per-operation latencies.
+"""
+
+import argparse
+import os
+import random
+import threading
+import time
+
+from collections import Counter
+from mock_ollama import (
+    MockOllamaServer,
+    load_responses,
+    synthetic_response,
+)
+from typing import Dict
+
+
+class ThreadLocalSessionState(threading.local):
+    """
+    Stand-in for `st.session_state` outside of a Streamlit server, where it would be
+    one object shared by every thread. Each labeler thread sees its own values.
+    """
+
+    def __contains__(self, key):
+        return key in self.__dict__
+
+    def __getitem__(self, key):
+        return self.__dict__[key]
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        return self.__dict__.get(key, default)
+
+
+def seed_problems(connection, count: int) -> int:
+    """
+    Fills a database without problems with synthetic ones: each has a code pair
+    from the mock's synthetic responses and unit tests of `solve(x) == x + 1`.
+
+    Parameters:
+        connection: The database connection.
+        count (int): The number of problems.
+
+    Returns:
+        int: The number of seeded problems, 0 if the database already had problems.
+    """
+    from ollama_utils import CodeFenceDecoder
+
+    (existing,) = connection.execute(
+        "SELECT count(*) FROM leetcode_problems"
+    ).fetchone()
+    if existing:
+        return 0
+    difficulties = ["Easy", "Medium", "Hard"]
+    problems = []
+    for id in range(1, count + 1):
+        description = f"Problem {id}: return x + 1 for an integer x."
+        decoder = CodeFenceDecoder()
+        version1, version2 = decoder.feed(synthetic_response(description, id))[:2]
+        problems.append(
+            [
+                id,
+                difficulties[id % 3],
+                f"Synthetic problem {id}",
+                description,
+                version1,
+                version2,
+                None,
+            ]
+        )
+    connection.executemany(
+        "INSERT INTO leetcode_problems VALUES (?, ?, ?, ?, ?, ?, ?)", problems
+    )
+    connection.executemany(
+        "INSERT INTO leetcode_tests VALUES (?, ?, ?, ?)",
+        [[id, "solve", ["(1)", "(5)"], ["(2)", "(6)"]] for id in range(1, count + 1)],
+    )
+    return count
+
+
+# time a callback of the app as a span of a load test operation
+def _timed(results, name, callback, *args):
+    from tracing_utils import span
+
+    try:
+        with span(f"load.{name}"):
+            callback(*args)
+    except Exception:
+        results["errors"][name] += 1
+    else:
+        results["operations"][name] += 1
+
+
+def run_labeler(index: int, args: argparse.Namespace, deadline: float, results: Dict):
+    """
+    Simulates one labeler of the app until the deadline.
+
+    Parameters:
+        index (int): The labeler number, which seeds its random choices.
+        args (argparse.Namespace): The load test settings.
+        deadline (float): The time.monotonic() at which the labeler stops.
+        results (Dict): Operation and error counters shared by the labelers, and
+            the write futures of the submissions.
+
+    Returns:
+        None
+    """
+    import streamlit as st
+    from ollama_utils import default_instruction
+    from preference_selection_panel import (
+        call_codellama,
+        init_session,
+        mark_pair_displayed,
+        on_change_question,
+        on_submit_preference_only,
+    )
+
+    rng = random.Random(args.seed + index)
+    # set by the sidebar's inputs in the app
+    st.session_state.instruction = default_instruction()
+    st.session_state.labeler_name = f"labeler-{index}"
+    _timed(results, "init_session", init_session)
+    while time.monotonic() < deadline:
+        # the app displays the pair at the end of every rerun
+        mark_pair_displayed()
+        if args.think_time:
+            time.sleep(rng.expovariate(1 / args.think_time))
+        if st.session_state.get("version1") is None:
+            _timed(results, "generate", call_codellama)
+        elif rng.random() < args.regenerate_rate:
+            _timed(results, "regenerate", call_codellama, True)
+        if rng.random() < args.navigate_rate:
+            _timed(results, "change_question", on_change_question, rng.choice((-1, 1)))
+        mark_pair_displayed()
+        _timed(results, "submit", on_submit_preference_only, rng.choice((1, 2)))
+        # acknowledged by the writer in the background, checked once it is closed
+        with results["lock"]:
+            results["writes"].extend(st.session_state.pending_writes)
+        st.session_state.pending_writes = []
+
+
+def run_load_test(args: argparse.Namespace) -> None:
+    """
+    Runs the simulated labelers for the configured duration and prints their
+    throughput and the latency percentiles of every traced operation.
+
+    Parameters:
+        args (argparse.Namespace): The load test settings.
+
+    Returns:
+        None
+    """
+    server = None
+    if args.endpoint is None:
+        server = MockOllamaServer(
+            port=0,
+            token_rate=args.token_rate,
+            first_token_latency=args.latency,
+            responses=load_responses(args.responses) if args.responses else None,
+        ).start()
+    # constants.py reads these when first imported, so they are set before the app
+    # modules are imported below
+    os.environ["DATABASE_MODE"] = "local"
+    os.environ["LOCAL_DATABASE_PATH"] = args.database
+    os.environ["CACHE_DATABASE_PATH"] = args.cache_database
+    os.environ["OLLAMA_API_ENDPOINT"] = args.endpoint or server.endpoint
+
+    import streamlit
+    import streamlit.logger
+
+    # calls outside of a Streamlit server warn about the missing script context
+    # (the config is parsed first, as parsing it resets the log level)
+    streamlit.config.get_option("logger.level")
+    streamlit.logger.set_log_level("error")
+    # every labeler thread gets its own session, as if in its own browser tab
+    streamlit.session_state = ThreadLocalSessionState()
+
+    from duckdb_utils import DBOperationStatus, get_database_connection
+    from preference_selection_panel import _get_writer
+    from tracing_utils import get_tracer
+
+    seeded = seed_problems(get_database_connection(), args.problems)
+    if seeded:
+        print(f"seeded {seeded} synthetic problems into {args.database}")
+
+    results = {
+        "operations": Counter(),
+        "errors": Counter(),
+        "writes": [],
+        "lock": threading.Lock(),
+    }
+    started = time.monotonic()
+    deadline = started + args.duration
+    labelers = [
+        threading.Thread(
+            target=run_labeler,
+            args=(index, args, deadline, results),
+            name=f"labeler-{index}",
+        )
+        for index in range(args.labelers)
+    ]
+    for labeler in labelers:
+        labeler.start()
+    for labeler in labelers:
+        labeler.join()
+    elapsed = time.monotonic() - started
+    _get_writer().close()
+    if server is not None:
+        server.stop()
+
+    failed_writes = sum(
+        future.result()[0] == DBOperationStatus.ERROR for future in results["writes"]
+    )
+    operations = sum(results["operations"].values())
+    labels = results["operations"]["submit"]
+    print(
+        f"{args.labelers} labelers for {elapsed:.1f}s: "
+        f"{operations / elapsed:.1f} operations/s, "
+        f"{labels * 60 / elapsed:.1f} labels/min, "
+        f"{sum(results['errors'].values())} failed operations, "
+        f"{failed_writes} failed writes"
+    )
+    print(
+        f"{'operation':<28}{'count':>8}{'errors':>8}"
+        f"{'p50_ms':>10}{'p95_ms':>10}{'p99_ms':>10}{'max_ms':>10}"
+    )
+    tracer = get_tracer()
+    for row in tracer.summary():
+        print(
+            f"{row['operation']:<28}{row['count']:>8}{row['errors']:>8}"
+            f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+            f"{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}"
+        )
+    if args.export:
+        print(f"exported {tracer.export_jsonl(args.export)} spans to {args.export}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Load test the labeling app with concurrent simulated labelers."
+    )
+    parser.add_argument("--labelers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument(
+        "--think-time",
+        type=float,
+        default=1.0,
+        help="mean seconds a labeler spends on a pair before acting",
+    )
+    parser.add_argument(
+        "--regenerate-rate",
+        type=float,
+        default=0.3,
+        help="share of pairs regenerated before the preference is submitted",
+    )
+    parser.add_argument(
+        "--navigate-rate",
+        type=float,
+        default=0.1,
+        help="share of pairs left for the previous or next question",
+    )
+    parser.add_argument("--problems", type=int, default=500)
+    parser.add_argument("--database", default="load_test.duckdb")
+    parser.add_argument("--cache-database", default="load_test_cache.duckdb")
+    parser.add_argument(
+        "--endpoint", help="ollama api endpoint (a mock server is started if omitted)"
+    )
+    parser.add_argument(
+        "--token-rate", type=float, default=40.0, help="tokens/s of the mock server"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.5, help="first-token seconds of the mock"
+    )
+    parser.add_argument("--responses", help="JSONL file of canned mock responses")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--export", help="JSONL file the recorded spans are written to")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    run_load_test(parse_args())
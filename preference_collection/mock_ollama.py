@@ -0,0 +1,275 @@
+"""
+Local stand-in for Ollama's /api/generate endpoint, for load tests and development
+without a GPU box. Responses are streamed as chunked NDJSON like Ollama's, at a
+configurable token rate after a configurable first-token latency, and are either
+replayed from a JSONL file of canned responses or synthesized: two fenced
+`solve(x)` solutions whose code depends on the prompt and the sampling seed.
+
+Usage:
+    python mock_ollama.py --port 11435 --token-rate 40 --latency 0.5
+    OLLAMA_API_ENDPOINT=http://localhost:11435/api/generate streamlit run code_generation_app.py
+
+Functions:
+    - load_responses(path: str) -> List[str]:
+        Reads canned responses from a JSONL file.
+    - synthetic_response(prompt: str, seed: Optional[int]) -> str:
+        Returns a completion with two fenced solutions derived from the prompt and seed.
+    - split_tokens(text: str) -> List[str]:
+        Splits a response into the word-sized tokens it is streamed in.
+
+Classes:
+    - MockOllamaServer: Threaded HTTP server answering /api/generate requests.
+
+Dependencies:
+    - http.server: For serving the requests.
+    - threading: For serving in the background.
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+
+# synthetic solutions, filled in with a prompt and seed dependent offset
+SYNTHETIC_SOLUTIONS = [
+    "def solve(x):\n    return x + {offset}\n",
+    (
+        "def solve(x):\n    result = x\n"
+        "    for _ in range({offset}):\n        result += 1\n    return result\n"
+    ),
+    "def solve(x):\n    values = [x, {offset}]\n    return sum(values)\n",
+]
+
+
+def load_responses(path: str) -> List[str]:
+    """
+    Reads canned responses from a JSONL file, one {"response": ...} object per line.
+
+    Parameters:
+        path (str): The JSONL file.
+
+    Returns:
+        List[str]: The responses.
+    """
+    with open(path) as file:
+        return [json.loads(line)["response"] for line in file if line.strip()]
+
+
+def _digest(prompt: str, seed: Optional[int]) -> int:
+    return int(hashlib.sha256(f"{seed}:{prompt}".encode()).hexdigest(), 16)
+
+
+def synthetic_response(prompt: str, seed: Optional[int] = None) -> str:
+    """
+    Returns a completion with two fenced solutions, so it decodes as a code pair in
+    "single" generation mode and as one solution in "concurrent" mode. The same prompt
+    and seed always give the same completion.
+
+    Parameters:
+        prompt (str): The prompt.
+        seed (int): The sampling seed of the request.
+
+    Returns:
+        str: The completion.
+    """
+    digest = _digest(prompt, seed)
+    solutions = []
+    for _ in range(2):
+        digest, template = divmod(digest, len(SYNTHETIC_SOLUTIONS))
+        digest, offset = divmod(digest, 3)
+        solutions.append(SYNTHETIC_SOLUTIONS[template].format(offset=offset))
+    return (
+        f"Here is a solution:\n```\n{solutions[0]}```\n"
+        f"And another one:\n```\n{solutions[1]}```\n"
+    )
+
+
+def split_tokens(text: str) -> List[str]:
+    """
+    Splits a response into word-sized tokens, each with its trailing whitespace.
+
+    Parameters:
+        text (str): The response.
+
+    Returns:
+        List[str]: The tokens, which join back into the response.
+    """
+    return re.findall(r"\s+|\S+\s*", text)
+
+
+class _GenerateHandler(BaseHTTPRequestHandler):
+    # keep-alive, so the app's pooled session reuses its connections
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _write_chunk(self, payload: dict) -> None:
+        line = (json.dumps(payload) + "\n").encode()
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.flush()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path != "/api/generate":
+            self.send_error(404)
+            return
+        request = json.loads(body)
+        started = time.monotonic()
+        mock = self.server.mock
+        response = mock.response(
+            request.get("prompt", ""), request.get("options", {}).get("seed")
+        )
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        tokens = split_tokens(response)
+        try:
+            time.sleep(mock.first_token_latency)
+            eval_started = time.monotonic()
+            for start in range(0, len(tokens), mock.chunk_tokens):
+                chunk = tokens[start : start + mock.chunk_tokens]
+                self._write_chunk(
+                    {
+                        "model": request.get("model"),
+                        "response": "".join(chunk),
+                        "done": False,
+                    }
+                )
+                time.sleep(len(chunk) / mock.token_rate)
+            finished = time.monotonic()
+            self._write_chunk(
+                {
+                    "model": request.get("model"),
+                    "response": "",
+                    "done": True,
+                    "total_duration": int((finished - started) * 1e9),
+                    "eval_count": len(tokens),
+                    "eval_duration": int((finished - eval_started) * 1e9),
+                }
+            )
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # the client stopped the generation early
+            self.close_connection = True
+
+
+class MockOllamaServer:
+    """
+    Threaded HTTP server answering /api/generate requests with streamed NDJSON, every
+    request on its own thread like concurrent generations on a real Ollama server.
+    Canned responses are picked by a hash of the prompt and seed, so regenerating
+    with a new seed returns a different response.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 11435,
+        token_rate: float = 40.0,
+        first_token_latency: float = 0.5,
+        chunk_tokens: int = 1,
+        responses: Optional[List[str]] = None,
+    ):
+        self.token_rate = token_rate
+        self.first_token_latency = first_token_latency
+        self.chunk_tokens = chunk_tokens
+        self.responses = responses
+        self._server = ThreadingHTTPServer((host, port), _GenerateHandler)
+        self._server.daemon_threads = True
+        self._server.mock = self
+        self._thread = None
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/generate"
+
+    def response(self, prompt: str, seed: Optional[int]) -> str:
+        """
+        Returns the response to a generation request.
+
+        Parameters:
+            prompt (str): The prompt.
+            seed (int): The sampling seed of the request.
+
+        Returns:
+            str: A canned response, or a synthetic one if none were given.
+        """
+        if self.responses:
+            return self.responses[_digest(prompt, seed) % len(self.responses)]
+        return synthetic_response(prompt, seed)
+
+    def start(self) -> "MockOllamaServer":
+        """
+        Starts serving on a background thread.
+
+        Parameters:
+            None
+
+        Returns:
+            MockOllamaServer: The server.
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stops serving and closes the listening socket.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Serve a mock Ollama /api/generate endpoint."
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument(
+        "--token-rate", type=float, default=40.0, help="tokens streamed per second"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.5, help="seconds before the first token"
+    )
+    parser.add_argument(
+        "--chunk-tokens", type=int, default=1, help="tokens per streamed chunk"
+    )
+    parser.add_argument(
+        "--responses", help="JSONL file of canned responses (synthetic if omitted)"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    server = MockOllamaServer(
+        args.host,
+        args.port,
+        args.token_rate,
+        args.latency,
+        args.chunk_tokens,
+        load_responses(args.responses) if args.responses else None,
+    )
+    print(f"serving mock ollama on {server.endpoint}")
+    try:
+        server.start()
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,364 @@
+"""
+This module provides the navigation queue of the app: the ordered ids of the problems
+that still need a labeler, so moving on after a submission jumps straight to the next
+useful problem instead of paging through labeled ones.
+
+A problem whose labelers picked different versions stays in the queue until enough
+labelers (DISAGREEMENT_RESOLUTION_LABELS) settle it by majority. Each labeler counts
+once, with their latest preference: labelers are told apart by the name they enter in
+the sidebar, or by session without one, and are never handed a problem they labeled.
+
+Functions:
+    - fetch_disagreeing_ids(connection, resolution_labels: int) -> List[int]:
+        Returns the problems whose labelers disagree without a settling majority.
+    - fetch_labeled_ids(connection, labeler: str) -> Set[int]:
+        Returns the problems a labeler has given a preference.
+    - fetch_test_uncertainty(connection) -> Dict[int, float]:
+        Returns how little the unit tests tell the two versions of each problem apart.
+    - build_work_queue(connection, catalog: ProblemCatalog, priority: str) -> List[int]:
+        Returns the ids of the unlabeled or disagreeing problems in priority order.
+
+Classes:
+    - WorkQueue: The work queue shared by every session, with the problems completed
+      or claimed by each of them.
+    - NavigationQueue: A session's cursor over the work queue.
+
+Dependencies:
+    - catalog_utils: For the current preferences and difficulties of the problems.
+    - threading: For sharing the work queue between sessions.
+"""
+
+import math
+import threading
+import time
+
+from catalog_utils import (
+    ProblemCatalog,
+)
+from constants import (
+    CATALOG_REFRESH_INTERVAL,
+    DIFFICULTY_ORDER,
+    DISAGREEMENT_RESOLUTION_LABELS,
+    LABELING_COMPACTION_INTERVAL,
+    NAVIGATION_CLAIM_TTL,
+    NAVIGATION_PRIORITY,
+)
+from typing import Dict, Iterable, List, Optional, Set
+
+
+# orders the work queue can be sorted in
+NAVIGATION_PRIORITIES = ["id", "difficulty", "uncertainty"]
+
+# latest preference of every labeler of a problem; the labeler is the name recorded
+# with the session's decisions (see analytics_utils), or the session without one
+LABELER_PREFERENCES = """
+WITH session_labelers AS (
+    SELECT
+        problem_id,
+        session_id,
+        arg_max(payload->>'labeler', created_at) AS labeler
+    FROM labeling_events
+    WHERE action = 'decision' AND (payload->>'labeler') IS NOT NULL
+    GROUP BY problem_id, session_id
+), labeler_preferences AS (
+    SELECT
+        e.problem_id,
+        COALESCE(l.labeler, e.session_id) AS labeler,
+        arg_max(e.payload->>'preference', e.created_at) AS preference
+    FROM labeling_events e
+    LEFT JOIN session_labelers l USING (problem_id, session_id)
+    WHERE e.payload->>'preference' IS NOT NULL
+    GROUP BY e.problem_id, COALESCE(l.labeler, e.session_id)
+)
+"""
+
+
+def fetch_disagreeing_ids(
+    connection, resolution_labels: int = DISAGREEMENT_RESOLUTION_LABELS
+) -> List[int]:
+    """
+    Returns the problems whose labelers disagree: their latest preferences are not
+    all the same, and fewer than `resolution_labels` labelers gave one, or the
+    versions are tied. A majority of at least `resolution_labels` labelers resolves
+    the disagreement.
+
+    Parameters:
+        connection: The database connection.
+        resolution_labels (int): Labelers needed for a majority to settle a problem.
+
+    Returns:
+        List[int]: The problem ids, ascending.
+    """
+    rows = connection.execute(
+        LABELER_PREFERENCES
+        + """
+        , votes AS (
+            SELECT problem_id, preference, count(*) AS labelers
+            FROM labeler_preferences
+            GROUP BY problem_id, preference
+        )
+        SELECT problem_id FROM votes
+        GROUP BY problem_id
+        HAVING count(*) > 1
+            AND NOT (sum(labelers) >= ? AND max(labelers) * 2 > sum(labelers))
+        ORDER BY problem_id
+        """,
+        [resolution_labels],
+    ).fetchall()
+    return [id for (id,) in rows]
+
+
+def fetch_labeled_ids(connection, labeler: str) -> Set[int]:
+    """
+    Returns the problems a labeler has given a preference, in any session.
+
+    Parameters:
+        connection: The database connection.
+        labeler (str): The labeler name, or a session id.
+
+    Returns:
+        Set[int]: The problem ids.
+    """
+    rows = connection.execute(
+        LABELER_PREFERENCES
+        + "SELECT DISTINCT problem_id FROM labeler_preferences WHERE labeler = ?",
+        [labeler],
+    ).fetchall()
+    return {id for (id,) in rows}
+
+
+def fetch_test_uncertainty(connection) -> Dict[int, float]:
+    """
+    Returns how little the latest unit test results (see batch_evaluate.py) tell the
+    two versions of each problem apart: 1 - |pass rate of version1 - pass rate of
+    version2|. Problems without results are left out.
+
+    Parameters:
+        connection: The database connection.
+
+    Returns:
+        Dict[int, float]: Uncertainty between 0 (one version passes every case the
+            other fails) and 1 (both pass the same share) by problem id.
+    """
+    (exists,) = connection.execute(
+        """
+        SELECT count(*) FROM information_schema.tables
+        WHERE table_name = 'leetcode_test_results'
+        """
+    ).fetchone()
+    if not exists:
+        return {}
+    rows = connection.execute(
+        """
+        WITH latest AS (
+            SELECT id, version, max(evaluated_at) AS evaluated_at
+            FROM leetcode_test_results GROUP BY id, version
+        ), pass_rates AS (
+            SELECT id, version, avg(CASE WHEN status = '.' THEN 1 ELSE 0 END) AS rate
+            FROM leetcode_test_results JOIN latest USING (id, version, evaluated_at)
+            GROUP BY id, version
+        )
+        SELECT
+            id,
+            1 - abs(
+                max(rate) FILTER (WHERE version = 'version1')
+                - max(rate) FILTER (WHERE version = 'version2')
+            )
+        FROM pass_rates
+        GROUP BY id
+        HAVING count(*) = 2
+        """
+    ).fetchall()
+    return dict(rows)
+
+
+def build_work_queue(
+    connection, catalog: ProblemCatalog, priority: str = NAVIGATION_PRIORITY
+) -> List[int]:
+    """
+    Returns the ids of the problems without a preference, or whose labelers
+    disagree without a settling majority, in priority order.
+
+    Parameters:
+        connection: The database connection.
+        catalog (ProblemCatalog): The problem catalog.
+        priority (str): "id" keeps the catalog order, "difficulty" puts problems in
+            DIFFICULTY_ORDER first, "uncertainty" puts the problems whose versions
+            the unit tests tell apart least (or not at all yet) first.
+
+    Returns:
+        List[int]: The problem ids.
+    """
+    if priority not in NAVIGATION_PRIORITIES:
+        raise ValueError(f"unknown navigation priority: {priority}")
+    snapshot = catalog.snapshot()
+    disagreeing = set(fetch_disagreeing_ids(connection))
+    queue = [
+        id
+        for id, preference in zip(
+            snapshot.ids, catalog.column(snapshot, "preference")
+        )
+        if preference is None or id in disagreeing
+    ]
+    if priority == "difficulty":
+        ranks = {difficulty: rank for rank, difficulty in enumerate(DIFFICULTY_ORDER)}
+        difficulties = dict(zip(snapshot.ids, catalog.column(snapshot, "difficulty")))
+        # sort is stable, so ids stay ascending within a difficulty
+        queue.sort(key=lambda id: ranks.get(difficulties[id], len(ranks)))
+    elif priority == "uncertainty":
+        uncertainty = fetch_test_uncertainty(connection)
+        queue.sort(key=lambda id: -uncertainty.get(id, 1.0))
+    return queue
+
+
+class WorkQueue:
+    """
+    The work queue shared by every session of the app process. Problems completed
+    by any session are skipped by all of them, and a problem handed to a session
+    is claimed for `claim_ttl` seconds, so concurrent labelers walking the same
+    queue spread over different problems.
+
+    The ids are rebuilt from the labeling state with `update`, which keeps the
+    claims and completed problems: a problem completed less than `completion_ttl`
+    seconds ago stays completed, as the labeling state the ids were rebuilt from
+    may not include its label yet. Sessions keep walking the ids they started with.
+    """
+
+    def __init__(
+        self,
+        ids: List[int],
+        claim_ttl: float = NAVIGATION_CLAIM_TTL,
+        completion_ttl: float = LABELING_COMPACTION_INTERVAL
+        + 2 * CATALOG_REFRESH_INTERVAL,
+    ):
+        self.ids = ids
+        self.updated_at = time.monotonic()
+        self._claim_ttl = claim_ttl
+        self._completion_ttl = completion_ttl
+        self._lock = threading.Lock()
+        # problem id -> completion time
+        self._completed = {}
+        # problem id -> (session id, claim time)
+        self._claims = {}
+
+    def update(self, ids: List[int]) -> None:
+        """
+        Replaces the ids with ones rebuilt from the latest labeling state, keeping
+        the claims and the recently completed problems.
+
+        Parameters:
+            ids (List[int]): The problem ids, see build_work_queue.
+
+        Returns:
+            None
+        """
+        now = time.monotonic()
+        with self._lock:
+            # older labels are part of the rebuilt ids, which still list a problem
+            # only if it needs another label, e.g. to settle a disagreement
+            self._completed = {
+                id: completed_at
+                for id, completed_at in self._completed.items()
+                if now - completed_at < self._completion_ttl
+            }
+            self.ids = ids
+            self.updated_at = now
+
+    def claim(self, id: int, session_id: str) -> bool:
+        """
+        Claims a problem for a session unless it is completed or claimed by another
+        session.
+
+        Parameters:
+            id (int): The ID of the LeetCode problem.
+            session_id (str): The claiming session.
+
+        Returns:
+            bool: Whether the session got the problem.
+        """
+        now = time.monotonic()
+        with self._lock:
+            if id in self._completed:
+                return False
+            owner, claimed_at = self._claims.get(id, (None, -math.inf))
+            if owner != session_id and now - claimed_at < self._claim_ttl:
+                return False
+            self._claims[id] = (session_id, now)
+            return True
+
+    def complete(self, id: int) -> None:
+        """
+        Takes a labeled problem out of the queue of every session.
+
+        Parameters:
+            id (int): The ID of the LeetCode problem.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._completed[int(id)] = time.monotonic()
+            self._claims.pop(int(id), None)
+
+
+class NavigationQueue:
+    """
+    A session's cursor over the shared work queue. `next` returns the next problem
+    that is neither completed, claimed by another session nor already labeled by the
+    session's labeler in amortized O(1): the cursor only moves forward, so every
+    entry is looked at once.
+    """
+
+    def __init__(
+        self, work_queue: WorkQueue, session_id: str, labeled: Iterable[int] = ()
+    ):
+        self._work_queue = work_queue
+        # the ids the session started with, as the queue's ids may be rebuilt
+        self._ids = work_queue.ids
+        self._session_id = session_id
+        self._labeled = set(labeled)
+        self._cursor = 0
+
+    def next(self) -> Optional[int]:
+        """
+        Moves to the next available problem of the queue and claims it.
+
+        Parameters:
+            None
+
+        Returns:
+            int: The problem id, or None once the queue is exhausted.
+        """
+        ids = self._ids
+        while self._cursor < len(ids):
+            id = ids[self._cursor]
+            self._cursor += 1
+            if id in self._labeled:
+                continue
+            if self._work_queue.claim(id, self._session_id):
+                return id
+        return None
+
+    def mark_done(self, id: int) -> None:
+        """
+        Records that the session labeled a problem.
+
+        Parameters:
+            id (int): The ID of the LeetCode problem.
+
+        Returns:
+            None
+        """
+        self._work_queue.complete(id)
+
+    def remaining(self) -> int:
+        """
+        Returns the number of problems left ahead of the cursor.
+
+        Parameters:
+            None
+
+        Returns:
+            int: An upper bound of the remaining problems (some may be taken).
+        """
+        return len(self._ids) - self._cursor
@@ -0,0 +1,483 @@
+"""
+This module provides utilities for prompting codellama through the Ollama API and
+decoding the generated code while the response is still being streamed.
+
+Functions:
+    - default_instruction() -> str:
+        Returns the default instruction for the configured GENERATION_MODE.
+
+    - build_prompt(instruction: str, description: str) -> str:
+        Builds the prompt sent to codellama for a LeetCode problem.
+
+    - iter_response_chunks(lines: Iterable[Union[str, bytes]]) -> Iterator[Dict]:
+        Decodes Ollama's NDJSON response lines into JSON objects.
+
+    - get_session() -> requests.Session:
+        Returns the process-wide keep-alive session pooled to the Ollama API.
+
+    - stream_generate(prompt: str, model: str, options: Dict) -> Iterator[Dict]:
+        Sends a streaming request to Ollama and yields each chunk as it arrives.
+
+    - stream_code_versions(prompt: str, on_version: Callable, model: str) -> Tuple[str, str]:
+        Streams a generation and returns the first two fenced code blocks,
+        reporting each block as soon as its closing fence arrives.
+
+    - generate_code(prompt: str, options: Dict, model: str) -> str:
+        Generates a single solution and returns its first fenced code block.
+
+    - generate_code_pair(prompt: str, options: List[Dict], on_version: Callable, model: str) -> Tuple[str, str]:
+        Generates both versions with two independent requests sent concurrently.
+
+    - generate_versions(prompt: str, options: List[Dict], on_version: Callable, should_stop: Callable) -> Tuple[str, str]:
+        Generates a code pair with the configured GENERATION_MODE.
+
+    - generate_candidates(prompt: str, count: int, options: Dict, model: str) -> List[str]:
+        Samples several candidate solutions with concurrent requests, each with its own seed.
+
+Classes:
+    - CodeFenceDecoder: Incremental decoder extracting ``` fenced blocks from text chunks.
+
+Dependencies:
+    - json: For JSON data parsing.
+    - requests: For calling the Ollama API.
+    - threading: For guarding the shared session.
+    - concurrent.futures: For sending requests in parallel.
+    - constants: For predefined constants.
+"""
+
+import json
+import random
+import requests
+import threading
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from constants import (
+    CANDIDATE_SAMPLING_OPTIONS,
+    DEFAULT_INSTRUCTION,
+    GENERATION_MODE,
+    OLLAMA_API_ENDPOINT,
+    OLLAMA_MODEL,
+    OLLAMA_POOL_SIZE,
+    SINGLE_SOLUTION_INSTRUCTION,
+    VERSION_SAMPLING_OPTIONS,
+)
+from requests.adapters import HTTPAdapter
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+
+CODE_FENCE = "```"
+
+_session = None
+_session_lock = threading.Lock()
+_executor = ThreadPoolExecutor(
+    max_workers=OLLAMA_POOL_SIZE, thread_name_prefix="ollama"
+)
+
+
+class CodeFenceDecoder:
+    """
+    Incrementally extracts the code blocks delimited by ``` from a stream of text chunks.
+
+    Every character is inspected once: text inside an open block is kept as a list of
+    pieces and joined a single time when the closing fence arrives, and at most two
+    trailing backticks are carried over to detect fences split across chunks.
+    """
+
+    def __init__(self):
+        self.blocks = []
+        self._inside = False
+        self._pieces = []
+        self._carry = ""
+
+    def feed(self, text: str) -> List[str]:
+        """
+        Consumes a chunk of generated text.
+
+        Parameters:
+            text (str): The next chunk of the response.
+
+        Returns:
+            List[str]: The code blocks closed by this chunk.
+        """
+        text = self._carry + text
+        self._carry = ""
+        completed = []
+        start = 0
+        index = text.find(CODE_FENCE)
+        while index >= 0:
+            if self._inside:
+                self._pieces.append(text[start:index])
+                completed.append("".join(self._pieces))
+                self._pieces = []
+            self._inside = not self._inside
+            start = index + len(CODE_FENCE)
+            index = text.find(CODE_FENCE, start)
+        # hold back a possible partial fence at the end of the chunk
+        end = len(text)
+        while end > start and len(text) - end < len(CODE_FENCE) - 1 and text[end - 1] == "`":
+            end -= 1
+        self._carry = text[end:]
+        if self._inside and end > start:
+            self._pieces.append(text[start:end])
+        self.blocks.extend(completed)
+        return completed
+
+    def close(self) -> List[str]:
+        """
+        Flushes the decoder at the end of the stream. A block left open by the model
+        is treated as complete.
+
+        Returns:
+            List[str]: The block flushed from the decoder, if any.
+        """
+        if self._inside:
+            self._pieces.append(self._carry)
+        self._carry = ""
+        completed = []
+        if self._inside and any(self._pieces):
+            completed.append("".join(self._pieces))
+            self.blocks.extend(completed)
+        self._inside = False
+        self._pieces = []
+        return completed
+
+
+def default_instruction() -> str:
+    """
+    Returns the default instruction for the configured GENERATION_MODE.
+
+    Parameters:
+        None
+
+    Returns:
+        str: The instruction asking for one solution in concurrent mode,
+            or for two solutions otherwise.
+    """
+    if GENERATION_MODE == "concurrent":
+        return SINGLE_SOLUTION_INSTRUCTION
+    return DEFAULT_INSTRUCTION
+
+
+def build_prompt(instruction: str, description: str) -> str:
+    """
+    Builds the prompt sent to codellama for a LeetCode problem.
+
+    Parameters:
+        instruction (str): The instruction given to the model.
+        description (str): The LeetCode problem description.
+
+    Returns:
+        str: The prompt.
+    """
+    return f"{instruction}: {description}"
+
+
+def iter_response_chunks(lines: Iterable[Union[str, bytes]]) -> Iterator[Dict]:
+    """
+    Decodes Ollama's NDJSON response lines into JSON objects.
+
+    Parameters:
+        lines (Iterable[Union[str, bytes]]): The response lines, one JSON object per line.
+
+    Returns:
+        Iterator[Dict]: The decoded chunks.
+    """
+    for line in lines:
+        if line:
+            yield json.loads(line)
+
+
+def get_session() -> requests.Session:
+    """
+    Returns the process-wide session whose keep-alive connection pool is shared by
+    every request to the Ollama API.
+
+    Parameters:
+        None
+
+    Returns:
+        requests.Session: The shared session.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1, pool_maxsize=OLLAMA_POOL_SIZE, pool_block=True
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def stream_generate(
+    prompt: str, model: str = OLLAMA_MODEL, options: Optional[Dict] = None
+) -> Iterator[Dict]:
+    """
+    Sends a streaming generation request to Ollama and yields each chunk as it arrives.
+    The final chunk has "done" set and carries the generation statistics. Closing the
+    iterator early drops the connection, which stops the generation.
+
+    Parameters:
+        prompt (str): The prompt.
+        model (str): The Ollama model name.
+        options (Dict): Sampling options such as temperature and seed.
+
+    Returns:
+        Iterator[Dict]: The decoded response chunks.
+    """
+    data = {"model": model, "prompt": prompt, "stream": True}
+    if options:
+        data["options"] = options
+    headers = {"Content-Type": "application/json"}
+    with get_session().post(
+        OLLAMA_API_ENDPOINT, headers=headers, json=data, stream=True
+    ) as response:
+        response.raise_for_status()
+        yield from iter_response_chunks(response.iter_lines())
+
+
+def stream_code_versions(
+    prompt: str,
+    on_version: Optional[Callable[[int, str], None]] = None,
+    model: str = OLLAMA_MODEL,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[Dict] = None,
+) -> Tuple[str, str]:
+    """
+    Streams a generation and returns the first two fenced code blocks.
+
+    Parameters:
+        prompt (str): The prompt.
+        on_version (Callable[[int, str], None]): Called with the block index and code
+            as soon as a block is closed.
+        model (str): The Ollama model name.
+        should_stop (Callable[[], bool]): Checked between chunks; the generation is
+            abandoned once it returns True.
+        stats (Dict): If given, "tokens" is incremented by the number of generated
+            tokens (one per streamed chunk).
+
+    Returns:
+        Tuple[str, str]: The two code versions, or (None, None) if fewer were generated.
+    """
+    decoder = CodeFenceDecoder()
+
+    def _report(completed):
+        if on_version:
+            first = len(decoder.blocks) - len(completed)
+            for offset, block in enumerate(completed):
+                on_version(first + offset, block)
+
+    chunks = stream_generate(prompt, model)
+    try:
+        for chunk in chunks:
+            if should_stop and should_stop():
+                return None, None
+            if chunk.get("done"):
+                break
+            if stats is not None:
+                stats["tokens"] = stats.get("tokens", 0) + 1
+            _report(decoder.feed(chunk.get("response", "")))
+    finally:
+        chunks.close()
+    _report(decoder.close())
+    if len(decoder.blocks) < 2:
+        print("fewer than two code blocks generated", decoder.blocks)
+        return None, None
+    return decoder.blocks[0], decoder.blocks[1]
+
+
+def generate_code(
+    prompt: str,
+    options: Optional[Dict] = None,
+    model: str = OLLAMA_MODEL,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[Dict] = None,
+) -> str:
+    """
+    Generates a single solution and returns its first fenced code block. The request
+    is closed as soon as that block ends; if the model emits no fence at all, the
+    whole response is used as the code.
+
+    Parameters:
+        prompt (str): The prompt asking for one solution.
+        options (Dict): Sampling options such as temperature and seed.
+        model (str): The Ollama model name.
+        should_stop (Callable[[], bool]): Checked between chunks; the generation is
+            abandoned once it returns True.
+        stats (Dict): If given, "tokens" is incremented by the number of generated
+            tokens (one per streamed chunk).
+
+    Returns:
+        str: The generated code, or None if the generation was stopped.
+    """
+    decoder = CodeFenceDecoder()
+    pieces = []
+    chunks = stream_generate(prompt, model, options)
+    try:
+        for chunk in chunks:
+            if should_stop and should_stop():
+                return None
+            if chunk.get("done"):
+                break
+            pieces.append(chunk.get("response", ""))
+            if stats is not None:
+                stats["tokens"] = stats.get("tokens", 0) + 1
+            if decoder.feed(pieces[-1]):
+                break
+    finally:
+        chunks.close()
+    decoder.close()
+    if decoder.blocks:
+        return decoder.blocks[0]
+    return "".join(pieces).strip()
+
+
+def generate_code_pair(
+    prompt: str,
+    options: List[Dict] = VERSION_SAMPLING_OPTIONS,
+    on_version: Optional[Callable[[int, str], None]] = None,
+    model: str = OLLAMA_MODEL,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[Dict] = None,
+) -> Tuple[str, str]:
+    """
+    Generates both versions with two independent requests sent concurrently over the
+    shared connection pool, each with its own sampling options.
+
+    Parameters:
+        prompt (str): The prompt asking for one solution.
+        options (List[Dict]): Sampling options for version1 and version2.
+        on_version (Callable[[int, str], None]): Called from the calling thread with the
+            version index and code as soon as each request finishes.
+        model (str): The Ollama model name.
+        should_stop (Callable[[], bool]): Checked between chunks; both generations are
+            abandoned once it returns True.
+        stats (Dict): If given, "tokens" is incremented by the number of generated
+            tokens of both requests.
+
+    Returns:
+        Tuple[str, str]: The two code versions, or (None, None) if stopped.
+    """
+    # one stats dict per request so the worker threads never share a counter
+    request_stats = [{}, {}]
+    futures = {
+        _executor.submit(
+            generate_code,
+            prompt,
+            version_options,
+            model,
+            should_stop,
+            request_stats[index],
+        ): index
+        for index, version_options in enumerate(options[:2])
+    }
+    versions = [None, None]
+    for future in as_completed(futures):
+        index = futures[future]
+        versions[index] = future.result()
+        if stats is not None:
+            stats["tokens"] = stats.get("tokens", 0) + request_stats[index].get(
+                "tokens", 0
+            )
+        if versions[index] is None:
+            return None, None
+        if on_version:
+            on_version(index, versions[index])
+    return versions[0], versions[1]
+
+
+def generate_versions(
+    prompt: str,
+    options: List[Dict] = VERSION_SAMPLING_OPTIONS,
+    on_version: Optional[Callable[[int, str], None]] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[Dict] = None,
+) -> Tuple[str, str]:
+    """
+    Generates a code pair with the configured GENERATION_MODE.
+
+    Parameters:
+        prompt (str): The prompt.
+        options (List[Dict]): Sampling options for version1 and version2
+            (only used in concurrent mode).
+        on_version (Callable[[int, str], None]): Called with the version index and
+            code as soon as each version is available.
+        should_stop (Callable[[], bool]): Checked between chunks; the generation is
+            abandoned once it returns True.
+        stats (Dict): If given, "tokens" is incremented by the number of generated
+            tokens.
+
+    Returns:
+        Tuple[str, str]: The two code versions, or (None, None) on failure.
+    """
+    if GENERATION_MODE == "concurrent":
+        return generate_code_pair(
+            prompt,
+            options,
+            on_version=on_version,
+            should_stop=should_stop,
+            stats=stats,
+        )
+    return stream_code_versions(
+        prompt, on_version=on_version, should_stop=should_stop, stats=stats
+    )
+
+
+def generate_candidates(
+    prompt: str,
+    count: int,
+    options: Dict = CANDIDATE_SAMPLING_OPTIONS,
+    model: str = OLLAMA_MODEL,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[Dict] = None,
+) -> List[str]:
+    """
+    Samples candidate solutions with concurrent requests over the shared connection
+    pool, each with the same options and its own random seed. Ollama batches the
+    concurrent requests of a loaded model (up to its OLLAMA_NUM_PARALLEL setting).
+
+    Parameters:
+        prompt (str): The prompt asking for one solution.
+        count (int): The number of candidates to sample.
+        options (Dict): Sampling options shared by every candidate.
+        model (str): The Ollama model name.
+        should_stop (Callable[[], bool]): Checked between chunks; every generation
+            is abandoned once it returns True.
+        stats (Dict): If given, "tokens" is incremented by the number of generated
+            tokens of every request.
+
+    Returns:
+        List[str]: The generated candidates in request order, without the failed or
+            empty ones, or an empty list if stopped.
+    """
+    # one stats dict per request so the worker threads never share a counter
+    request_stats = [{} for _ in range(count)]
+    futures = [
+        _executor.submit(
+            generate_code,
+            prompt,
+            dict(options, seed=random.randint(0, 2**31 - 1)),
+            model,
+            should_stop,
+            request_stats[index],
+        )
+        for index in range(count)
+    ]
+    candidates = []
+    for index, future in enumerate(futures):
+        try:
+            candidate = future.result()
+        except Exception as e:
+            print(f"failed to generate candidate {index}: {e}")
+            continue
+        if stats is not None:
+            stats["tokens"] = stats.get("tokens", 0) + request_stats[index].get(
+                "tokens", 0
+            )
+        if candidate:
+            candidates.append(candidate)
+    if should_stop and should_stop():
+        return []
+    return candidates
@@ -0,0 +1,294 @@
+"""
+This module provides a write-behind persistence layer: labeling events are queued in
+memory and flushed to the database in batches on a background thread, so a click in
+the app never waits on a round trip to MotherDuck.
+
+Classes:
+    - WriteBehindWriter: Queues labeling events, flushes them with executemany and
+      acknowledges each write through a future once it is durable. The same thread
+      periodically compacts the event log into the current state.
+
+Dependencies:
+    - atexit: For flushing queued writes when the process exits.
+    - concurrent.futures: For the asynchronous write acknowledgements.
+    - threading: For the background flush thread.
+    - time: For scheduling compactions.
+    - duckdb_utils: For the event insert, compaction and the operation status.
+    - tracing_utils: For timing flushes.
+"""
+
+import atexit
+import threading
+import time
+
+from concurrent.futures import Future
+from constants import (
+    LABELING_COMPACTION_INTERVAL,
+    WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_FLUSH_INTERVAL,
+    WRITE_BEHIND_MAX_ATTEMPTS,
+)
+from duckdb_utils import (
+    compact_labeling_events,
+    init_labeling_tables,
+    labeling_event,
+    INSERT_LABELING_EVENT,
+    DBOperationStatus,
+)
+from tracing_utils import (
+    span,
+)
+from typing import Dict, List, Tuple
+
+
+class WriteBehindWriter:
+    """
+    Buffers labeling events and flushes them on a background thread every
+    `flush_interval` seconds, or as soon as `batch_size` events are queued.
+
+    A flush inserts every queued event with a single executemany call in one
+    transaction. A failed flush is rolled back and its events are queued again, in
+    front of newer ones, until they failed `max_attempts` flushes. Every write
+    returns a future resolved with (DBOperationStatus, message) once its flush
+    commits or it is given up. Queued events are flushed on `close`, which also runs when the
+    process exits. Once new events have been flushed, the event log is compacted
+    into the current state at most every `compaction_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        connection,
+        flush_interval: float = WRITE_BEHIND_FLUSH_INTERVAL,
+        batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+        compaction_interval: float = LABELING_COMPACTION_INTERVAL,
+        max_attempts: int = WRITE_BEHIND_MAX_ATTEMPTS,
+    ):
+        # duckdb connections are not shared across threads, use a dedicated cursor
+        self._connection = connection.cursor()
+        init_labeling_tables(self._connection)
+        self._flush_interval = flush_interval
+        self._batch_size = batch_size
+        self._compaction_interval = compaction_interval
+        self._max_attempts = max_attempts
+        self._last_compaction = time.monotonic()
+        self._uncompacted = False
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        # (event parameters, message, future, failed flushes), in submission order
+        self._pending = []
+        self._thread = threading.Thread(
+            target=self._run, name="write-behind", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, event: List, message: str) -> Future:
+        """
+        Queues a labeling event.
+
+        Parameters:
+            event (List): The event parameters, built with `labeling_event`.
+            message (str): The message acknowledging a successful write.
+
+        Returns:
+            Future: Resolved with (DBOperationStatus, message) once flushed.
+        """
+        future = Future()
+        with self._lock:
+            if self._closed:
+                future.set_result((DBOperationStatus.ERROR, "writer is closed"))
+                return future
+            self._pending.append((event, message, future, 0))
+            if len(self._pending) >= self._batch_size:
+                self._wake.set()
+        return future
+
+    def record_code_and_preference(
+        self, id: int, version1: str, version2: str, preference: int, session_id: str
+    ) -> Future:
+        return self.submit(
+            labeling_event(
+                id,
+                session_id,
+                "code_and_preference",
+                {
+                    "version1": version1,
+                    "version2": version2,
+                    "preference": int(preference),
+                },
+            ),
+            "Code and preference has been recorded sucessfully!",
+        )
+
+    def record_preference_only(
+        self, id: int, preference: int, session_id: str
+    ) -> Future:
+        return self.submit(
+            labeling_event(
+                id, session_id, "preference", {"preference": int(preference)}
+            ),
+            "Preference has been recorded sucessfully!",
+        )
+
+    def save_comparison(
+        self, id: int, version1: str, version2: str, session_id: str
+    ) -> Future:
+        return self.submit(
+            labeling_event(
+                id, session_id, "code_pair", {"version1": version1, "version2": version2}
+            ),
+            "Comparison has been save sucessfully!",
+        )
+
+    def record_candidate_comparison(
+        self, id: int, generation: str, winner: int, loser: int, session_id: str
+    ) -> Future:
+        return self.submit(
+            labeling_event(
+                id,
+                session_id,
+                "candidate_comparison",
+                {"generation": generation, "winner": int(winner), "loser": int(loser)},
+            ),
+            "Comparison has been recorded sucessfully!",
+        )
+
+    def update_function_name(
+        self, id: int, function_name: str, session_id: str
+    ) -> Future:
+        return self.submit(
+            labeling_event(
+                id, session_id, "function_name", {"function_name": function_name}
+            ),
+            "leetcode test has been updated sucessfully!",
+        )
+
+    def record_decision(self, id: int, decision: Dict, session_id: str) -> Future:
+        return self.submit(
+            labeling_event(id, session_id, "decision", decision),
+            "Decision has been recorded sucessfully!",
+        )
+
+    def pending(self) -> int:
+        """
+        Returns the number of queued writes.
+
+        Parameters:
+            None
+
+        Returns:
+            int: The number of writes not yet flushed.
+        """
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> Tuple[DBOperationStatus, str]:
+        """
+        Inserts every queued event in one executemany call and transaction, and
+        resolves their futures. The events of a failed flush are queued again unless
+        they reached the maximum number of attempts.
+
+        Parameters:
+            None
+
+        Returns:
+            Tuple[DBOperationStatus, str]: The status of the database operation and a message.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return DBOperationStatus.SUCCESS, "Nothing to flush."
+            try:
+                with span("write_behind_flush"):
+                    self._connection.execute("BEGIN TRANSACTION")
+                    self._connection.executemany(
+                        INSERT_LABELING_EVENT, [event for event, _, _, _ in batch]
+                    )
+                    self._connection.execute("COMMIT")
+            except Exception as e:
+                try:
+                    self._connection.execute("ROLLBACK")
+                except Exception:
+                    pass
+                # nothing of the batch was written, so the events are inserted one by
+                # one: a bad event does not take the others down with it
+                return self._flush_each(batch, e)
+            self._uncompacted = True
+            for _, message, future, _ in batch:
+                future.set_result((DBOperationStatus.SUCCESS, message))
+            return DBOperationStatus.SUCCESS, f"{len(batch)} writes have been flushed."
+
+    # insert the events of a failed batch separately, queueing the failed ones again
+    def _flush_each(self, batch, error) -> Tuple[DBOperationStatus, str]:
+        retried = []
+        for event, message, future, attempts in batch:
+            try:
+                self._connection.execute(INSERT_LABELING_EVENT, event)
+            except Exception as e:
+                error = e
+                if attempts + 1 < self._max_attempts:
+                    retried.append((event, message, future, attempts + 1))
+                else:
+                    future.set_result((DBOperationStatus.ERROR, e))
+                continue
+            self._uncompacted = True
+            future.set_result((DBOperationStatus.SUCCESS, message))
+        with self._lock:
+            self._pending = retried + self._pending
+        return DBOperationStatus.ERROR, error
+
+    def compact(self) -> Tuple[DBOperationStatus, str]:
+        """
+        Rebuilds the current state from the event log.
+
+        Parameters:
+            None
+
+        Returns:
+            Tuple[DBOperationStatus, str]: The status of the database operation and a message.
+        """
+        with self._flush_lock:
+            self._last_compaction = time.monotonic()
+            self._uncompacted = False
+            return compact_labeling_events(self._connection)
+
+    def close(self) -> None:
+        """
+        Flushes the queued writes and stops the background thread.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wake.set()
+        self._thread.join()
+        # failed events are retried until they succeed or run out of attempts
+        while self.pending():
+            self.flush()
+        if self._uncompacted:
+            self.compact()
+
+    def _run(self):
+        while not self._closed:
+            self._wake.wait(self._flush_interval)
+            self._wake.clear()
+            status, message = self.flush()
+            if status == DBOperationStatus.ERROR:
+                print(f"failed to flush queued writes: {message}")
+            if (
+                self._uncompacted
+                and time.monotonic() - self._last_compaction
+                >= self._compaction_interval
+            ):
+                status, message = self.compact()
+                if status == DBOperationStatus.ERROR:
+                    print(f"failed to compact labeling events: {message}")
@@ -1,92 +1,377 @@
 import math
 import numpy as np
-import requests
+import random
 import streamlit as st
 import time
+import uuid
+from cache_utils import (
+    generate_versions_cached,
+    get_unit_test_cache,
+)
+from complexity_utils import (
+    estimate_complexity,
+)
 from constants import (
-    OLLAMA_API_ENDPOINT,
+    CANDIDATE_COUNT,
+    CATALOG_REFRESH_INTERVAL,
+    DUPLICATE_SIMILARITY_THRESHOLD,
+    INCLUDE_PROBLEMS_WITHOUT_CODE,
+    NAVIGATION_PRIORITY,
+    PREGENERATION_LOOKAHEAD,
+    SANDBOX_POOL_SIZE,
+    VERSION_SAMPLING_OPTIONS,
+    VERSIONS,
 )
 from duckdb_utils import (
     extract_function_name,
-    record_preference_only,
-    post_process_response,
-    save_comparison,
+    get_database_connection,
+    get_problem_catalog,
+    init_database,
     DBOperationStatus,
 )
+from fingerprint_utils import (
+    pair_similarity,
+)
+from navigation_utils import (
+    build_work_queue,
+    fetch_labeled_ids,
+    NavigationQueue,
+    WorkQueue,
+)
+from ollama_utils import (
+    build_prompt,
+    generate_candidates,
+)
+from persistence_utils import (
+    WriteBehindWriter,
+)
+from tournament_utils import (
+    deduplicate_candidates,
+    save_candidates,
+    TournamentScheduler,
+)
+from tracing_utils import (
+    traced,
+)
+from pregeneration_utils import (
+    PregenerationWorker,
+)
 from unit_test_utils import (
+    is_transient,
     run_unit_tests,
+    static_check,
+    SandboxPool,
 )
 
 
+# queued database writes shared by every session of the app
+# (flushed in batches on a background thread and when the process exits)
+@st.cache_resource
+def _get_writer():
+    return WriteBehindWriter(get_database_connection())
+
+
+# pairings of the candidate tournaments handed out to every session of the app
+@st.cache_resource
+def _get_tournament_scheduler():
+    return TournamentScheduler(get_database_connection())
+
+
+# unlabeled and disagreeing problems shared by every session of the app
+# (one queue per priority, its ids rebuilt for sessions starting after the refresh
+# interval, see init_navigation)
+@st.cache_resource
+def _get_work_queue(priority):
+    return WorkQueue(_build_work_queue(priority))
+
+
+# ids of the work queue from the latest labeling state
+def _build_work_queue(priority):
+    return build_work_queue(
+        get_database_connection().cursor(), get_problem_catalog(), priority
+    )
+
+
+# track a queued write until the writer acknowledges it
+def _track_write(future, message):
+    st.session_state.pending_writes.append(future)
+    st.session_state.submit_status = DBOperationStatus.PENDING
+    st.session_state.app_status = message
+
+
+# report acknowledged writes: the first failure, or success once none is pending
+def _collect_write_acknowledgements():
+    pending = []
+    for future in st.session_state.pending_writes:
+        if not future.done():
+            pending.append(future)
+            continue
+        status, message = future.result()
+        if status == DBOperationStatus.ERROR:
+            st.session_state.submit_status = status
+            st.session_state.app_status = message
+        elif st.session_state.submit_status == DBOperationStatus.PENDING:
+            st.session_state.app_status = message
+    st.session_state.pending_writes = pending
+    if not pending and st.session_state.submit_status == DBOperationStatus.PENDING:
+        st.session_state.submit_status = DBOperationStatus.SUCCESS
+
+
+# how the labeler got to a preference, for the throughput analytics
+def _decision(id, version):
+    now = time.time()
+    pair_shown_at = st.session_state.get("pair_shown_at")
+    problem_shown_at = st.session_state.get("problem_shown_at")
+    decision = {
+        "labeler": st.session_state.get("labeler_name") or None,
+        "chosen_version": version,
+        "shown_at": pair_shown_at,
+        "decision_seconds": now - pair_shown_at if pair_shown_at else None,
+        "problem_seconds": now - problem_shown_at if problem_shown_at else None,
+        "regenerations": st.session_state.get("regenerations", 0),
+        "tournament": bool(st.session_state.get("candidate_pair")),
+    }
+    results = st.session_state.unit_test_results.get(id) or [None, None]
+    for code_version, result in zip(VERSIONS, results):
+        decision[f"{code_version}_passed"] = (
+            sum(case["status"] == "." for case in result) if result else None
+        )
+        decision[f"{code_version}_tests"] = len(result) if result else None
+    return decision
+
+
+# start timing the labeler's decision once a pair is on screen
+def mark_pair_displayed():
+    now = time.time()
+    if st.session_state.get("problem_shown_at") is None:
+        st.session_state.problem_shown_at = now
+    if st.session_state.get("pair_shown_at") is None:
+        st.session_state.pair_shown_at = now
+
+
 # store human preference in the databse
 def on_submit_preference_only(version: int):
     version -= 1
-    id = st.session_state.problems["id"][st.session_state.prompt_index]
-    # update local copy
-    st.session_state.problems.loc[
-        st.session_state.problems["id"] == id, "preference"
-    ] = version
-    # update database
-    (
-        st.session_state.submit_status,
-        st.session_state.app_status,
-    ) = record_preference_only(
-        st.session_state.db_con,
-        id,
-        version,
+    id = st.session_state.problems.id(st.session_state.prompt_index)
+    # analytics only, so its acknowledgement is not shown to the labeler
+    _get_writer().record_decision(
+        id, _decision(id, version), st.session_state.session_id
     )
-    time.sleep(0.5)
+    if st.session_state.get("candidate_pair"):
+        futures = _submit_candidate_comparison(id, version)
+    else:
+        # update local copy
+        st.session_state.problems.update(id, preference=version)
+        # queue the database update, it is acknowledged asynchronously
+        futures = [
+            _get_writer().record_preference_only(
+                id, version, st.session_state.session_id
+            )
+        ]
+    st.session_state.navigation.mark_done(id)
     # move on to the next question after preference submitssion
-    on_change_question(1)
+    on_next_unlabeled()
+    for future in futures:
+        _track_write(future, "Saving preference...")
+
+
+# record the outcome of a tournament pairing
+# (the compared pair also becomes the problem's code pair and preference)
+def _submit_candidate_comparison(id, version):
+    generation, first, second = st.session_state.candidate_pair
+    winner, loser = (second, first) if version else (first, second)
+    _get_tournament_scheduler().record(id, generation, winner, loser)
+    st.session_state.problems.update(
+        id,
+        version1=st.session_state.version1,
+        version2=st.session_state.version2,
+        preference=version,
+    )
+    writer = _get_writer()
+    return [
+        writer.record_candidate_comparison(
+            id, generation, winner, loser, st.session_state.session_id
+        ),
+        writer.record_code_and_preference(
+            id,
+            st.session_state.version1,
+            st.session_state.version2,
+            version,
+            st.session_state.session_id,
+        ),
+    ]
+
+
+# show the next pending pairing of the problem's candidate tournament, if any
+def assign_tournament_pair():
+    st.session_state.candidate_pair = None
+    if CANDIDATE_COUNT <= 2:
+        return
+    id = st.session_state.problems.id(st.session_state.prompt_index)
+    scheduler = _get_tournament_scheduler()
+    pairing = scheduler.assign(id)
+    if pairing is None:
+        return
+    tournament = scheduler.tournament(id)
+    st.session_state.candidate_pair = (tournament.generation, *pairing)
+    st.session_state.version1, st.session_state.version2 = (
+        tournament.candidates[candidate] for candidate in pairing
+    )
 
 
 # store code pair in the databse
 def on_save_comparison():
-    id = st.session_state.problems["id"][st.session_state.prompt_index]
-    st.session_state.submit_status, st.session_state.app_status = save_comparison(
-        st.session_state.db_con,
+    id = st.session_state.problems.id(st.session_state.prompt_index)
+    future = _get_writer().save_comparison(
         id,
         st.session_state.version1,
         st.session_state.version2,
+        st.session_state.session_id,
     )
+    _track_write(future, "Saving comparison...")
 
 
 # check if unit tests are available for current problem
 def _contains_test():
-    id = st.session_state.problems["id"][st.session_state.prompt_index]
-    test = st.session_state.tests[st.session_state.tests["id"] == id]
-    return not test.empty
+    return st.session_state.problems.test(st.session_state.prompt_index) is not None
+
+
+# warm unit test workers shared by every session of the app
+@st.cache_resource
+def _get_sandbox_pool():
+    return SandboxPool(SANDBOX_POOL_SIZE)
+
+
+# run unit tests of code snippets that have no cached results
+@traced("execute_unit_tests")
+def _execute_unit_tests(codes, function_name, inputs, outputs):
+    if SANDBOX_POOL_SIZE > 0:
+        # versions run in parallel on warm workers
+        return _get_sandbox_pool().run_many(
+            [
+                {
+                    "code": code,
+                    "function_name": function_name,
+                    "inputs": inputs,
+                    "outputs": outputs,
+                }
+                for code in codes
+            ]
+        )
+    results = []
+    for i, code in enumerate(codes, start=1):
+        # snippets the pool would reject never reach a subprocess either
+        reason = static_check(code, function_name, inputs)
+        if reason:
+            results.append([{"status": "R", "error": reason} for _ in inputs])
+            continue
+        unit_test_results = run_unit_tests(
+            f"solution{i}.py",
+            f"test{i}.py",
+            function_name,
+            code,
+            inputs,
+            outputs,
+        )
+        results.append(
+            [{"status": status, "error": None} for status in unit_test_results]
+        )
+    return results
+
+
+# unit test results of code snippets, from the cache or executed
+def _unit_test_results(versions, test):
+    function_name = test["function_name"]
+    inputs = test["inputs"]
+    outputs = test["outputs"]
+    # results persist across sessions and restarts until code or tests change
+    cache = get_unit_test_cache()
+    results = [cache.get(code, function_name, inputs, outputs) for code in versions]
+    missing = [index for index, result in enumerate(results) if result is None]
+    if missing:
+        executed = _execute_unit_tests(
+            [versions[index] for index in missing], function_name, inputs, outputs
+        )
+        for index, result in zip(missing, executed):
+            # timeouts and worker crashes depend on the host, so they are retried
+            if not is_transient(result):
+                cache.put(versions[index], function_name, inputs, outputs, result)
+            results[index] = result
+    return results
+
+
+# check whether the two versions of a pair pass different unit tests
+def _unit_test_outcomes_differ(version1, version2):
+    test = st.session_state.problems.test(st.session_state.prompt_index)
+    if test is None:
+        return False
+    results = _unit_test_results([version1, version2], test)
+    statuses = [[case["status"] for case in result] for result in results]
+    return statuses[0] != statuses[1]
 
 
 # run available unit tests
 def run_unit_tests_on_update():
-    if _contains_test():
-        id = st.session_state.problems["id"][st.session_state.prompt_index]
-        test = st.session_state.tests[st.session_state.tests["id"] == id]
-        function_name = test["function_name"].iloc[0]
-        inputs = test["inputs"].iloc[0]
-        outputs = test["outputs"].iloc[0]
-        version1, version2 = st.session_state.version1, st.session_state.version2
-        results = []
-        for i in [1, 2]:
-            unit_test_results = run_unit_tests(
-                f"solution{i}.py",
-                f"test{i}.py",
-                function_name,
-                version1 if i == 1 else version2,
-                inputs,
-                outputs,
-            )
-            results.append(unit_test_results)
+    test = st.session_state.problems.test(st.session_state.prompt_index)
+    if test is not None and st.session_state.version1 and st.session_state.version2:
+        id = st.session_state.problems.id(st.session_state.prompt_index)
+        st.session_state.unit_test_results[id] = _unit_test_results(
+            [st.session_state.version1, st.session_state.version2], test
+        )
+
 
-        st.session_state.unit_test_results[id] = results
+# time both versions on scaled test inputs and fit growth curves
+def on_estimate_complexity():
+    id = st.session_state.problems.id(st.session_state.prompt_index)
+    test = st.session_state.problems.test(st.session_state.prompt_index)
+    st.session_state.complexity_results[id] = estimate_complexity(
+        _get_sandbox_pool(),
+        st.session_state.version1,
+        st.session_state.version2,
+        test["function_name"],
+        test["inputs"][0],
+    )
+
+
+def _display_complexity_estimate():
+    if SANDBOX_POOL_SIZE == 0 or not _contains_test():
+        return
+    id = st.session_state.problems.id(st.session_state.prompt_index)
+    text, button = st.columns([4, 1])
+    with button:
+        st.button(
+            "Estimate Complexity",
+            key=f"estimate_complexity_{id}_button",
+            on_click=on_estimate_complexity,
+        )
+    report = st.session_state.complexity_results.get(id)
+    if report is None:
+        return
+    classes = [
+        report[version]["class"] or "not enough data" for version in VERSIONS
+    ]
+    summary = (
+        f"Estimated runtime: Version 1 {classes[0]}, Version 2 {classes[1]}."
+    )
+    if report["crossover"]:
+        summary += f" The faster version changes at n ≈ {report['crossover']}."
+    elif report["faster"]:
+        summary += (
+            f" Version {VERSIONS.index(report['faster']) + 1}"
+            " is faster on the largest input tested."
+        )
+    with text:
+        st.caption(summary)
 
 
 # display alert/confirmation for database operation
 def display_operation_status():
+    _collect_write_acknowledgements()
     if st.session_state.submit_status:
         st.header("Submit Status")
-        if st.session_state.submit_status == DBOperationStatus.SUCCESS:
+        if st.session_state.submit_status == DBOperationStatus.PENDING:
+            st.info(st.session_state.app_status, icon="⏳")
+        elif st.session_state.submit_status == DBOperationStatus.SUCCESS:
             st.success(st.session_state.app_status, icon="✅")
         elif st.session_state.submit_status == DBOperationStatus.ERROR:
             st.error(st.session_state.app_status, icon="🚨")
@@ -106,7 +391,8 @@ def _align_code_versions(version1: str, version2: str):
     return version1, version2
 
 
-def _render_test_status(status):
+def _render_test_status(result):
+    status = result["status"]
     if status == "F":
         return "❌"
     elif status == ".":
@@ -115,6 +401,34 @@ def _render_test_status(status):
         return "❗"
 
 
+def _format_duration(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.0f}µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:.1f}ms"
+    return f"{seconds:.2f}s"
+
+
+def _format_bytes(size):
+    for unit in ["B", "KB", "MB"]:
+        if size < 1024:
+            return f"{size:.0f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
+# status icon followed by the fastest wall time and the peak memory of the case
+def _render_test_result(result):
+    icon = _render_test_status(result)
+    if result.get("wall_time") is None:
+        return icon
+    return (
+        f'{icon} <small title="cpu {_format_duration(result["cpu_time"])}">'
+        f'{_format_duration(result["wall_time"])} · '
+        f'{_format_bytes(result["peak_memory"])}</small>'
+    )
+
+
 def _render_selection(preference, code_version):
     if preference == 1.0 * (code_version - 1):
         return "✅"
@@ -167,8 +481,13 @@ def _render_test_header(text, class_name, margin_top=-18):
 
 # display header, code and unit test results
 def version_selection_column(code_version, python_code):
-    id = st.session_state.problems["id"][st.session_state.prompt_index]
-    preference = st.session_state.problems["preference"][st.session_state.prompt_index]
+    id = st.session_state.problems.id(st.session_state.prompt_index)
+    preference = st.session_state.problems.get(
+        st.session_state.prompt_index, "preference"
+    )
+    # the stored preference is about another pair than the tournament pairing shown
+    if st.session_state.get("candidate_pair"):
+        preference = None
     header, _, slection_button = st.columns([5, 6, 4])
     # display header
     # (version name, whether selected as preferred, selection button)
@@ -189,19 +508,56 @@ def version_selection_column(code_version, python_code):
     # display unit test results if available
     if id in st.session_state.unit_test_results:
         results = st.session_state.unit_test_results[id][code_version - 1]
-        text, test0, test1, test2, _ = st.columns([0.5, 0.25, 0.25, 0.25, 5])
+        text, test0, test1, test2, _ = st.columns([0.5, 1, 1, 1, 2.5])
         with st.container():
             with text:
                 _render_test_header("Tests:", "test-header", -20)
             if len(results) > 0:
                 with test0:
-                    _render_test_header(_render_test_status(results[0]), "test-result")
+                    _render_test_header(_render_test_result(results[0]), "test-result")
             if len(results) > 1:
                 with test1:
-                    _render_test_header(_render_test_status(results[1]), "test-result")
+                    _render_test_header(_render_test_result(results[1]), "test-result")
             if len(results) > 2:
                 with test2:
-                    _render_test_header(_render_test_status(results[2]), "test-result")
+                    _render_test_header(_render_test_result(results[2]), "test-result")
+
+
+# update local copy of a problem's code pair and its unit test function name
+def _update_local_versions(id, version1, version2):
+    st.session_state.problems.update(id, version1=version1, version2=version2)
+    new_function_name = extract_function_name(version1)
+    # update unit test funtion_name
+    st.session_state.problems.update_test(id, new_function_name)
+
+
+# code pairs generated ahead of labelers, shared by every session of the app
+@st.cache_resource
+def _get_pregeneration_worker():
+    return PregenerationWorker(get_database_connection())
+
+
+# queue the next problems without a code pair for background generation
+def schedule_pregeneration():
+    # every loaded problem already has a code pair
+    if not INCLUDE_PROBLEMS_WITHOUT_CODE:
+        return
+    _get_pregeneration_worker().schedule(
+        st.session_state.session_id,
+        st.session_state.problems.upcoming_without_code(
+            st.session_state.prompt_index, PREGENERATION_LOOKAHEAD
+        ),
+        st.session_state.instruction,
+    )
+
+
+# copy code pairs generated in the background into the local copy
+def _apply_pregenerated_pairs():
+    if not INCLUDE_PROBLEMS_WITHOUT_CODE:
+        return
+    pairs = _get_pregeneration_worker().take(st.session_state.session_id)
+    for id, (version1, version2) in pairs.items():
+        _update_local_versions(id, version1, version2)
 
 
 # reset solutions
@@ -210,32 +566,89 @@ def reset_solutions():
     st.session_state.version2 = None
 
 
+# render each generated version as soon as its closing ``` arrives
+def _render_streamed_version(placeholders, index, code):
+    if index < len(placeholders):
+        placeholders[index].code(code, line_numbers=True)
+
+
+# sampling options for each version
+# regenerating draws fresh seeds so the new pair differs from the previous one
+def _version_sampling_options(regenerate: bool):
+    options = [dict(version_options) for version_options in VERSION_SAMPLING_OPTIONS]
+    if regenerate:
+        for version_options in options:
+            version_options["seed"] = random.randint(0, 2**31 - 1)
+    return options
+
+
+# sample candidates for a tournament and show its first pairing
+def _generate_tournament(placeholders):
+    for placeholder in placeholders:
+        placeholder.info(f"Generating {CANDIDATE_COUNT} candidates...")
+    id = st.session_state.problems.id(st.session_state.prompt_index)
+    candidates = deduplicate_candidates(
+        generate_candidates(
+            build_prompt(
+                st.session_state.instruction,
+                st.session_state.problems.get(
+                    st.session_state.prompt_index, "description"
+                ),
+            ),
+            CANDIDATE_COUNT,
+        )
+    )
+    if len(candidates) < 2:
+        return False
+    generation = uuid.uuid4().hex
+    status, message = save_candidates(
+        st.session_state.db_con, id, generation, candidates
+    )
+    if status == DBOperationStatus.ERROR:
+        st.session_state.submit_status = status
+        st.session_state.app_status = message
+        return False
+    _get_tournament_scheduler().start(id, generation, candidates)
+    assign_tournament_pair()
+    return st.session_state.candidate_pair is not None
+
+
 # call codellama to generate code pairs
-def call_codellama():
+@traced()
+def call_codellama(regenerate: bool = False):
     reset_solutions()
-    data = {
-        "model": "codellama",
-        "prompt": f"{st.session_state.instruction}: {st.session_state.problems['description'][st.session_state.prompt_index]}",
-    }
-    headers = {"Content-Type": "application/json"}
-    response = requests.post(OLLAMA_API_ENDPOINT, headers=headers, json=data)
+    if regenerate:
+        st.session_state.regenerations = st.session_state.get("regenerations", 0) + 1
+    # the decision is timed from the new pair
+    st.session_state.pair_shown_at = None
+    placeholders = [column.empty() for column in st.columns(2)]
+    if CANDIDATE_COUNT > 2 and _generate_tournament(placeholders):
+        id = st.session_state.problems.id(st.session_state.prompt_index)
+        _update_local_versions(
+            id, st.session_state.version1, st.session_state.version2
+        )
+        st.session_state.show_submit_status = True
+        run_unit_tests_on_update()
+        return
+    st.session_state.candidate_pair = None
+    for placeholder in placeholders:
+        placeholder.info("Generating...")
+
     # update session state
-    st.session_state.version1, st.session_state.version2 = post_process_response(
-        response.text
+    # regeneration is deliberate, so it skips the generation cache
+    st.session_state.version1, st.session_state.version2 = generate_versions_cached(
+        st.session_state.instruction,
+        st.session_state.problems.get(st.session_state.prompt_index, "description"),
+        _version_sampling_options(regenerate),
+        on_version=lambda index, code: _render_streamed_version(
+            placeholders, index, code
+        ),
+        bypass_cache=regenerate,
+        outcomes_differ=_unit_test_outcomes_differ,
     )
     # update dataframe for local copy
-    id = st.session_state.problems["id"][st.session_state.prompt_index]
-    st.session_state.problems.loc[
-        st.session_state.problems["id"] == id, "version1"
-    ] = st.session_state.version1
-    st.session_state.problems.loc[
-        st.session_state.problems["id"] == id, "version2"
-    ] = st.session_state.version2
-    new_function_name = extract_function_name(st.session_state.version1)
-    # update unit test funtion_name
-    st.session_state.tests.loc[
-        st.session_state.problems["id"] == id, "function_name"
-    ] = new_function_name
+    id = st.session_state.problems.id(st.session_state.prompt_index)
+    _update_local_versions(id, st.session_state.version1, st.session_state.version2)
     # display update status
     st.session_state.show_submit_status = True
     run_unit_tests_on_update()
@@ -247,27 +660,107 @@ def init_app_status():
     st.session_state.app_status = None
 
 
+# initialize the data of a new app session
+def init_session():
+    init_database()
+    st.session_state.debug_mode = False
+    st.session_state.submit_status = None
+    st.session_state.pending_writes = []
+    st.session_state.unit_test_results = {}
+    st.session_state.complexity_results = {}
+    st.session_state.regenerations = 0
+    st.session_state.problem_shown_at = None
+    st.session_state.pair_shown_at = None
+    init_navigation()
+    # start on the first problem that needs a label
+    if not on_next_unlabeled():
+        assign_tournament_pair()
+        run_unit_tests_on_update()
+
+
+# start the session's navigation over the shared work queue
+# (a named labeler is not handed the problems they labeled in earlier sessions)
+def init_navigation(priority: str = NAVIGATION_PRIORITY):
+    st.session_state.navigation_priority = priority
+    labeler = st.session_state.get("labeler_name")
+    labeled = (
+        fetch_labeled_ids(get_database_connection().cursor(), labeler)
+        if labeler
+        else ()
+    )
+    work_queue = _get_work_queue(priority)
+    # claims and completed problems carry over to the rebuilt queue
+    if time.monotonic() - work_queue.updated_at >= CATALOG_REFRESH_INTERVAL:
+        work_queue.update(_build_work_queue(priority))
+    st.session_state.navigation = NavigationQueue(
+        work_queue, st.session_state.session_id, labeled
+    )
+
+
+# skip the problems of the labeler entered in the sidebar
+def on_change_labeler_name():
+    init_navigation(st.session_state.navigation_priority)
+
+
+# reorder the navigation queue from the sidebar
+def on_change_navigation_priority():
+    init_navigation(st.session_state.navigation_priority_select)
+
+
+# jump to the next unlabeled or disagreeing problem
+# (the current problem stays displayed once the queue is exhausted)
+def on_next_unlabeled():
+    while True:
+        id = st.session_state.navigation.next()
+        if id is None:
+            init_app_status()
+            return False
+        # problems added to the catalog after the session started are skipped
+        position = st.session_state.problems.position(id)
+        if position is not None:
+            _show_question(position)
+            return True
+
+
 # change the question to display
 # delta = 1 : move to next question
 # delta = -1: move to prev question
 def on_change_question(delta):
+    _show_question(
+        min(
+            max(st.session_state.prompt_index + delta, 0),
+            len(st.session_state.problems) - 1,
+        )
+    )
+
+
+# display the question at a position
+def _show_question(position):
     init_app_status()
-    st.session_state.prompt_index += delta
-    st.session_state.version1 = st.session_state.problems["version1"][
-        st.session_state.prompt_index
-    ]
-    st.session_state.version2 = st.session_state.problems["version2"][
-        st.session_state.prompt_index
-    ]
+    st.session_state.problem_shown_at = None
+    st.session_state.pair_shown_at = None
+    st.session_state.regenerations = 0
+    _apply_pregenerated_pairs()
+    st.session_state.prompt_index = position
+    st.session_state.version1 = st.session_state.problems.get(
+        st.session_state.prompt_index, "version1"
+    )
+    st.session_state.version2 = st.session_state.problems.get(
+        st.session_state.prompt_index, "version2"
+    )
     if type(st.session_state.version1) is float and math.isnan(
         st.session_state.version1
     ):
         st.session_state.version1 = None
         st.session_state.version2 = None
 
-    preference = st.session_state.problems["preference"][st.session_state.prompt_index]
+    preference = st.session_state.problems.get(
+        st.session_state.prompt_index, "preference"
+    )
     st.session_state.preference = preference if preference else 0
+    assign_tournament_pair()
     run_unit_tests_on_update()
+    schedule_pregeneration()
 
 
 # display two versions of python code
@@ -312,6 +805,14 @@ def display_code_pair():
         """,
         unsafe_allow_html=True,
     )
+    # pairs stored before they were checked, or still alike after the retries
+    similarity = pair_similarity(st.session_state.version1, st.session_state.version2)
+    if similarity >= DUPLICATE_SIMILARITY_THRESHOLD:
+        st.warning(
+            f"The two versions are near-duplicates ({similarity:.0%} similar), "
+            "consider generating the pair again.",
+            icon="⚠️",
+        )
     version1_code_column, version2_code_column = st.columns(2)
     version1, version2 = _align_code_versions(
         st.session_state.version1, st.session_state.version2
@@ -320,3 +821,5 @@ def display_code_pair():
         version_selection_column(1, version1)
     with version2_code_column:
         version_selection_column(2, version2)
+    _display_complexity_estimate()
+    mark_pair_displayed()
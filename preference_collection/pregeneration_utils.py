@@ -0,0 +1,208 @@
+"""
+This module provides a background worker that generates code pairs for the problems
+labelers are about to reach, so navigating forward rarely waits on codellama.
+
+Classes:
+    - PregenerationWorker: Generates and saves code pairs for the upcoming problems of
+      every session on one background thread of the app process.
+
+Dependencies:
+    - atexit: For stopping the worker when the process exits.
+    - threading: For the background worker thread.
+    - cache_utils: For generating code pairs through the generation cache.
+    - duckdb_utils: For saving generated code pairs.
+"""
+
+import atexit
+import threading
+import time
+
+from constants import (
+    PREGENERATION_LOOKAHEAD,
+    PREGENERATION_SESSION_TTL,
+)
+from cache_utils import (
+    generate_versions_cached,
+)
+from duckdb_utils import (
+    save_comparison,
+    DBOperationStatus,
+)
+from typing import Dict, List, Optional, Tuple
+
+
+class PregenerationWorker:
+    """
+    Keeps code pairs generated ahead of time for the next problems without a pair,
+    shared by every session of the app process.
+
+    Each session `schedule`s its upcoming problems as (id, description) jobs,
+    replacing the ones it scheduled before; the worker generates the nearest job of
+    any session first. A generation for a problem no session wants anymore is
+    abandoned. Finished pairs are saved with `save_comparison` and kept for every
+    session that wanted them until it collects them with `take`. Sessions that did
+    not schedule for `session_ttl` seconds, e.g. closed browser tabs, are forgotten.
+    """
+
+    def __init__(
+        self,
+        connection,
+        lookahead: int = PREGENERATION_LOOKAHEAD,
+        session_ttl: float = PREGENERATION_SESSION_TTL,
+    ):
+        # duckdb connections are not shared across threads, use a dedicated cursor
+        self._connection = connection.cursor()
+        self._lookahead = lookahead
+        self._session_ttl = session_ttl
+        self._condition = threading.Condition()
+        self._closed = False
+        # session id -> (instruction, [(id, description)] nearest first, scheduled at)
+        self._jobs = {}
+        # session id -> {id: (version1, version2)} not taken yet
+        self._completed = {}
+        self._in_flight = None
+        self._thread = threading.Thread(
+            target=self._run, name="pregeneration", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def schedule(
+        self, session_id: str, jobs: List[Tuple[int, str]], instruction: str
+    ) -> None:
+        """
+        Replaces the jobs of a session with its upcoming problems.
+
+        Parameters:
+            session_id (str): The scheduling session.
+            jobs (List[Tuple[int, str]]): (id, description) of the next problems
+                without a code pair, nearest first.
+            instruction (str): The instruction given to the model.
+
+        Returns:
+            None
+        """
+        with self._condition:
+            if self._closed:
+                return
+            taken = self._completed.get(session_id, {})
+            self._jobs[session_id] = (
+                instruction,
+                [job for job in jobs if job[0] not in taken][: self._lookahead],
+                time.monotonic(),
+            )
+            self._condition.notify()
+
+    def take(self, session_id: str) -> Dict[int, Tuple[str, str]]:
+        """
+        Collects the code pairs generated for a session since its last call.
+
+        Parameters:
+            session_id (str): The collecting session.
+
+        Returns:
+            Dict[int, Tuple[str, str]]: Generated (version1, version2) by problem id.
+        """
+        with self._condition:
+            return self._completed.pop(session_id, {})
+
+    def close(self) -> None:
+        """
+        Abandons the current generation and stops the background thread.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._jobs.clear()
+            self._condition.notify()
+        self._thread.join()
+        self._connection.close()
+
+    # drop the sessions that stopped scheduling (called with the lock held)
+    def _expire_sessions(self):
+        now = time.monotonic()
+        for session_id, (_, _, scheduled_at) in list(self._jobs.items()):
+            if now - scheduled_at > self._session_ttl:
+                del self._jobs[session_id]
+                self._completed.pop(session_id, None)
+
+    # the nearest job of any session (called with the lock held)
+    def _next_job(self) -> Optional[Tuple[int, str, str]]:
+        self._expire_sessions()
+        nearest = None
+        for instruction, jobs, _ in self._jobs.values():
+            for distance, (id, description) in enumerate(jobs):
+                if nearest is None or distance < nearest[0]:
+                    nearest = (distance, id, instruction, description)
+                break
+        return nearest and nearest[1:]
+
+    def _is_cancelled(self, id: int) -> bool:
+        with self._condition:
+            return self._closed or all(
+                id not in dict(jobs) for _, jobs, _ in self._jobs.values()
+            )
+
+    # take a problem out of every session's jobs
+    # (called with the lock held; returns the sessions that wanted it)
+    def _remove_job(self, id: int) -> List[str]:
+        sessions = []
+        for session_id, (instruction, jobs, scheduled_at) in self._jobs.items():
+            if any(job_id == id for job_id, _ in jobs):
+                sessions.append(session_id)
+                self._jobs[session_id] = (
+                    instruction,
+                    [job for job in jobs if job[0] != id],
+                    scheduled_at,
+                )
+        return sessions
+
+    def _run(self):
+        while True:
+            with self._condition:
+                job = self._next_job()
+                while job is None and not self._closed:
+                    self._condition.wait(self._session_ttl)
+                    job = self._next_job()
+                if self._closed:
+                    return
+                id, instruction, description = job
+                self._in_flight = id
+            try:
+                version1, version2 = self._generate(id, instruction, description)
+            finally:
+                with self._condition:
+                    self._in_flight = None
+                    sessions = self._remove_job(id)
+            if version1 is None or version2 is None:
+                continue
+            status, message = save_comparison(self._connection, id, version1, version2)
+            if status == DBOperationStatus.ERROR:
+                print(f"failed to save pregenerated code pair for {id}: {message}")
+                continue
+            with self._condition:
+                for session_id in sessions:
+                    self._completed.setdefault(session_id, {})[id] = (
+                        version1,
+                        version2,
+                    )
+
+    def _generate(
+        self, id: int, instruction: str, description: str
+    ) -> Tuple[Optional[str], Optional[str]]:
+        try:
+            return generate_versions_cached(
+                instruction,
+                description,
+                should_stop=lambda: self._is_cancelled(id),
+            )
+        except Exception as e:
+            print(f"failed to pregenerate code pair for {id}: {e}")
+            return None, None
@@ -0,0 +1,301 @@
+"""
+This module lets the app work on a local DuckDB file instead of the remote database,
+either as a replica kept in sync with the primary database in the background or as a
+standalone database for development and tests.
+
+Functions:
+    - connect_database(mode: str) -> duckdb.DuckDBPyConnection:
+        Connects to the database the app reads and writes in the given mode.
+    - seed_local_database(connection, source_path: str) -> int:
+        Copies the problems and tests of another database into an empty local one.
+
+Classes:
+    - ReplicaSync: Pushes new labeling events to the primary database and pulls its
+      events and new problems into the local replica on a background thread.
+
+Dependencies:
+    - duckdb: For database operations.
+    - threading: For the background sync thread.
+"""
+
+import duckdb
+import threading
+import time
+
+from constants import (
+    DATABASE_MODE,
+    DATABASE_PATH,
+    LOCAL_DATABASE_PATH,
+    LOCAL_SEED_DATABASE_PATH,
+    REPLICA_PULL_OVERLAP,
+    REPLICA_SYNC_INTERVAL,
+)
+from typing import Callable, Optional, Tuple
+
+
+# tables copied from the primary database into a new replica
+REPLICATED_TABLES = ["leetcode_problems", "leetcode_tests"]
+
+# schema of the problem tables of a standalone local database
+LOCAL_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS leetcode_problems (
+        id INTEGER,
+        difficulty VARCHAR,
+        title VARCHAR,
+        description VARCHAR,
+        version1 VARCHAR,
+        version2 VARCHAR,
+        preference INTEGER
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS leetcode_tests (
+        id INTEGER,
+        function_name VARCHAR,
+        inputs VARCHAR[],
+        outputs VARCHAR[]
+    )
+    """,
+]
+
+# ids of the local events known to be in the primary database
+SYNCED_EVENTS_TABLE = """
+CREATE TABLE IF NOT EXISTS replica_synced_events (
+    event_id VARCHAR PRIMARY KEY,
+    created_at TIMESTAMP
+)
+"""
+
+
+def _table_exists(connection, table: str) -> bool:
+    (count,) = connection.execute(
+        "SELECT count(*) FROM information_schema.tables WHERE table_name = ?",
+        [table],
+    ).fetchone()
+    return count > 0
+
+
+# copy the problem tables of another database into the local one
+def _copy_tables(connection, source_path: str) -> None:
+    source = duckdb.connect(source_path, read_only=True)
+    try:
+        for table in REPLICATED_TABLES:
+            rows = source.execute(f"SELECT * FROM {table}").fetch_arrow_table()
+            connection.register("replicated_rows", rows)
+            connection.execute(f"CREATE OR REPLACE TABLE {table} AS FROM replicated_rows")
+            connection.unregister("replicated_rows")
+    finally:
+        source.close()
+
+
+def seed_local_database(connection, source_path: str) -> int:
+    """
+    Copies the problems and tests of another database into a local database that
+    has no problems yet; a local database with problems is left as it is.
+
+    Parameters:
+        connection: The local database connection.
+        source_path (str): The database the problem tables are copied from.
+
+    Returns:
+        int: The number of seeded problems, 0 if the database already had problems.
+    """
+    if _table_exists(connection, "leetcode_problems"):
+        (existing,) = connection.execute(
+            "SELECT count(*) FROM leetcode_problems"
+        ).fetchone()
+        if existing:
+            return 0
+    _copy_tables(connection, source_path)
+    (seeded,) = connection.execute("SELECT count(*) FROM leetcode_problems").fetchone()
+    return seeded
+
+
+def connect_database(mode: str = DATABASE_MODE):
+    """
+    Connects to the database the app reads and writes.
+
+    Parameters:
+        mode (str): "remote" connects to DATABASE_PATH, "replica" and "local" to
+            LOCAL_DATABASE_PATH. A new replica is seeded with the problem tables of
+            DATABASE_PATH; a new local database with those of
+            LOCAL_SEED_DATABASE_PATH, or gets empty problem tables if it is unset.
+
+    Returns:
+        duckdb.DuckDBPyConnection: The connection.
+    """
+    if mode == "remote":
+        return duckdb.connect(DATABASE_PATH)
+    if mode not in ("replica", "local"):
+        raise ValueError(f"unknown database mode: {mode}")
+    connection = duckdb.connect(LOCAL_DATABASE_PATH)
+    if mode == "replica" and not _table_exists(connection, "leetcode_problems"):
+        _copy_tables(connection, DATABASE_PATH)
+    if mode == "local" and LOCAL_SEED_DATABASE_PATH:
+        seed_local_database(connection, LOCAL_SEED_DATABASE_PATH)
+    for table in LOCAL_TABLES:
+        connection.execute(table)
+    return connection
+
+
+class ReplicaSync:
+    """
+    Keeps a local replica in sync with the primary database every `interval`
+    seconds:
+
+    - push: local labeling events missing from replica_synced_events are inserted
+      into the primary database in one transaction, skipping the ones it already
+      has from a push that failed before being recorded;
+    - pull: primary events created since the last pull (minus REPLICA_PULL_OVERLAP
+      seconds, for writers whose clocks lag) that the replica does not have yet are
+      inserted locally, as are problems and tests with ids above the local ones.
+
+    `on_pull` is called with the local connection after events were pulled, to
+    compact them into the current state. A failed sync, e.g. while offline, is
+    retried at the next interval; local writes are never blocked by it.
+    """
+
+    def __init__(
+        self,
+        connection,
+        primary_path: str = DATABASE_PATH,
+        interval: float = REPLICA_SYNC_INTERVAL,
+        on_pull: Optional[Callable] = None,
+    ):
+        # duckdb connections are not shared across threads, use a dedicated cursor
+        self._connection = connection.cursor()
+        self._connection.execute(SYNCED_EVENTS_TABLE)
+        self._primary_path = primary_path
+        self._primary = None
+        self._interval = interval
+        self._on_pull = on_pull
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._run, name="replica-sync", daemon=True
+        )
+        self._thread.start()
+
+    def sync(self) -> Tuple[int, int]:
+        """
+        Pushes local events and pulls remote changes once.
+
+        Parameters:
+            None
+
+        Returns:
+            Tuple[int, int]: The number of events pushed and pulled.
+        """
+        with self._lock:
+            if self._primary is None:
+                self._primary = duckdb.connect(self._primary_path)
+            try:
+                pushed = self._push()
+                pulled = self._pull()
+            except Exception:
+                # reconnect at the next sync
+                self._primary = None
+                raise
+        if pulled and self._on_pull:
+            self._on_pull(self._connection)
+        return pushed, pulled
+
+    def _push(self) -> int:
+        events = self._connection.execute(
+            """
+            SELECT * FROM labeling_events
+            WHERE event_id NOT IN (SELECT event_id FROM replica_synced_events)
+            ORDER BY created_at
+            """
+        ).fetch_arrow_table()
+        if not events.num_rows:
+            return 0
+        # events pushed before a failed sync may already be on the primary
+        self._primary.register("pushed_events", events)
+        try:
+            self._primary.execute("BEGIN TRANSACTION")
+            self._primary.execute(
+                """
+                INSERT INTO labeling_events
+                SELECT * FROM pushed_events
+                WHERE event_id NOT IN (SELECT event_id FROM labeling_events)
+                """
+            )
+            self._primary.execute("COMMIT")
+        except Exception:
+            self._primary.execute("ROLLBACK")
+            raise
+        finally:
+            self._primary.unregister("pushed_events")
+        self._connection.register("pushed_events", events)
+        try:
+            self._connection.execute(
+                """
+                INSERT OR IGNORE INTO replica_synced_events
+                SELECT event_id, created_at FROM pushed_events
+                """
+            )
+        finally:
+            self._connection.unregister("pushed_events")
+        return events.num_rows
+
+    def _pull(self) -> int:
+        (since,) = self._connection.execute(
+            f"""
+            SELECT max(created_at) - INTERVAL {REPLICA_PULL_OVERLAP} SECOND
+            FROM replica_synced_events
+            """
+        ).fetchone()
+        events = self._primary.execute(
+            "SELECT * FROM labeling_events WHERE ? IS NULL OR created_at > ?",
+            [since, since],
+        ).fetch_arrow_table()
+        self._connection.register("pulled_events", events)
+        try:
+            self._connection.execute("BEGIN TRANSACTION")
+            self._connection.execute(
+                """
+                CREATE OR REPLACE TEMP TABLE new_events AS
+                SELECT * FROM pulled_events
+                WHERE event_id NOT IN (SELECT event_id FROM labeling_events)
+                """
+            )
+            (pulled,) = self._connection.execute(
+                "SELECT count(*) FROM new_events"
+            ).fetchone()
+            self._connection.execute("INSERT INTO labeling_events FROM new_events")
+            self._connection.execute(
+                """
+                INSERT OR IGNORE INTO replica_synced_events
+                SELECT event_id, created_at FROM pulled_events
+                """
+            )
+            for table in REPLICATED_TABLES:
+                self._pull_new_rows(table)
+            self._connection.execute("COMMIT")
+        except Exception:
+            self._connection.execute("ROLLBACK")
+            raise
+        finally:
+            self._connection.unregister("pulled_events")
+        return pulled
+
+    def _pull_new_rows(self, table: str) -> None:
+        (last_id,) = self._connection.execute(
+            f"SELECT max(id) FROM {table}"
+        ).fetchone()
+        rows = self._primary.execute(
+            f"SELECT * FROM {table} WHERE ? IS NULL OR id > ?", [last_id, last_id]
+        ).fetch_arrow_table()
+        if rows.num_rows:
+            self._connection.register("pulled_rows", rows)
+            self._connection.execute(f"INSERT INTO {table} SELECT * FROM pulled_rows")
+            self._connection.unregister("pulled_rows")
+
+    def _run(self):
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"failed to sync the replica: {e}")
+            time.sleep(self._interval)
@@ -1,8 +1,15 @@
+import pandas as pd
 import streamlit as st
-from constants import (
-    DEFAULT_INSTRUCTION,
+from cache_utils import get_generation_cache
+from ollama_utils import default_instruction
+from navigation_utils import NAVIGATION_PRIORITIES
+from preference_selection_panel import (
+    on_change_labeler_name,
+    on_change_navigation_priority,
+    on_change_question,
+    on_next_unlabeled,
 )
-from preference_selection_panel import on_change_question
+from tracing_utils import get_tracer
 
 
 # for debugging only
@@ -10,6 +17,36 @@ def on_toggle_debug_mode():
     st.session_state.debug_mode = st.session_state.debug_mode_toggle
 
 
+# timings of the traced operations and cache counters of the app process
+def display_debug_panel():
+    tracer = get_tracer()
+    st.subheader("Timings")
+    summary = tracer.summary()
+    if summary:
+        st.dataframe(
+            pd.DataFrame(summary).set_index("operation").round(1),
+            use_container_width=True,
+        )
+    else:
+        st.caption("No spans recorded yet.")
+    st.subheader("Generation cache")
+    stats = get_generation_cache().stats()
+    st.markdown(
+        f"hits: `{stats['hits']}` misses: `{stats['misses']}` "
+        f"hit rate: `{stats['hit_rate']:.0%}` saved: `{stats['saved_seconds']:.1f}s`"
+    )
+    export, reset = st.columns(2)
+    with export:
+        st.download_button(
+            "Export spans",
+            tracer.to_jsonl(),
+            file_name="spans.jsonl",
+            mime="application/jsonl",
+        )
+    with reset:
+        st.button("Reset", on_click=tracer.reset)
+
+
 def display_sidebar():
     with st.sidebar:
         # make sidebar header larger
@@ -42,16 +79,48 @@ def display_sidebar():
             else st.session_state.initial_index
         )
         st.header(
-            f"{st.session_state.problems['id'][problem_index]}. {st.session_state.problems['title'][problem_index]}"
+            f"{st.session_state.problems.id(problem_index)}. {st.session_state.problems.get(problem_index, 'title')}"
         )
 
         st.markdown(
-            f"tag: `{st.session_state.problems['difficulty'][problem_index]}`")
-        st.markdown(st.session_state.problems["description"][problem_index])
-        st.text_area("Instruction", DEFAULT_INSTRUCTION, key="instruction")
-        back, forward, _ = st.columns([1, 1, 4])
+            f"tag: `{st.session_state.problems.get(problem_index, 'difficulty')}`")
+        st.markdown(st.session_state.problems.get(problem_index, "description"))
+        st.text_area("Instruction", default_instruction(), key="instruction")
+        back, forward, next_unlabeled, _ = st.columns([1, 1, 1, 3])
 
         with back:
             st.button("◀️", on_click=on_change_question, args=(-1,))
         with forward:
             st.button("▶️", on_click=on_change_question, args=(1,))
+        with next_unlabeled:
+            st.button(
+                "⏭️", help="Next unlabeled problem", on_click=on_next_unlabeled
+            )
+        st.selectbox(
+            "Queue order",
+            NAVIGATION_PRIORITIES,
+            index=NAVIGATION_PRIORITIES.index(st.session_state.navigation_priority),
+            key="navigation_priority_select",
+            on_change=on_change_navigation_priority,
+        )
+        remaining = st.session_state.navigation.remaining()
+        if remaining:
+            st.caption(f"up to {remaining} problems left in the queue")
+        else:
+            st.caption("no unlabeled problems left in the queue")
+
+        st.text_input(
+            "Labeler name",
+            key="labeler_name",
+            help="Optional, groups your labels in the labeling report and skips "
+            "the problems you labeled before",
+            on_change=on_change_labeler_name,
+        )
+        st.checkbox(
+            "Debug mode",
+            value=st.session_state.debug_mode,
+            key="debug_mode_toggle",
+            on_change=on_toggle_debug_mode,
+        )
+        if st.session_state.debug_mode:
+            display_debug_panel()
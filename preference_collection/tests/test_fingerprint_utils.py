@@ -0,0 +1,29 @@
+from fingerprint_utils import fingerprint
+
+
+def canonical_hash(code):
+    return fingerprint(code).canonical_hash
+
+
+def test_canonical_hash_ignores_names_comments_and_docstrings():
+    first = "def add(a, b):\n    '''Adds.'''\n    return a + b  # sum"
+    second = "def plus(x, y):\n\n    return x + y"
+    assert canonical_hash(first) == canonical_hash(second)
+
+
+def test_canonical_hash_keeps_builtins_and_attributes():
+    first = "def f(a):\n    return len(a.keys())"
+    second = "def f(a):\n    return max(a.keys())"
+    third = "def f(a):\n    return len(a.values())"
+    assert canonical_hash(first) != canonical_hash(second)
+    assert canonical_hash(first) != canonical_hash(third)
+
+
+def test_canonical_hash_differs_for_different_code():
+    assert canonical_hash("def f(a):\n    return a + 1") != canonical_hash(
+        "def f(a):\n    return a - 1"
+    )
+
+
+def test_canonical_hash_of_unparsable_code():
+    assert canonical_hash("def f(:\n  x") == canonical_hash("def f(:   x")
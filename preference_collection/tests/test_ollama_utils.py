@@ -0,0 +1,34 @@
+from ollama_utils import CodeFenceDecoder
+
+
+def test_code_fence_decoder_single_chunk():
+    decoder = CodeFenceDecoder()
+    assert decoder.feed("a\n```\nx = 1\n```\nb") == ["\nx = 1\n"]
+    assert decoder.close() == []
+    assert decoder.blocks == ["\nx = 1\n"]
+
+
+def test_code_fence_decoder_fence_split_across_chunks():
+    decoder = CodeFenceDecoder()
+    completed = []
+    for chunk in ["text `", "``\nx", " = 1\n`", "`", "` more ``", "`y``", "`"]:
+        completed += decoder.feed(chunk)
+    assert completed == ["\nx = 1\n", "y"]
+
+
+def test_code_fence_decoder_keeps_inline_backticks():
+    decoder = CodeFenceDecoder()
+    assert decoder.feed("```\na = `b`\n```") == ["\na = `b`\n"]
+
+
+def test_code_fence_decoder_close_flushes_open_block():
+    decoder = CodeFenceDecoder()
+    assert decoder.feed("```\nx = 1``") == []
+    assert decoder.close() == ["\nx = 1``"]
+
+
+def test_code_fence_decoder_close_without_block():
+    decoder = CodeFenceDecoder()
+    decoder.feed("no code here")
+    assert decoder.close() == []
+    assert decoder.blocks == []
@@ -0,0 +1,58 @@
+import numpy as np
+
+from tournament_utils import bradley_terry, ranked_pairs, swiss_pairings
+
+
+def test_swiss_pairings_first_round_pairs_neighbours():
+    assert swiss_pairings(4, []) == [(0, 1), (2, 3)]
+
+
+def test_swiss_pairings_waits_for_the_whole_round():
+    assert swiss_pairings(4, [(0, 1)]) == [(2, 3)]
+
+
+def test_swiss_pairings_pairs_winners_and_losers():
+    assert swiss_pairings(4, [(0, 1), (3, 2)]) == [(0, 3), (1, 2)]
+
+
+def test_swiss_pairings_ends_after_log2_rounds():
+    comparisons = [(0, 1), (2, 3), (0, 2), (1, 3)]
+    assert swiss_pairings(4, comparisons) == []
+
+
+def test_swiss_pairings_single_candidate():
+    assert swiss_pairings(1, []) == []
+
+
+def test_bradley_terry_orders_candidates():
+    strengths = bradley_terry(3, [(0, 1), (1, 2), (0, 2)])
+    assert list(np.argsort(-strengths)) == [0, 1, 2]
+    assert abs(strengths.mean()) < 1e-9
+
+
+def test_bradley_terry_undefeated_candidate_is_finite():
+    strengths = bradley_terry(2, [(0, 1)] * 5)
+    assert np.all(np.isfinite(strengths))
+    assert strengths[0] > strengths[1]
+
+
+def test_bradley_terry_uncompared_candidates_are_equal():
+    strengths = bradley_terry(3, [])
+    assert np.allclose(strengths, 0.0)
+
+
+def test_ranked_pairs_transitive_order():
+    assert ranked_pairs(3, [(0, 1), (1, 2)]) == [(0, 1), (0, 2), (1, 2)]
+
+
+def test_ranked_pairs_majority_of_repeated_pairing():
+    assert ranked_pairs(2, [(1, 0), (0, 1), (1, 0)]) == [(1, 0)]
+
+
+def test_ranked_pairs_leaves_out_ties():
+    assert ranked_pairs(2, [(0, 1), (1, 0)]) == []
+
+
+def test_ranked_pairs_leaves_out_cycles():
+    comparisons = [(0, 1), (1, 2), (2, 0), (0, 3)]
+    assert ranked_pairs(4, comparisons) == [(0, 3), (1, 3), (2, 3)]
@@ -0,0 +1,45 @@
+import pytest
+
+from unit_test_utils import static_check
+
+
+def test_static_check_accepts_solution():
+    code = "class Solution:\n    def f(self, x):\n        return x + 1"
+    assert static_check(code, "f", ["(1)"]) is None
+
+
+def test_static_check_rejects_syntax_error():
+    assert static_check("def f(:\n    pass", "f", []).startswith("syntax error")
+
+
+def test_static_check_rejects_missing_function():
+    assert static_check("def g():\n    pass", "f", []) == "function f is not defined"
+
+
+def test_static_check_rejects_wrong_arity():
+    assert static_check("def f(x):\n    return x", "f", ["(1, 2)"]) == "f takes 1 arguments, tests pass 2"
+
+
+@pytest.mark.parametrize(
+    "code",
+    [
+        "import os\ndef f():\n    pass",
+        "from subprocess import run\ndef f():\n    pass",
+        "def f():\n    return eval('1')",
+        "def f():\n    return f.__globals__",
+        "import sys\ndef f():\n    return sys.modules",
+        "from sys import modules\ndef f():\n    pass",
+        "def f():\n    return getattr(f, '__globals__')['__builtins__']",
+        "def f():\n    return hasattr(f, '__code__')",
+        "def f(name):\n    return getattr(f, name)",
+        "def f():\n    get = getattr\n    return get(f, 'x')",
+        "def f():\n    return __builtins__['eval']('1')",
+    ],
+)
+def test_static_check_rejects_forbidden_code(code):
+    assert static_check(code, "f", []) is not None
+
+
+def test_static_check_allows_safe_attributes():
+    code = "import sys\ndef f(x):\n    return getattr(x, 'real', sys.maxsize)"
+    assert static_check(code, "f", ["(1)"]) is None
@@ -0,0 +1,443 @@
+"""
+This module ranks several candidate solutions of a problem from a small number of
+pairwise comparisons made by labelers, instead of labeling a single code pair.
+
+The candidates sampled for a problem are deduplicated and stored in the
+leetcode_candidates table under a new generation id. Labelers are then shown the
+pairings of a Swiss tournament (candidates with the same number of wins meet, and no
+pairing is repeated), ceil(log2(K)) rounds of K/2 comparisons for K candidates. Each
+comparison is a "candidate_comparison" labeling event, and a Bradley-Terry fit of the
+comparisons ranks every candidate. The preference pairs exported for training are
+the ones the comparisons order directly or transitively, so a finished tournament
+yields many more pairs than its O(K log K) labels.
+
+Functions:
+    - init_candidate_tables(connection) -> None:
+        Creates the candidates table if it does not exist yet.
+    - deduplicate_candidates(candidates: List[str]) -> List[str]:
+        Drops the candidates that are the same canonical code as an earlier one.
+    - swiss_pairings(count: int, comparisons: List[Tuple[int, int]], rounds: int) -> List[Tuple[int, int]]:
+        Returns the pairings of the current round still waiting for a comparison.
+    - bradley_terry(count: int, comparisons: List[Tuple[int, int]]) -> np.ndarray:
+        Fits Bradley-Terry strengths to pairwise comparisons.
+    - ranked_pairs(count: int, comparisons: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        Returns the pairs of candidates the comparisons order, directly or transitively.
+    - save_candidates(connection, id: int, generation: str, candidates: List[str]) -> Tuple[DBOperationStatus, str]:
+        Stores the candidates of a problem as a new generation.
+    - load_tournaments(connection, ids: List[int]) -> Dict[int, Tournament]:
+        Loads the latest candidates of problems and their comparisons.
+
+Classes:
+    - Tournament: The candidates of a problem and the comparisons made so far.
+    - TournamentScheduler: Process-wide scheduler handing out the pending pairings to
+      labelers.
+
+Dependencies:
+    - math: For the number of Swiss rounds.
+    - numpy: For the Bradley-Terry fit.
+    - threading: For sharing the scheduler between sessions.
+    - duckdb_utils: For the operation status.
+    - fingerprint_utils: For comparing candidates.
+"""
+
+import math
+import numpy as np
+import threading
+import time
+
+from collections import Counter
+from constants import (
+    TOURNAMENT_ASSIGNMENT_TTL,
+)
+from duckdb_utils import (
+    DBOperationStatus,
+)
+from fingerprint_utils import (
+    fingerprint,
+)
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+
+# candidate solutions of a problem, one generation per sampling run
+CANDIDATES_TABLE = """
+CREATE TABLE IF NOT EXISTS leetcode_candidates (
+    problem_id INTEGER,
+    generation VARCHAR,
+    candidate INTEGER,
+    code VARCHAR,
+    created_at TIMESTAMP
+)
+"""
+
+
+class Tournament(NamedTuple):
+    """
+    The latest candidates of a problem and the comparisons made between them.
+    """
+
+    generation: str
+    candidates: List[str]
+    # (winner, loser) candidate indexes, oldest first
+    comparisons: List[Tuple[int, int]]
+
+
+def init_candidate_tables(connection) -> None:
+    """
+    Creates the candidates table if it does not exist yet.
+
+    Parameters:
+        connection: The database connection.
+
+    Returns:
+        None
+    """
+    connection.execute(CANDIDATES_TABLE)
+
+
+def deduplicate_candidates(candidates: List[str]) -> List[str]:
+    """
+    Keeps the first candidate of every group with the same canonical code (see
+    fingerprint_utils), so labelers never compare two versions of the same solution.
+    Merely similar candidates are kept, as they may behave differently.
+
+    Parameters:
+        candidates (List[str]): The candidate solutions.
+
+    Returns:
+        List[str]: The distinct candidates, in their original order.
+    """
+    kept = []
+    canonical_hashes = set()
+    for candidate in candidates:
+        canonical_hash = fingerprint(candidate).canonical_hash
+        if canonical_hash not in canonical_hashes:
+            kept.append(candidate)
+            canonical_hashes.add(canonical_hash)
+    return kept
+
+
+# check that a comparison is between two distinct candidates of a tournament
+def _is_pairing(count: int, winner: int, loser: int) -> bool:
+    return 0 <= winner < count and 0 <= loser < count and winner != loser
+
+
+def _swiss_round(count: int, wins: List[int], played: set) -> List[Tuple[int, int]]:
+    # candidates with the most wins meet first; a candidate without an opponent it
+    # has not met yet sits the round out
+    unpaired = sorted(range(count), key=lambda candidate: (-wins[candidate], candidate))
+    pairings = []
+    while len(unpaired) > 1:
+        candidate = unpaired.pop(0)
+        for opponent in unpaired:
+            if frozenset((candidate, opponent)) not in played:
+                unpaired.remove(opponent)
+                pairings.append((candidate, opponent))
+                break
+    return pairings
+
+
+def swiss_pairings(
+    count: int, comparisons: List[Tuple[int, int]], rounds: Optional[int] = None
+) -> List[Tuple[int, int]]:
+    """
+    Replays a Swiss tournament over the comparisons made so far and returns the
+    pairings of the current round that were not compared yet. A round starts once
+    every pairing of the previous one was compared; the winner of a pairing compared
+    several times is the one picked most often.
+
+    Parameters:
+        count (int): The number of candidates.
+        comparisons (List[Tuple[int, int]]): (winner, loser) candidate indexes.
+        rounds (int): The number of rounds, ceil(log2(count)) by default.
+
+    Returns:
+        List[Tuple[int, int]]: The pending pairings, empty once the tournament is over.
+    """
+    if count < 2:
+        return []
+    if rounds is None:
+        rounds = math.ceil(math.log2(count))
+    winners = {}
+    for winner, loser in comparisons:
+        winners.setdefault(frozenset((winner, loser)), []).append(winner)
+    wins = [0] * count
+    played = set()
+    for _ in range(rounds):
+        pairings = _swiss_round(count, wins, played)
+        pending = [pair for pair in pairings if frozenset(pair) not in winners]
+        if pending:
+            return pending
+        for pair in pairings:
+            (winner, _), = Counter(winners[frozenset(pair)]).most_common(1)
+            wins[winner] += 1
+            played.add(frozenset(pair))
+    return []
+
+
+def bradley_terry(
+    count: int,
+    comparisons: List[Tuple[int, int]],
+    prior: float = 0.1,
+    iterations: int = 200,
+    tolerance: float = 1e-8,
+) -> np.ndarray:
+    """
+    Fits Bradley-Terry strengths to pairwise comparisons with the MM algorithm
+    (Hunter, 2004). A small prior of virtual ties between every pair keeps the fit
+    finite for undefeated candidates and for candidates that were never compared.
+
+    Parameters:
+        count (int): The number of candidates.
+        comparisons (List[Tuple[int, int]]): (winner, loser) candidate indexes.
+        prior (float): Virtual wins added in both directions for every pair.
+        iterations (int): Maximum number of MM updates.
+        tolerance (float): Largest change of the strengths at convergence.
+
+    Returns:
+        np.ndarray: Log-strengths of the candidates, centered at 0; a higher value
+            means a more preferred candidate.
+    """
+    wins = np.full((count, count), prior)
+    np.fill_diagonal(wins, 0.0)
+    for winner, loser in comparisons:
+        wins[winner, loser] += 1
+    games = wins + wins.T
+    total_wins = wins.sum(axis=1)
+    strengths = np.ones(count)
+    for _ in range(iterations):
+        denominator = (games / (strengths[:, None] + strengths[None, :])).sum(axis=1)
+        updated = total_wins / denominator
+        updated /= np.exp(np.log(updated).mean())
+        converged = np.abs(updated - strengths).max() < tolerance
+        strengths = updated
+        if converged:
+            break
+    return np.log(strengths)
+
+
+def ranked_pairs(
+    count: int, comparisons: List[Tuple[int, int]]
+) -> List[Tuple[int, int]]:
+    """
+    Returns the pairs of candidates ordered by the comparisons, directly or through a
+    chain of them (a beats b and b beats c orders a over c). A pairing compared
+    several times is won by the candidate picked most often, and is left out on a
+    tie; pairs ordered both ways by a cycle of wins are left out too, so every pair
+    is supported by labels, never by the Bradley-Terry prior alone.
+
+    Parameters:
+        count (int): The number of candidates.
+        comparisons (List[Tuple[int, int]]): (winner, loser) candidate indexes.
+
+    Returns:
+        List[Tuple[int, int]]: (preferred, other) candidate indexes.
+    """
+    votes = Counter(comparisons)
+    beats = np.zeros((count, count), dtype=bool)
+    for (winner, loser), wins in votes.items():
+        if wins > votes[(loser, winner)]:
+            beats[winner, loser] = True
+    # transitive closure (Warshall)
+    for middle in range(count):
+        beats |= beats[:, [middle]] & beats[[middle], :]
+    return [
+        (first, second)
+        for first in range(count)
+        for second in range(count)
+        if beats[first, second] and not beats[second, first]
+    ]
+
+
+def save_candidates(
+    connection, id: int, generation: str, candidates: List[str]
+) -> Tuple[DBOperationStatus, str]:
+    """
+    Stores the candidates of a problem as a new generation, replacing the earlier
+    ones for scheduling and ranking.
+
+    Parameters:
+        connection: The database connection.
+        id (int): The ID of the LeetCode problem.
+        generation (str): The new generation id.
+        candidates (List[str]): The distinct candidates.
+
+    Returns:
+        Tuple[DBOperationStatus, str]: The status of the database operation and a message.
+    """
+    try:
+        connection.executemany(
+            "INSERT INTO leetcode_candidates VALUES (?, ?, ?, ?, now())",
+            [
+                (int(id), generation, index, code)
+                for index, code in enumerate(candidates)
+            ],
+        )
+        return DBOperationStatus.SUCCESS, "Candidates have been saved sucessfully!"
+    except Exception as e:
+        return DBOperationStatus.ERROR, e
+
+
+def load_tournaments(
+    connection, ids: Optional[List[int]] = None
+) -> Dict[int, Tournament]:
+    """
+    Loads the latest candidate generation of problems and its comparisons.
+
+    Parameters:
+        connection: The database connection.
+        ids (List[int]): The problems to load, every problem with candidates if None.
+
+    Returns:
+        Dict[int, Tournament]: The tournaments by problem id.
+    """
+    where = "" if ids is None else "WHERE problem_id IN (SELECT unnest(?))"
+    parameters = [] if ids is None else [[int(id) for id in ids]]
+    rows = connection.execute(
+        f"""
+        WITH latest AS (
+            SELECT problem_id, arg_max(generation, created_at) AS generation
+            FROM leetcode_candidates {where} GROUP BY problem_id
+        )
+        SELECT problem_id, generation, list(code ORDER BY candidate)
+        FROM leetcode_candidates JOIN latest USING (problem_id, generation)
+        GROUP BY problem_id, generation
+        """,
+        parameters,
+    ).fetchall()
+    tournaments = {
+        id: Tournament(generation, candidates, [])
+        for id, generation, candidates in rows
+    }
+    if not tournaments:
+        return tournaments
+    comparisons = connection.execute(
+        """
+        SELECT
+            problem_id,
+            payload->>'generation',
+            CAST(payload->>'winner' AS INTEGER),
+            CAST(payload->>'loser' AS INTEGER)
+        FROM labeling_events
+        WHERE action = 'candidate_comparison'
+            AND problem_id IN (SELECT unnest(?))
+        ORDER BY created_at
+        """,
+        [list(tournaments)],
+    ).fetchall()
+    for id, generation, winner, loser in comparisons:
+        tournament = tournaments[id]
+        if tournament.generation == generation and _is_pairing(
+            len(tournament.candidates), winner, loser
+        ):
+            tournament.comparisons.append((winner, loser))
+    return tournaments
+
+
+class TournamentScheduler:
+    """
+    Hands out the pending pairings of the problems' tournaments to the labelers of
+    the app process. A pairing shown to a labeler is reserved for
+    `assignment_ttl` seconds, so concurrent labelers on the same problem get
+    different pairings of the round while there are any left.
+
+    Tournaments are loaded from the database on first use and then kept up to date
+    with the comparisons and generations recorded through the scheduler.
+    """
+
+    def __init__(self, connection, assignment_ttl: float = TOURNAMENT_ASSIGNMENT_TTL):
+        # duckdb connections are not shared across threads, use a dedicated cursor
+        self._connection = connection.cursor()
+        init_candidate_tables(self._connection)
+        self._assignment_ttl = assignment_ttl
+        self._lock = threading.Lock()
+        self._tournaments = {}
+        # problem id -> {pairing: reservation time}
+        self._assignments = {}
+
+    def tournament(self, id: int) -> Optional[Tournament]:
+        """
+        Returns the tournament of a problem.
+
+        Parameters:
+            id (int): The ID of the LeetCode problem.
+
+        Returns:
+            Tournament: The tournament, or None if the problem has no candidates.
+        """
+        id = int(id)
+        with self._lock:
+            if id not in self._tournaments:
+                self._tournaments[id] = load_tournaments(self._connection, [id]).get(id)
+            return self._tournaments[id]
+
+    def start(self, id: int, generation: str, candidates: List[str]) -> None:
+        """
+        Replaces the tournament of a problem with newly saved candidates.
+
+        Parameters:
+            id (int): The ID of the LeetCode problem.
+            generation (str): The generation id the candidates were saved with.
+            candidates (List[str]): The candidates.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._tournaments[int(id)] = Tournament(generation, candidates, [])
+            self._assignments.pop(int(id), None)
+
+    def assign(self, id: int) -> Optional[Tuple[int, int]]:
+        """
+        Reserves the next pending pairing of a problem's tournament.
+
+        Parameters:
+            id (int): The ID of the LeetCode problem.
+
+        Returns:
+            Tuple[int, int]: The candidate indexes to compare, or None if the problem
+                has no tournament or it is over.
+        """
+        tournament = self.tournament(id)
+        if tournament is None:
+            return None
+        with self._lock:
+            pending = swiss_pairings(
+                len(tournament.candidates), tournament.comparisons
+            )
+            if not pending:
+                return None
+            now = time.monotonic()
+            assignments = self._assignments.setdefault(int(id), {})
+            # every pairing is reserved: share the least recently shown one
+            pairing = min(pending, key=lambda pair: assignments.get(pair, -math.inf))
+            for pair in pending:
+                if now - assignments.get(pair, -math.inf) >= self._assignment_ttl:
+                    pairing = pair
+                    break
+            assignments[pairing] = now
+            return pairing
+
+    def record(self, id: int, generation: str, winner: int, loser: int) -> None:
+        """
+        Records a comparison of the problem's current tournament. A comparison of
+        an earlier generation, e.g. shown before another labeler generated new
+        candidates, is ignored.
+
+        Parameters:
+            id (int): The ID of the LeetCode problem.
+            generation (str): The generation of the compared candidates.
+            winner (int): The preferred candidate.
+            loser (int): The other candidate.
+
+        Returns:
+            None
+        """
+        tournament = self.tournament(id)
+        if tournament is None or tournament.generation != generation:
+            return
+        if not _is_pairing(len(tournament.candidates), winner, loser):
+            return
+        with self._lock:
+            tournament.comparisons.append((winner, loser))
+            self._assignments.get(int(id), {}).pop((winner, loser), None)
+            self._assignments.get(int(id), {}).pop((loser, winner), None)
@@ -0,0 +1,257 @@
+"""
+This module provides lightweight timing instrumentation for the hot paths of the app:
+timed spans aggregated per operation into latency percentiles, shared by every session
+of the app process.
+
+Functions:
+    - get_tracer() -> Tracer:
+        Returns the process-wide tracer.
+    - span(name: str):
+        Context manager timing a block as a span of the given operation.
+    - traced(name: str = None) -> Callable:
+        Decorator timing every call of a function as a span.
+
+Classes:
+    - Tracer: Records spans in bounded per-operation buffers, summarizes them into
+      p50/p95/p99 latencies and exports them as JSONL.
+
+Dependencies:
+    - contextlib: For the span context manager.
+    - functools: For preserving the metadata of traced functions.
+    - json: For the JSONL export.
+    - threading: For recording spans from background threads.
+"""
+
+import functools
+import json
+import threading
+import time
+
+from collections import deque
+from constants import (
+    TRACE_MAX_SPANS,
+    TRACING_ENABLED,
+)
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    # linear interpolation between the closest ranks, like numpy.percentile
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class Tracer:
+    """
+    Records timed spans per operation. Every operation keeps its `max_spans` most
+    recent spans, so memory stays bounded however long the app runs, and the
+    percentiles reflect recent behavior. Recording a span only takes a lock and a
+    deque append; the percentiles are computed when a summary is requested.
+    """
+
+    def __init__(
+        self, max_spans: int = TRACE_MAX_SPANS, enabled: bool = TRACING_ENABLED
+    ):
+        self.enabled = enabled
+        self._max_spans = max_spans
+        self._lock = threading.Lock()
+        # operation -> deque of (start wall time, duration in seconds, thread name, error)
+        self._spans = {}
+
+    def record(
+        self, name: str, started: float, duration: float, error: Optional[str] = None
+    ) -> None:
+        """
+        Records a finished span.
+
+        Parameters:
+            name (str): The operation.
+            started (float): The wall-clock start time, in seconds since the epoch.
+            duration (float): The duration, in seconds.
+            error (str): The exception type if the operation raised, otherwise None.
+
+        Returns:
+            None
+        """
+        span = (started, duration, threading.current_thread().name, error)
+        with self._lock:
+            spans = self._spans.get(name)
+            if spans is None:
+                spans = self._spans[name] = deque(maxlen=self._max_spans)
+            spans.append(span)
+
+    @contextmanager
+    def span(self, name: str):
+        """
+        Times the enclosed block as a span of an operation.
+
+        Parameters:
+            name (str): The operation.
+
+        Returns:
+            None
+        """
+        if not self.enabled:
+            yield
+            return
+        started = time.time()
+        start = time.perf_counter()
+        error = None
+        try:
+            yield
+        # streamlit reruns and stops are BaseExceptions, not errors
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            self.record(name, started, time.perf_counter() - start, error)
+
+    def summary(self) -> List[Dict]:
+        """
+        Summarizes the recorded spans of every operation.
+
+        Parameters:
+            None
+
+        Returns:
+            List[Dict]: operation, count, errors and the mean, p50, p95, p99 and max
+                durations in milliseconds, slowest p95 first.
+        """
+        with self._lock:
+            spans = {name: list(spans) for name, spans in self._spans.items()}
+        rows = []
+        for name, recorded in spans.items():
+            durations = sorted(duration * 1000 for _, duration, _, _ in recorded)
+            rows.append(
+                {
+                    "operation": name,
+                    "count": len(recorded),
+                    "errors": sum(error is not None for _, _, _, error in recorded),
+                    "mean_ms": sum(durations) / len(durations),
+                    "p50_ms": _percentile(durations, 50),
+                    "p95_ms": _percentile(durations, 95),
+                    "p99_ms": _percentile(durations, 99),
+                    "max_ms": durations[-1],
+                }
+            )
+        return sorted(rows, key=lambda row: row["p95_ms"], reverse=True)
+
+    def to_jsonl(self) -> str:
+        """
+        Serializes the recorded spans, one JSON object per line.
+
+        Parameters:
+            None
+
+        Returns:
+            str: The spans (operation, start, duration_ms, thread, error) ordered by
+                start time.
+        """
+        with self._lock:
+            spans = [
+                (started, name, duration, thread, error)
+                for name, recorded in self._spans.items()
+                for started, duration, thread, error in recorded
+            ]
+        return "".join(
+            json.dumps(
+                {
+                    "operation": name,
+                    "start": started,
+                    "duration_ms": duration * 1000,
+                    "thread": thread,
+                    "error": error,
+                }
+            )
+            + "\n"
+            for started, name, duration, thread, error in sorted(spans)
+        )
+
+    def export_jsonl(self, path: str) -> int:
+        """
+        Writes the recorded spans to a JSONL file.
+
+        Parameters:
+            path (str): The file to write.
+
+        Returns:
+            int: The number of exported spans.
+        """
+        lines = self.to_jsonl()
+        with open(path, "w") as file:
+            file.write(lines)
+        return lines.count("\n")
+
+    def reset(self) -> None:
+        """
+        Drops every recorded span.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self._spans.clear()
+
+
+def get_tracer() -> Tracer:
+    """
+    Returns the process-wide tracer.
+
+    Parameters:
+        None
+
+    Returns:
+        Tracer: The tracer.
+    """
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+        return _tracer
+
+
+def span(name: str):
+    """
+    Times the enclosed block as a span of an operation, e.g. `with span("rerun"): ...`.
+
+    Parameters:
+        name (str): The operation.
+
+    Returns:
+        A context manager.
+    """
+    return get_tracer().span(name)
+
+
+def traced(name: str = None) -> Callable:
+    """
+    Decorator timing every call of a function as a span.
+
+    Parameters:
+        name (str): The operation, defaults to the function name.
+
+    Returns:
+        Callable: The decorator.
+    """
+
+    def decorator(function: Callable) -> Callable:
+        operation = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with get_tracer().span(operation):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
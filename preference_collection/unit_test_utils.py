@@ -15,16 +15,73 @@ Functions:
         Processes the results of executed unit tests and returns the results as a list.
     
     - run_unit_tests(solution_path: str, test_path: str, function_name: str, script: str, inputs: str, outputs: str) -> List[str]:
-        Generates solution and test files, runs the unit tests, and processes the results.
+        Generates solution and test files in a private scratch directory, runs the unit tests,
+        and processes the results.
+
+    - static_check(code: str, function_name: str, inputs: List[str]) -> Optional[str]:
+        Rejects snippets that do not compile, do not define the tested function with a
+        matching signature, or use forbidden imports or calls, without executing them.
+
+    - is_transient(result: List[Dict]) -> bool:
+        Tells whether test results depend on the host rather than the code (a timeout
+        or a crashed sandbox worker), so they should be retried instead of cached.
+
+    - run_test_cases(code: str, function_name: str, inputs: List[str], outputs: List[str], timeout: float, repeats: int) -> List[Dict]:
+        Executes a code snippet in a fresh namespace, runs each test case with a timeout
+        and records its wall time, CPU time and peak memory.
+
+Classes:
+    - SandboxPool: Pool of warm, resource-limited worker processes running test cases
+      sent over a pipe.
 
 Dependencies:
+    - ast: For static checks of code snippets.
+    - builtins: For giving each sandbox job its own builtins.
+    - os: For file path operations.
+    - tempfile: For per-run scratch directories.
     - subprocess: For running shell commands.
     - re: For regular expression operations.
+    - multiprocessing: For the sandbox worker processes.
+    - tracing_utils: For timing unit test runs.
+    - resource: For limiting the resources of sandbox workers.
+    - signal: For per-case timeouts.
+    - time: For wall and CPU time measurement.
+    - tracemalloc: For peak memory measurement.
 """
 
+import ast
+import builtins
+import io
+import multiprocessing
+import os
+import queue
+import signal
 import subprocess
 import re
-from typing import List, Tuple
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from concurrent.futures import ThreadPoolExecutor
+from constants import (
+    FORBIDDEN_ATTRIBUTES,
+    FORBIDDEN_CALLS,
+    FORBIDDEN_MODULES,
+    PROFILE_REPEATS,
+    SANDBOX_CASE_TIMEOUT,
+    SANDBOX_MEMORY_LIMIT,
+    SANDBOX_POOL_SIZE,
+)
+from tracing_utils import (
+    traced,
+)
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # not available on windows
+    resource = None
 
 
 def extract_function_name(signature: str) -> str:
@@ -80,9 +137,10 @@ def generate_solution_file(
         test_cases_str += (
             f"        self.assertEqual({function_name}({input}), {output})\n"
         )
+    solution_module = os.path.splitext(os.path.basename(solution_path))[0]
     test = f"""
 import unittest
-from {solution_path.split('.')[0]} import {function_name}
+from {solution_module} import {function_name}
 
 class TestSolution(unittest.TestCase):
 {test_cases_str}
@@ -97,6 +155,8 @@ if __name__ == "__main__":
 def execute_script(script_path: str) -> Tuple[str, str]:
     """
     Executes a Python script and captures its standard output and error.
+    The script's directory comes first on its import path, and no bytecode is
+    cached, so a rewritten solution file is never served from a stale .pyc.
     Parameters:
         script_path (str): Python script path
 
@@ -104,7 +164,7 @@ def execute_script(script_path: str) -> Tuple[str, str]:
         None
     """
     result = subprocess.run(
-        ["python", script_path],
+        [sys.executable, "-B", script_path],
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
         text=True,
@@ -134,6 +194,7 @@ def process_unit_tests(script_path: str) -> List[str]:
     return results
 
 
+@traced()
 def run_unit_tests(
     solution_path: str,
     test_path: str,
@@ -144,9 +205,11 @@ def run_unit_tests(
 ) -> List[str]:
     """
     Generates solution and test files, runs the unit tests, and processes the results.
+    Every run writes its files to its own temporary directory, removed afterwards,
+    so concurrent sessions never overwrite each other's files.
     Parameters:
-        solution_path (str): Destination path for the solution file.
-        test_path (str): Destination path for the unit test file.
+        solution_path (str): File name of the solution inside the scratch directory.
+        test_path (str): File name of the unit test inside the scratch directory.
         function_name (str): Name of the function to be tested.
         script (str): Provided code snippet.
         inputs (List[str]): List of inputs for unit tests.
@@ -155,12 +218,477 @@ def run_unit_tests(
     Returns:
         unit_test_results: (List(str)): List of unit test results
     """
-    generate_solution_file(
-        solution_path,
-        test_path,
-        function_name,
-        script,
-        inputs,
-        outputs,
+    with tempfile.TemporaryDirectory(prefix="unit_tests_") as scratch_directory:
+        test_path = os.path.join(scratch_directory, os.path.basename(test_path))
+        generate_solution_file(
+            os.path.join(scratch_directory, os.path.basename(solution_path)),
+            test_path,
+            function_name,
+            script,
+            inputs,
+            outputs,
+        )
+        return process_unit_tests(test_path)
+
+
+def _find_function(tree: ast.Module, function_name: str):
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            if node.name == function_name:
+                return node, False
+        elif isinstance(node, ast.ClassDef) and node.name == "Solution":
+            for item in node.body:
+                if (
+                    isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef))
+                    and item.name == function_name
+                ):
+                    return item, True
+    return None, False
+
+
+def _check_arity(function: ast.FunctionDef, is_method: bool, input: str) -> str:
+    call = ast.parse(f"f({input[1:-1]})", mode="eval").body
+    parameters = function.args.posonlyargs + function.args.args
+    if is_method and parameters:
+        parameters = parameters[1:]
+    names = [parameter.arg for parameter in parameters]
+    keyword_names = names[len(function.args.posonlyargs) :] + [
+        parameter.arg for parameter in function.args.kwonlyargs
+    ]
+    if len(call.args) > len(names) and function.args.vararg is None:
+        return f"{function.name} takes {len(names)} arguments, tests pass {len(call.args)}"
+    passed = set(names[: len(call.args)])
+    for keyword in call.keywords:
+        if keyword.arg not in keyword_names and function.args.kwarg is None:
+            return f"{function.name} has no parameter named {keyword.arg}"
+        passed.add(keyword.arg)
+    required = names[: len(names) - len(function.args.defaults)] + [
+        parameter.arg
+        for parameter, default in zip(
+            function.args.kwonlyargs, function.args.kw_defaults
+        )
+        if default is None
+    ]
+    missing = [name for name in required if name not in passed]
+    if missing:
+        return f"tests do not pass {', '.join(missing)} to {function.name}"
+    return None
+
+
+# the forbidden attribute an access of `attribute` on `value` uses, if any
+def _forbidden_attribute(
+    value: ast.AST, attribute: str, module_names: Dict[str, str]
+) -> Optional[str]:
+    if attribute in FORBIDDEN_ATTRIBUTES:
+        return attribute
+    if isinstance(value, ast.Name) and value.id in module_names:
+        qualified = f"{module_names[value.id]}.{attribute}"
+        if qualified in FORBIDDEN_ATTRIBUTES:
+            return qualified
+    return None
+
+
+def static_check(code: str, function_name: str, inputs: List[str]) -> Optional[str]:
+    """
+    Checks a code snippet without executing it: it must compile, define the tested
+    function (at the top level or in a Solution class) with a signature matching the
+    test inputs, and neither import a forbidden module, call a forbidden builtin nor
+    use a forbidden attribute, including through getattr or hasattr with a constant
+    name. getattr with a computed name, or passed around instead of called, is
+    rejected as its attribute cannot be checked.
+
+    Parameters:
+        code (str): Provided code snippet.
+        function_name (str): Name of the function to be tested.
+        inputs (List[str]): List of inputs for unit tests.
+
+    Returns:
+        str: The reason the snippet is rejected, or None if it passes.
+    """
+    try:
+        tree = ast.parse(code)
+        compile(tree, "solution.py", "exec")
+    except (SyntaxError, ValueError) as e:
+        return f"syntax error: {e}"
+    # names bound to imported modules, to qualify their attributes
+    module_names = {
+        (alias.asname or alias.name).split(".")[0]: alias.name.split(".")[0]
+        for node in ast.walk(tree)
+        if isinstance(node, ast.Import)
+        for alias in node.names
+    }
+    # functions that are called, as opposed to merely referenced
+    called = {
+        id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)
+    }
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            modules = [node.module or ""]
+            for alias in node.names:
+                if f"{node.module}.{alias.name}" in FORBIDDEN_ATTRIBUTES:
+                    return f"forbidden attribute: {node.module}.{alias.name}"
+        else:
+            modules = []
+        for module in modules:
+            if module.split(".")[0] in FORBIDDEN_MODULES:
+                return f"forbidden import: {module}"
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            if node.func.id in FORBIDDEN_CALLS:
+                return f"forbidden call: {node.func.id}()"
+            if node.func.id in ("getattr", "hasattr") and len(node.args) >= 2:
+                name = node.args[1]
+                if isinstance(name, ast.Constant) and isinstance(name.value, str):
+                    attribute = _forbidden_attribute(
+                        node.args[0], name.value, module_names
+                    )
+                    if attribute is not None:
+                        return f"forbidden attribute: {attribute}"
+                elif node.func.id == "getattr":
+                    return "forbidden call: getattr() with a computed name"
+        if isinstance(node, ast.Name) and node.id == "getattr" and id(node) not in called:
+            return "forbidden reference: getattr"
+        if isinstance(node, ast.Name) and node.id in FORBIDDEN_ATTRIBUTES:
+            return f"forbidden attribute: {node.id}"
+        if isinstance(node, ast.Attribute):
+            attribute = _forbidden_attribute(node.value, node.attr, module_names)
+            if attribute is not None:
+                return f"forbidden attribute: {attribute}"
+    if extract_function_name(code) is None:
+        return "no function definition"
+    function, is_method = _find_function(tree, function_name)
+    if function is None:
+        return f"function {function_name} is not defined"
+    if inputs:
+        try:
+            return _check_arity(function, is_method, inputs[0])
+        except SyntaxError:
+            # malformed test input, leave it to the run to report
+            return None
+    return None
+
+
+class _CaseTimeout(Exception):
+    pass
+
+
+def _on_case_timeout(signum, frame):
+    raise _CaseTimeout()
+
+
+# swallow anything the solution prints
+class _DiscardOutput(io.TextIOBase):
+    def write(self, text):
+        return len(text)
+
+
+# error prefix of the cases a crashed sandbox worker could not run
+_WORKER_CRASHED = "worker crashed"
+
+
+def _case_result(status: str, error: str = None) -> Dict:
+    return {
+        "status": status,
+        "error": error,
+        "wall_time": None,
+        "cpu_time": None,
+        "peak_memory": None,
+    }
+
+
+def _resolve_function(namespace: Dict, function_name: str):
+    function = namespace.get(function_name)
+    if callable(function):
+        return function
+    # leetcode style solutions wrap the function in a Solution class
+    solution = namespace.get("Solution")
+    if isinstance(solution, type):
+        return getattr(solution(), function_name, None)
+    return None
+
+
+def _capture_arguments(*args, **kwargs):
+    return args, kwargs
+
+
+def _call_case(
+    function, arguments: str, timeout: float, trace_memory: bool = False
+) -> Tuple:
+    # arguments are rebuilt for every call since solutions may mutate them
+    args, kwargs = eval(
+        f"__arguments__({arguments})", {"__arguments__": _capture_arguments}
     )
-    return process_unit_tests(test_path)
+    peak_memory = None
+    if trace_memory:
+        tracemalloc.start()
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        actual = function(*args, **kwargs)
+        cpu_time = time.process_time() - cpu_start
+        wall_time = time.perf_counter() - wall_start
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        if trace_memory:
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return actual, wall_time, cpu_time, peak_memory
+
+
+def run_test_cases(
+    code: str,
+    function_name: str,
+    inputs: List[str],
+    outputs: Optional[List[str]],
+    timeout: float = SANDBOX_CASE_TIMEOUT,
+    repeats: int = PROFILE_REPEATS,
+    profile_memory: bool = True,
+) -> List[Dict]:
+    """
+    Executes a code snippet in a fresh namespace, runs each test case and profiles
+    the cases that complete. Meant to run inside a sandbox worker: timeouts rely on
+    SIGALRM, so it must be called from the main thread of the process.
+
+    Parameters:
+        code (str): Provided code snippet.
+        function_name (str): Name of the function to be tested.
+        inputs (List[str]): List of inputs for unit tests.
+        outputs (List[str]): List of expected outputs for unit tests, or None to
+            only time the calls (every completed case then passes).
+        timeout (float): Time limit of each call in seconds.
+        repeats (int): Number of timed calls per case; the fastest one is kept.
+        profile_memory (bool): Whether to measure the peak memory of each case.
+
+    Returns:
+        results (List[Dict]): One result per test case, with "status" set to
+            "." (pass), "F" (fail), "E" (error), "T" (timeout) or "R" (rejected by
+            the static check, see SandboxPool.run), "error" set
+            to the error message, if any, and "wall_time", "cpu_time" (seconds)
+            and "peak_memory" (bytes allocated by the call, measured in a separate
+            traced call) set for the cases that completed.
+    """
+    # a private copy of the builtins keeps a job from patching them for the next one
+    namespace = {"__name__": "solution", "__builtins__": dict(builtins.__dict__)}
+    try:
+        exec(compile(code, "solution.py", "exec"), namespace)
+        function = _resolve_function(namespace, function_name)
+        if function is None:
+            raise NameError(f"name '{function_name}' is not defined")
+    except Exception as e:
+        return [_case_result("E", repr(e)) for _ in inputs]
+
+    if outputs is None:
+        outputs = [None] * len(inputs)
+    results = []
+    previous_handler = signal.signal(signal.SIGALRM, _on_case_timeout)
+    try:
+        for input, output in zip(inputs, outputs):
+            # same argument format as the generated unittest files
+            input = input[1:-1]
+            try:
+                actual, wall_time, cpu_time, _ = _call_case(function, input, timeout)
+                expected = actual if output is None else eval(output[1:-1], {})
+                if actual == expected:
+                    result = _case_result(".")
+                else:
+                    result = _case_result("F", f"{actual!r} != {expected!r}")
+                # repeat the call to reduce timing noise
+                for _ in range(repeats - 1):
+                    _, repeat_wall_time, repeat_cpu_time, _ = _call_case(
+                        function, input, timeout
+                    )
+                    wall_time = min(wall_time, repeat_wall_time)
+                    cpu_time = min(cpu_time, repeat_cpu_time)
+                # tracing slows the call down, so memory is measured on its own
+                peak_memory = None
+                if profile_memory:
+                    peak_memory = _call_case(function, input, timeout, True)[3]
+                result.update(
+                    wall_time=wall_time, cpu_time=cpu_time, peak_memory=peak_memory
+                )
+                results.append(result)
+            except _CaseTimeout:
+                results.append(_case_result("T", f"timed out after {timeout}s"))
+            except Exception as e:
+                results.append(_case_result("E", repr(e)))
+    finally:
+        signal.signal(signal.SIGALRM, previous_handler)
+    return results
+
+
+def _limit_resources():
+    if resource is None:
+        return
+    resource.setrlimit(resource.RLIMIT_AS, (SANDBOX_MEMORY_LIMIT, SANDBOX_MEMORY_LIMIT))
+    # solutions have no business writing files or spawning processes
+    resource.setrlimit(resource.RLIMIT_FSIZE, (0, 0))
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+
+
+def _sandbox_worker_main(connection):
+    sys.stdout = _DiscardOutput()
+    sys.stderr = _DiscardOutput()
+    _limit_resources()
+    while True:
+        try:
+            job = connection.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        preloaded_modules = set(sys.modules)
+        try:
+            results = run_test_cases(**job)
+        except BaseException as e:
+            results = [_case_result("E", repr(e)) for _ in job["inputs"]]
+        # forget modules imported by the job so the next one imports them afresh
+        for name in set(sys.modules) - preloaded_modules:
+            del sys.modules[name]
+        connection.send(results)
+
+
+def is_transient(result: List[Dict]) -> bool:
+    """
+    Tells whether test results depend on the state of the host rather than on the
+    code: a case timed out, e.g. on a loaded host, or the sandbox worker crashed.
+
+    Parameters:
+        result (List[Dict]): The results of a snippet (see run_test_cases).
+
+    Returns:
+        bool: True if the results should not be cached.
+    """
+    return any(
+        case["status"] == "T"
+        or case["status"] == "E"
+        and (case["error"] or "").startswith(_WORKER_CRASHED)
+        for case in result
+    )
+
+
+class SandboxPool:
+    """
+    Pool of warm worker processes running test cases. Workers are started once with
+    resource limits and receive (code, function_name, inputs, outputs) over a pipe;
+    each job executes in a fresh namespace with its own builtins, and modules it
+    imports are dropped afterwards. A worker that crashes or overruns its time
+    budget is killed and replaced.
+
+    The pool is shared by every session of the app: a run checks out any idle
+    worker, so up to `size` runs from different sessions execute at once.
+    """
+
+    def __init__(self, size: int = SANDBOX_POOL_SIZE):
+        methods = multiprocessing.get_all_start_methods()
+        # forkserver children start from a small clean interpreter instead of
+        # a copy of the (large) app process
+        self._context = multiprocessing.get_context(
+            "forkserver" if "forkserver" in methods else "spawn"
+        )
+        self._size = size
+        self._idle = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=size)
+        for _ in range(size):
+            self._idle.put(self._start_worker())
+
+    def _start_worker(self):
+        parent_connection, child_connection = self._context.Pipe()
+        process = self._context.Process(
+            target=_sandbox_worker_main, args=(child_connection,), daemon=True
+        )
+        process.start()
+        child_connection.close()
+        return process, parent_connection
+
+    def _replace_worker(self, worker):
+        process, connection = worker
+        process.kill()
+        process.join()
+        connection.close()
+        return self._start_worker()
+
+    @traced("sandbox_run")
+    def run(
+        self,
+        code: str,
+        function_name: str,
+        inputs: List[str],
+        outputs: Optional[List[str]],
+        timeout: float = SANDBOX_CASE_TIMEOUT,
+        repeats: int = PROFILE_REPEATS,
+        profile_memory: bool = True,
+    ) -> List[Dict]:
+        """
+        Runs and profiles the test cases of a code snippet on an idle worker.
+        Snippets failing the static check are rejected without reaching a worker.
+
+        Parameters:
+            code (str): Provided code snippet.
+            function_name (str): Name of the function to be tested.
+            inputs (List[str]): List of inputs for unit tests.
+            outputs (List[str]): List of expected outputs for unit tests, or None
+                to only time the calls.
+            timeout (float): Time limit of each call in seconds.
+            repeats (int): Number of timed calls per case.
+            profile_memory (bool): Whether to measure the peak memory of each case.
+
+        Returns:
+            results (List[Dict]): One result per test case (see run_test_cases).
+        """
+        inputs = list(inputs)
+        outputs = None if outputs is None else list(outputs)
+        reason = static_check(code, function_name, inputs)
+        if reason:
+            return [_case_result("R", reason) for _ in inputs]
+        job = {
+            "code": code,
+            "function_name": function_name,
+            "inputs": inputs,
+            "outputs": outputs,
+            "timeout": timeout,
+            "repeats": repeats,
+            "profile_memory": profile_memory,
+        }
+        worker = self._idle.get()
+        try:
+            process, connection = worker
+            connection.send(job)
+            # budget for every call (timed repeats plus the traced one) and the
+            # time to exec the snippet
+            if connection.poll(timeout * (len(inputs) * (repeats + 1) + 1) + 1):
+                return connection.recv()
+            worker = self._replace_worker(worker)
+            return [_case_result("T", "worker timed out") for _ in inputs]
+        except (EOFError, OSError) as e:
+            worker = self._replace_worker(worker)
+            return [
+                _case_result("E", f"{_WORKER_CRASHED}: {e!r}") for _ in inputs
+            ]
+        finally:
+            self._idle.put(worker)
+
+    def run_many(self, jobs: List[Dict]) -> List[List[Dict]]:
+        """
+        Runs several snippets in parallel, one worker each.
+
+        Parameters:
+            jobs (List[Dict]): Keyword arguments of `run` for each snippet.
+
+        Returns:
+            List[List[Dict]]: The results of each snippet, in order.
+        """
+        return list(self._executor.map(lambda job: self.run(**job), jobs))
+
+    def close(self) -> None:
+        for _ in range(self._size):
+            process, connection = self._idle.get()
+            try:
+                connection.send(None)
+            except OSError:
+                pass
+            process.join(timeout=1)
+            if process.is_alive():
+                process.kill()
+            connection.close()
+        self._executor.shutdown()